@@ -0,0 +1,312 @@
+# bench_models.py - Time the public models functions on seeded databases at shop scale
+"""
+Usage: python bench_models.py [--scale small|medium|large] [--seed N] [--out results.json]
+                              [--baseline baseline.json] [--threshold 0.25] [--only name,name]
+
+Builds (once, cached under bench_data/) a database of the chosen scale
+from a fixed seed, then times each public models read and write on it
+and writes the results as JSON. Scales are items / sale lines:
+small 1k / 10k, medium 50k / 1M, large 500k / 10M.
+
+With --baseline, each benchmark is compared with the baseline file's. It
+is flagged when both its median and its fastest run are more than
+--threshold slower (and by more than timer noise). The exit status is 1
+if anything regressed, so a script can fail on it.
+
+Writes undo themselves (an added item is deleted, a checkout is taken
+back), so the cached database stays the same from run to run.
+"""
+import os
+import sys
+import json
+import argparse
+import time
+import random
+import sqlite3
+import platform
+from datetime import datetime, timedelta
+
+import database
+import models
+import populate_db
+
+SCALES = {
+    "small": (1_000, 10_000),
+    "medium": (50_000, 1_000_000),
+    "large": (500_000, 10_000_000),
+}
+DATA_DIR = "bench_data"
+THRESHOLD = 0.25
+NOISE_MS = 0.1 # Differences below this are timer noise, whatever the ratio
+
+# Sales end here rather than today, so a seed always builds the same database
+END_DATE = datetime(2025, 1, 1)
+HISTORY_DAYS = 365
+DATASET_VERSION = 2 # Part of the cached file name; bumped whenever the generated data changes
+
+
+# ---------- Building ----------
+def build_database(path, items, lines, seed=1, progress=None):
+    """
+    Create a database at path with `items` items and `lines` sale lines
+    over HISTORY_DAYS days, with populate_db's bulk generator (Zipf item
+    popularity, daily and hourly seasonality, stock consistent with the sales).
+    """
+    populate_db.generate_bulk(path, items, lines, seed=seed, days=HISTORY_DAYS, end=END_DATE, progress=progress)
+
+def dataset_path(scale, seed, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{scale}-seed{seed}-v{DATASET_VERSION}.db")
+
+def ensure_dataset(scale, seed, data_dir=DATA_DIR):
+    """The cached database for (scale, seed), built first if missing. Returns (path, build seconds or 0)."""
+    path = dataset_path(scale, seed, data_dir)
+    if os.path.exists(path):
+        database.setup_database(path) # Picks up migrations added since it was built
+        return path, 0.0
+    os.makedirs(data_dir, exist_ok=True)
+    items, lines = SCALES[scale]
+    partial = path + ".building"
+    for leftover in (partial, partial + "-wal", partial + "-shm"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    started = time.perf_counter()
+
+    def report(written):
+        print(f"\rBuilding {scale}: {written}/{lines} sale lines", end="", flush=True)
+
+    build_database(partial, items, lines, seed, progress=report)
+    print()
+    database.close_writers()
+    os.replace(partial, path)
+    return path, time.perf_counter() - started
+
+
+# ---------- Cases ----------
+class _Context:
+    """Inputs drawn once per run from the seed, so every run times the same calls."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        with models.get_db() as conn:
+            self.item_ids = [row[0] for row in conn.execute("SELECT id FROM items ORDER BY id")]
+            self.barcodes = [row[0] for row in conn.execute("SELECT barcode FROM items WHERE barcode IS NOT NULL")]
+            self.sale_ids = [row[0] for row in conn.execute("SELECT id FROM sales ORDER BY id")]
+            self.category_id = models.get_categories()[0]["id"]
+        self.sales_page = models.get_sales_page(200)
+        self.items_page = models.get_items_page(200)
+
+    def item_id(self):
+        return self.rng.choice(self.item_ids)
+
+    def sale_id(self):
+        return self.rng.choice(self.sale_ids)
+
+    def bill(self):
+        bill = []
+        for item_id in self.rng.sample(self.item_ids, min(3, len(self.item_ids))):
+            item = models.get_item(item_id)
+            bill.append({"id": item_id, "qty": 1, "price": item["price"], "purchase_price": item["purchase_price"]})
+        return bill
+
+def _cases(ctx):
+    """
+    (name, fn, prepare, cleanup): prepare() returns the args for one timed
+    call (untimed); cleanup(result, args), if given, undoes a write (untimed).
+    """
+    last_item, last_sale = ctx.items_page[-1] if ctx.items_page else None, ctx.sales_page[-1] if ctx.sales_page else None
+    month = (END_DATE - timedelta(days=31)).strftime("%Y-%m-%d"), (END_DATE - timedelta(days=1)).strftime("%Y-%m-%d")
+    no_args = lambda: ()
+
+    def cold_barcode():
+        models.clear_item_cache()
+        return (ctx.rng.choice(ctx.barcodes),)
+
+    def prepared_sale():
+        return (models.checkout(ctx.bill(), END_DATE.isoformat())[0],)
+
+    def prepared_detail():
+        sale_id, = prepared_sale()
+        detail = models.get_sale_details(sale_id)[0]
+        return (detail["id"], 2, detail["price_each"])
+
+    def undo_detail(_, args):
+        with models.get_db() as conn:
+            sale_id = conn.execute("SELECT sale_id FROM sale_details WHERE id = ?", (args[0],)).fetchone()[0]
+        models.delete_sale(sale_id)
+
+    def unchanged_item():
+        item = models.get_item(ctx.item_id())
+        return (item["id"], item["name"], item["category_id"], item["barcode"], item["price"],
+                item["stock_count"], item["photo_path"], item["purchase_price"])
+
+    def unchanged_rows():
+        rows = []
+        for item in models.get_items_by_ids(ctx.rng.sample(ctx.item_ids, min(100, len(ctx.item_ids)))).values():
+            rows.append({"name": item["name"], "barcode": item["barcode"], "price": item["price"],
+                         "purchase_price": item["purchase_price"], "stock_count": None})
+        return (rows,)
+
+    def new_item():
+        return (f"bench probe {ctx.rng.random()}", ctx.category_id, None, 1, 1, None)
+
+    return [
+        ("get_settings", models.get_settings, no_args, None),
+        ("get_categories", models.get_categories, no_args, None),
+        ("get_items", models.get_items, no_args, None),
+        ("get_item_names", models.get_item_names, no_args, None),
+        ("get_items_page", models.get_items_page, lambda: (200,), None),
+        ("get_items_page next", models.get_items_page,
+         lambda: (200, (last_item["name"], last_item["id"]) if last_item else None), None),
+        ("get_item", models.get_item, lambda: (ctx.item_id(),), None),
+        ("get_item_by_barcode cached", models.get_item_by_barcode, lambda: (ctx.rng.choice(ctx.barcodes),), None),
+        ("get_item_by_barcode uncached", models.get_item_by_barcode, cold_barcode, None),
+        ("get_items_by_ids 50", models.get_items_by_ids,
+         lambda: (ctx.rng.sample(ctx.item_ids, min(50, len(ctx.item_ids))),), None),
+        ("search_items_by_name", models.search_items_by_name, lambda: (ctx.rng.choice(populate_db.WORDS)[:3],), None),
+        ("warm_barcode_cache", models.warm_barcode_cache, no_args, None),
+        ("get_sales", models.get_sales, no_args, None),
+        ("get_sales_page", models.get_sales_page, lambda: (200,), None),
+        ("get_sales_page next", models.get_sales_page,
+         lambda: (200, (last_sale["datetime"], last_sale["id"]) if last_sale else None), None),
+        ("get_sales_page month", lambda limit: models.get_sales_page(limit, date_from=month[0], date_to=month[1]),
+         lambda: (200,), None),
+        ("get_sale", models.get_sale, lambda: (ctx.sale_id(),), None),
+        ("get_sale_details", models.get_sale_details, lambda: (ctx.sale_id(),), None),
+        ("get_sales_total", models.get_sales_total, no_args, None),
+        ("get_sales_summary_today", models.get_sales_summary_today, no_args, None),
+        ("get_latest_sale", models.get_latest_sale, no_args, None),
+        ("get_revenue_and_profit_all_time", models.get_revenue_and_profit_all_time, no_args, None),
+        ("get_revenue_and_profit_today", models.get_revenue_and_profit_today, no_args, None),
+        ("get_daily_sales_summary", models.get_daily_sales_summary, no_args, None),
+        ("add_item", models.add_item, new_item, lambda item_id, _: models.delete_item(item_id)),
+        ("update_item", models.update_item, unchanged_item, None),
+        ("delete_item", models.delete_item, lambda: (models.add_item(*new_item()),), None),
+        ("upsert_items 100", models.upsert_items, unchanged_rows, None),
+        ("checkout 3 lines", lambda bill: models.checkout(bill, END_DATE.isoformat()), lambda: (ctx.bill(),),
+         lambda result, _: models.delete_sale(result[0])),
+        ("update_sale_detail", models.update_sale_detail, prepared_detail, undo_detail),
+        ("delete_sale", models.delete_sale, prepared_sale, None),
+        ("refresh_forecasts", lambda: models.refresh_forecasts_async().result(), no_args, None),
+    ]
+
+
+# ---------- Running ----------
+def _time_case(fn, prepare, cleanup, min_runs=3, max_runs=200, budget=1.0):
+    """Seconds per call: one untimed warm-up, then runs until max_runs or budget seconds (at least min_runs)."""
+    samples = []
+    spent = 0.0
+    for warmup in (True, False):
+        while True:
+            args = prepare()
+            started = time.perf_counter()
+            result = fn(*args)
+            elapsed = time.perf_counter() - started
+            if cleanup:
+                cleanup(result, args)
+            if warmup:
+                break
+            samples.append(elapsed)
+            spent += elapsed
+            if len(samples) >= max_runs or (len(samples) >= min_runs and spent >= budget):
+                break
+    return samples
+
+def _summary(samples):
+    ordered = sorted(samples)
+    ms = lambda seconds: round(seconds * 1000, 4)
+    return {"runs": len(ordered), "min_ms": ms(ordered[0]), "median_ms": ms(ordered[len(ordered) // 2]),
+            "p95_ms": ms(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]),
+            "mean_ms": ms(sum(ordered) / len(ordered))}
+
+def run(scale="small", seed=1, only=None, data_dir=DATA_DIR, budget=1.0):
+    """Build or reuse the dataset and time every case; returns the results dict that --out writes."""
+    path, build_seconds = ensure_dataset(scale, seed, data_dir)
+    models.DB_PATH = path
+    database.close_writers()
+    models.close_db()
+    if not models.get_settings():
+        models.save_settings("bench", "", "", "د.ج")
+    ctx = _Context(seed)
+    results = {}
+    try:
+        for name, fn, prepare, cleanup in _cases(ctx):
+            if only and name not in only:
+                continue
+            results[name] = _summary(_time_case(fn, prepare, cleanup, budget=budget))
+            print(f"  {name:34s} {results[name]['median_ms']:10.3f} ms median  ({results[name]['runs']} runs)")
+    finally:
+        database.close_writers()
+        models.close_db()
+    items, lines = SCALES[scale]
+    return {
+        "meta": {"scale": scale, "seed": seed, "items": items, "sale_lines": lines,
+                 "build_seconds": round(build_seconds, 1), "generated": datetime.now().isoformat(timespec="seconds"),
+                 "python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "platform": platform.platform()},
+        "results": results,
+    }
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    [(name, baseline ms, current ms, ratio, regressed)] for benchmarks in
+    both, by median. Flagging also needs the fastest run to be slower by the
+    threshold, so one noisy stretch of runs does not count as a regression.
+    """
+    rows = []
+    for name, current in results["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        old, new = before["median_ms"], current["median_ms"]
+        ratio = new / old if old else float("inf")
+        regressed = (ratio > 1 + threshold and new - old > NOISE_MS
+                     and current["min_ms"] > before["min_ms"] * (1 + threshold))
+        rows.append((name, old, new, ratio, regressed))
+    return rows
+
+def format_comparison(rows, threshold=THRESHOLD):
+    lines = [f"{'benchmark':34s} {'baseline':>10s} {'current':>10s} {'change':>8s}"]
+    for name, old, new, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        lines.append(f"{name:34s} {old:10.3f} {new:10.3f} {(ratio - 1) * 100:+7.1f}%{flag}")
+    regressions = sum(row[4] for row in rows)
+    lines.append(f"\n{regressions} regression(s) over {threshold:.0%}")
+    return "\n".join(lines)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n", 1)[1], # argparse writes the usage line itself
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="results file (default bench-<scale>.json)")
+    parser.add_argument("--baseline", help="earlier results to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--only", help="comma-separated benchmark names to run")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    scale, seed = args.scale, args.seed
+    out = args.out or f"bench-{scale}.json"
+    only = set(args.only.split(",")) if args.only else None
+
+    print(f"models benchmarks, scale {scale} ({SCALES[scale][0]} items, {SCALES[scale][1]} sale lines), seed {seed}")
+    results = run(scale, seed, only)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Written to {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if (baseline["meta"]["scale"], baseline["meta"]["seed"]) != (scale, seed):
+            print("Warning: the baseline was run at another scale or seed")
+        rows = compare(results, baseline, args.threshold)
+        print()
+        print(format_comparison(rows, args.threshold))
+        if any(row[4] for row in rows):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
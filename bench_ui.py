@@ -0,0 +1,286 @@
+# bench_ui.py - Time the Controller's tab loads and bill flows headlessly, with peak memory
+"""
+Usage: python bench_ui.py [--scale small|medium|large] [--seed N] [--repeat N] [--out results.json]
+                          [--baseline baseline.json] [--threshold 0.25]
+
+Runs the real Controller under QT_QPA_PLATFORM=offscreen (no display
+needed) on a copy of a bench_models database, and scripts what a
+cashier does: the stock and sales tabs loading, a sale being opened,
+barcodes scanned into a bill, the bill printed and saved. Each operation
+is timed until the window is idle again, meaning worker reads have
+delivered and queued signals have run. Its peak RSS and how far RSS grew
+are also recorded. The RSS numbers cover Qt's memory as well as Python's.
+
+Message boxes are answered as if OK/Yes were clicked, and the scan
+dialog is accepted as shown. The print dialog is accepted with the
+printer set to a PDF file, so _bill_print renders the real receipt.
+
+The JSON has the same shape as bench_models', and --baseline flags
+regressions the same way (exit status 1), by wall time.
+"""
+import os
+import sys
+import json
+import argparse
+import time
+import shutil
+import tempfile
+import platform
+import threading
+from itertools import count
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication, QMessageBox
+from PyQt5.QtPrintSupport import QPrinter, QPrintDialog
+
+import bench_models
+import database
+import models
+
+REPEAT = 5
+BILL_LINES = 3
+MIN_STOCK = 100 # Scanned items have enough stock for every bill the run saves
+_RSS_INTERVAL = 0.002 # seconds between RSS samples while an operation runs
+
+
+# ---------- Memory ----------
+def _rss_bytes():
+    """Current resident set size; the lifetime peak where /proc is missing (not Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024 # bytes on macOS, KiB elsewhere
+
+class RssSampler:
+    """Samples RSS on a thread while in use: `with RssSampler() as rss: ...`, then rss.before / rss.peak."""
+
+    def __init__(self, interval=_RSS_INTERVAL):
+        self.interval = interval
+        self.before = self.peak = 0
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.before = self.peak = _rss_bytes()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopping.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+    def _sample(self):
+        while not self._stopping.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+
+# ---------- Driving the window ----------
+class _PdfPrintDialog:
+    """Stands in for QPrintDialog: accepts at once and prints to a PDF in the scratch folder."""
+    Accepted = QPrintDialog.Accepted
+
+    def __init__(self, printer, parent=None):
+        printer.setOutputFormat(QPrinter.PdfFormat)
+        printer.setOutputFileName(os.path.abspath("receipt.pdf"))
+
+    def exec_(self):
+        return self.Accepted
+
+def _answer_dialogs():
+    """Make every modal dialog the Controller opens return at once, as if confirmed."""
+    import controllers
+    QMessageBox.information = staticmethod(lambda *args, **kwargs: QMessageBox.Ok)
+    QMessageBox.warning = staticmethod(lambda *args, **kwargs: print(f"Warning: {args[2] if len(args) > 2 else args}"))
+    QMessageBox.question = staticmethod(lambda *args, **kwargs: QMessageBox.Yes)
+    controllers.ItemScanDialog.exec_ = lambda dialog: (dialog.accept(), dialog.result())[1]
+    controllers.QPrintDialog = _PdfPrintDialog
+
+def settle(app, window=None):
+    """Run the event loop until no worker read is in flight and queued signals have been handled."""
+    executor = window.executor if window is not None else None
+    while True:
+        app.processEvents()
+        if executor is None or not executor.is_busy():
+            app.processEvents() # Signals queued by the last callbacks
+            if executor is None or not executor.is_busy():
+                return
+        executor.wait_for_done(5)
+
+
+class UiBench:
+    """One Controller on a scratch copy of a dataset, and the scripted operations timed on it."""
+
+    def __init__(self, app, repeat=REPEAT):
+        self.app = app
+        self.repeat = repeat
+        self.results = {}
+        self.window = None
+
+    def measure(self, name, action, prepare=None, repeat=None):
+        """Time action() `repeat` times (prepare() runs untimed before each) until the window settles."""
+        samples, peaks, growth = [], [], []
+        for _ in range(repeat or self.repeat):
+            if prepare:
+                prepare()
+                settle(self.app, self.window)
+            with RssSampler() as rss:
+                started = time.perf_counter()
+                action()
+                settle(self.app, self.window) # The new window, for startup
+                samples.append(time.perf_counter() - started)
+            peaks.append(rss.peak)
+            growth.append(rss.peak - rss.before)
+        summary = bench_models._summary(samples)
+        summary["peak_rss_mb"] = round(max(peaks) / 2**20, 1)
+        summary["rss_growth_mb"] = round(max(growth) / 2**20, 2)
+        self.results[name] = summary
+        print(f"  {name:28s} {summary['median_ms']:10.1f} ms median  peak {summary['peak_rss_mb']:7.1f} MB"
+              f"  (+{summary['rss_growth_mb']:.2f} MB)")
+
+    def run(self):
+        from controllers import Controller
+        _answer_dialogs()
+        self.barcodes = self._scannable_barcodes()
+        self.scans = 0
+
+        def start():
+            self.window = Controller()
+            self.window.show()
+        # Startup can only be measured once per process: the first window pays for imports and caches
+        self.measure("startup to background ready", start, repeat=1)
+        w = self.window
+
+        self.measure("stock tab reload", w._load_stock_table)
+        self.measure("stock next page", w.stock_model.fetchMore)
+        self.measure("sales tab first show", lambda: w.tabs.setCurrentWidget(w.sales_tab), repeat=1)
+        self.measure("sales tab reload", w._load_sales_tab)
+        rows = count()
+        self.measure("sale view selected", lambda: self._select_sale(next(rows)))
+
+        w.tabs.setCurrentIndex(0)
+        self.measure("scan and add to bill", self._scan, prepare=self._clear_bill)
+        self.measure(f"bill print {BILL_LINES} lines", w._bill_print, prepare=self._fill_bill)
+        self.measure(f"bill save {BILL_LINES} lines", w._bill_save, prepare=self._fill_bill)
+        self.measure("scan, add, save cycle", self._cycle, prepare=self._clear_bill)
+        self.measure("sales tab after sales", w._load_sales_tab,
+                     prepare=lambda: w.tabs.setCurrentWidget(w.sales_tab))
+        return self.results
+
+    def close(self):
+        if self.window is not None:
+            self.window.close()
+            settle(self.app, self.window)
+
+    def _scannable_barcodes(self):
+        with models.get_db() as conn:
+            rows = conn.execute(
+                "SELECT barcode FROM items WHERE barcode IS NOT NULL AND stock_count >= ? ORDER BY id LIMIT 200",
+                (MIN_STOCK,)
+            ).fetchall()
+        if not rows:
+            raise RuntimeError(f"no item with a barcode and {MIN_STOCK}+ in stock to scan")
+        return [row[0] for row in rows]
+
+    def _scan(self):
+        w = self.window
+        w.in_barcode.setText(self.barcodes[self.scans % len(self.barcodes)])
+        self.scans += 1
+        w._handle_scanned_barcode()
+
+    def _clear_bill(self):
+        w = self.window
+        w.tbl_bill.setRowCount(0)
+        w.current_bill_items.clear()
+        w._bill_recalc_total()
+
+    def _fill_bill(self):
+        self._clear_bill()
+        for _ in range(BILL_LINES):
+            self._scan()
+
+    def _cycle(self):
+        for _ in range(BILL_LINES):
+            self._scan()
+        self.window._bill_save()
+
+    def _select_sale(self, n):
+        w = self.window
+        row = n % max(1, w.sales_model.rowCount())
+        w.tbl_sales.setCurrentIndex(w.sales_model.index(row, 0))
+
+
+def prepare_copy(scale, seed, data_dir=bench_models.DATA_DIR):
+    """A scratch folder holding store.db, a copy of the generated dataset (the run writes to it)."""
+    source, _ = bench_models.ensure_dataset(scale, seed, data_dir)
+    database.close_writers()
+    work = tempfile.mkdtemp(prefix="bench-ui-")
+    shutil.copy(source, os.path.join(work, database.DB_NAME))
+    return work
+
+def run(scale="small", seed=1, repeat=REPEAT, data_dir=bench_models.DATA_DIR):
+    data_dir = os.path.abspath(data_dir)
+    work = prepare_copy(scale, seed, data_dir)
+    home = os.getcwd()
+    os.chdir(work) # The app reads store.db, logs/ and assets/ relative to the working folder
+    app = QApplication.instance() or QApplication(sys.argv)
+    bench = UiBench(app, repeat)
+    try:
+        models.DB_PATH = database.DB_NAME
+        if not models.get_settings():
+            models.save_settings("bench", "", "", "د.ج")
+        results = bench.run()
+    finally:
+        bench.close()
+        database.close_writers()
+        models.close_db()
+        os.chdir(home)
+        shutil.rmtree(work, ignore_errors=True)
+    items, lines = bench_models.SCALES[scale]
+    return {
+        "meta": {"scale": scale, "seed": seed, "items": items, "sale_lines": lines, "repeat": repeat,
+                 "qt_platform": os.environ.get("QT_QPA_PLATFORM"), "python": platform.python_version(),
+                 "platform": platform.platform()},
+        "results": results,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n", 1)[1], # argparse writes the usage line itself
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=list(bench_models.SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--out", help="results file (default bench-ui-<scale>.json)")
+    parser.add_argument("--baseline", help="earlier results to compare with")
+    parser.add_argument("--threshold", type=float, default=bench_models.THRESHOLD)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    out = os.path.abspath(args.out or f"bench-ui-{args.scale}.json")
+
+    print(f"UI benchmarks, scale {args.scale}, seed {args.seed}, {args.repeat} runs each")
+    results = run(args.scale, args.seed, args.repeat)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Written to {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = bench_models.compare(results, baseline, args.threshold)
+        print()
+        print(bench_models.format_comparison(rows, args.threshold))
+        if any(row[4] for row in rows):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+# camera_scanner.py - Continuous barcode scanning from a camera, video file or image sequence
+"""
+Usage: python camera_scanner.py [camera index | video file | image folder | "glob*.png"] [--no-drop]
+
+A grabber thread reads frames as fast as the source delivers them into a
+one-frame slot; a decoder thread takes whatever frame is newest, crops the
+centre of it, converts it to a downscaled grayscale image and hands that to
+pyzbar. If decoding falls behind, the frames it had no time for are dropped
+instead of queuing up, so a code is always read from the live picture.
+Repeated reads of the code still held in front of the camera are debounced.
+
+Video files and image sequences are played back at their frame rate, so a
+recording stands in for the camera with the same timing and frame drops.
+"""
+import os
+import sys
+import glob
+import time
+import threading
+
+from utils import is_valid_barcode
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+# OpenCV and pyzbar (with NumPy under them) take a noticeable part of startup,
+# so they are imported by load_libraries() the first time a camera is used
+cv2 = None
+zbar_decode = None
+ZBAR_SYMBOLS = None
+_libraries_loaded = False
+_libraries_lock = threading.Lock()
+
+def load_libraries():
+    """Import OpenCV and pyzbar once, from any thread. Returns cv2, or None if OpenCV is missing."""
+    global cv2, zbar_decode, ZBAR_SYMBOLS, _libraries_loaded
+    with _libraries_lock:
+        if _libraries_loaded:
+            return cv2
+        try:
+            import cv2 as _cv2
+            cv2 = _cv2
+        except Exception:
+            pass
+        try:
+            from pyzbar.pyzbar import decode, ZBarSymbol
+            zbar_decode = decode
+            # Retail symbologies only; every extra type makes each decode slower
+            ZBAR_SYMBOLS = [ZBarSymbol.EAN13, ZBarSymbol.EAN8, ZBarSymbol.UPCA, ZBarSymbol.UPCE, ZBarSymbol.CODE128]
+        except Exception:
+            pass
+        _libraries_loaded = True
+    return cv2
+
+
+# ---------- Frame sources ----------
+class _PacedCapture:
+    """A cv2.VideoCapture on a file, released at the file's frame rate like a camera would."""
+
+    def __init__(self, path):
+        self._cap = cv2.VideoCapture(path)
+        fps = self._cap.get(cv2.CAP_PROP_FPS) or 0
+        self._interval = 1.0 / fps if fps > 0 else 1.0 / 30
+        self._next = None
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def read(self):
+        now = time.monotonic()
+        if self._next is not None and now < self._next:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next or now) + self._interval
+        return self._cap.read()
+
+    def release(self):
+        self._cap.release()
+
+class ImageSequence:
+    """Still images played back in name order at `fps`, with the VideoCapture read()/release() interface."""
+
+    def __init__(self, paths, fps=30.0):
+        load_libraries()
+        self._paths = list(paths)
+        self._index = 0
+        self._interval = 1.0 / fps
+        self._next = None
+
+    def isOpened(self):
+        return bool(self._paths)
+
+    def read(self):
+        if self._index >= len(self._paths):
+            return False, None
+        now = time.monotonic()
+        if self._next is not None and now < self._next:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next or now) + self._interval
+        frame = cv2.imread(self._paths[self._index])
+        self._index += 1
+        return frame is not None, frame
+
+    def release(self):
+        self._index = len(self._paths)
+
+def open_source(spec=0, fps=30.0):
+    """
+    Open a frame source: a camera index (int or digit string), a video file,
+    a folder of images, or a glob pattern of images. Raises RuntimeError if
+    OpenCV is missing or the source cannot be opened.
+    """
+    if load_libraries() is None:
+        raise RuntimeError("Camera scanning needs OpenCV (pip install opencv-python)")
+    if isinstance(spec, int) or str(spec).isdigit():
+        source = cv2.VideoCapture(int(spec))
+    elif os.path.isdir(spec):
+        source = ImageSequence(sorted(
+            os.path.join(spec, name) for name in os.listdir(spec) if name.lower().endswith(IMAGE_EXTENSIONS)), fps)
+    elif any(ch in str(spec) for ch in "*?["):
+        source = ImageSequence(sorted(glob.glob(spec)), fps)
+    else:
+        source = _PacedCapture(spec)
+    if not source.isOpened():
+        source.release()
+        raise RuntimeError(f"Could not open frame source: {spec}")
+    return source
+
+
+# ---------- Per-frame work ----------
+def prepare_roi(frame, roi=0.6, max_width=640):
+    """
+    The centre `roi` fraction (width and height) of a BGR or gray frame, as
+    grayscale no wider than max_width. A 1080p frame shrinks to about a
+    tenth of its pixels, which is most of pyzbar's cost.
+    """
+    if cv2 is None:
+        load_libraries()
+    height, width = frame.shape[:2]
+    if roi < 1.0:
+        crop_w, crop_h = int(width * roi), int(height * roi)
+        x, y = (width - crop_w) // 2, (height - crop_h) // 2
+        frame = frame[y:y + crop_h, x:x + crop_w]
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if frame.shape[1] > max_width:
+        scale = max_width / frame.shape[1]
+        frame = cv2.resize(frame, (max_width, max(1, int(frame.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+    return frame
+
+def decode_codes(gray, decode=None):
+    """Valid barcodes found in a prepared grayscale image, in the order found."""
+    if decode is None:
+        if not _libraries_loaded:
+            load_libraries()
+        if zbar_decode is None:
+            raise RuntimeError("Camera scanning needs pyzbar and the zbar library (pip install pyzbar)")
+        symbols = zbar_decode(gray, symbols=ZBAR_SYMBOLS)
+    else:
+        symbols = decode(gray)
+    codes = []
+    for symbol in symbols:
+        code = symbol.data.decode("ascii", "ignore").strip()
+        if code and is_valid_barcode(code) and code not in codes:
+            codes.append(code)
+    return codes
+
+class Debouncer:
+    """
+    Accepts a code once, then ignores it while it keeps being seen: it is
+    accepted again only after `hold` seconds without a read (the item was
+    taken away and presented again) or after another code was accepted.
+    """
+
+    def __init__(self, hold=1.0):
+        self.hold = hold
+        self._last_code = None
+        self._last_seen = 0.0
+
+    def accept(self, code, now=None):
+        now = time.monotonic() if now is None else now
+        repeat = code == self._last_code and now - self._last_seen < self.hold
+        self._last_code = code
+        self._last_seen = now # Still in view: keeps a held code from repeating
+        return not repeat
+
+
+# ---------- Pipeline ----------
+class ScanPipeline:
+    """
+    Grab and decode threads around one frame source. on_code(code) is called
+    on the decoder thread for each debounced read; on_finished(), if given,
+    once the source runs out or stop() is called. With drop_frames=False every
+    frame is decoded (for measuring a recording's read rate, not for live use).
+    """
+
+    def __init__(self, source, on_code, on_finished=None, decode=None, roi=0.6, max_width=640,
+                 hold=1.0, drop_frames=True):
+        self.source = source
+        self.on_code = on_code
+        self.on_finished = on_finished
+        self.decode = decode
+        self.roi = roi
+        self.max_width = max_width
+        self.debouncer = Debouncer(hold)
+        self.drop_frames = drop_frames
+        self.stats = {"frames": 0, "decoded": 0, "dropped": 0, "codes": 0, "decode_seconds": 0.0}
+
+        self._frame = None # Newest frame not yet taken by the decoder
+        self._source_done = False
+        self._stopping = threading.Event()
+        self._cond = threading.Condition()
+        self._grabber = threading.Thread(target=self._grab, name="scan-grab", daemon=True)
+        self._decoder = threading.Thread(target=self._decode_loop, name="scan-decode", daemon=True)
+
+    def start(self):
+        self._grabber.start()
+        self._decoder.start()
+        return self
+
+    def stop(self):
+        """Stop both threads and release the source; safe to call from any thread but the pipeline's own."""
+        self._stopping.set()
+        with self._cond:
+            self._cond.notify_all()
+        self.join()
+
+    def join(self, timeout=None):
+        for thread in (self._grabber, self._decoder):
+            if thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def is_running(self):
+        return self._decoder.is_alive()
+
+    def _grab(self):
+        try:
+            while not self._stopping.is_set():
+                ok, frame = self.source.read()
+                if not ok:
+                    break
+                with self._cond:
+                    if not self.drop_frames:
+                        while self._frame is not None and not self._stopping.is_set():
+                            self._cond.wait()
+                    elif self._frame is not None:
+                        self.stats["dropped"] += 1 # The decoder never got to it
+                    self._frame = frame
+                    self.stats["frames"] += 1
+                    self._cond.notify_all()
+        finally:
+            self.source.release()
+            with self._cond:
+                self._source_done = True
+                self._cond.notify_all()
+
+    def _decode_loop(self):
+        try:
+            while True:
+                with self._cond:
+                    while self._frame is None and not self._source_done and not self._stopping.is_set():
+                        self._cond.wait()
+                    if self._stopping.is_set() or self._frame is None:
+                        return
+                    frame, self._frame = self._frame, None
+                    self._cond.notify_all()
+                started = time.perf_counter()
+                codes = decode_codes(prepare_roi(frame, self.roi, self.max_width), self.decode)
+                self.stats["decode_seconds"] += time.perf_counter() - started
+                self.stats["decoded"] += 1
+                for code in codes:
+                    if self.debouncer.accept(code):
+                        self.stats["codes"] += 1
+                        self.on_code(code)
+        finally:
+            if self.on_finished is not None:
+                self.on_finished()
+
+
+def main(argv):
+    args = [arg for arg in argv[1:] if not arg.startswith("--")]
+    source = open_source(args[0] if args else 0)
+    started = time.monotonic()
+
+    def on_code(code):
+        print(f"{time.monotonic() - started:8.3f}s  {code}", flush=True)
+
+    pipeline = ScanPipeline(source, on_code, drop_frames="--no-drop" not in argv).start()
+    try:
+        pipeline.join()
+    except KeyboardInterrupt:
+        pipeline.stop()
+    stats = pipeline.stats
+    per_frame = stats["decode_seconds"] / stats["decoded"] * 1000 if stats["decoded"] else 0
+    print(f"frames {stats['frames']}, decoded {stats['decoded']}, dropped {stats['dropped']}, "
+          f"codes {stats['codes']}, {per_frame:.1f} ms per decode")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
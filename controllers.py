@@ -1,54 +1,71 @@
 # controllers.py (fixed custom price calculation and added purchase price feature)
 import os
 from datetime import datetime
-from PyQt5.QtWidgets import QFileDialog, QTableWidgetItem, QMessageBox, QInputDialog, QCompleter
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont
+from html import escape
+from itertools import count
+from PyQt5.QtWidgets import QApplication, QFileDialog, QTableWidgetItem, QMessageBox, QInputDialog, QCompleter
+from PyQt5.QtCore import Qt, QStringListModel, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QImage, QPixmap
 from PyQt5.QtPrintSupport import QPrinter, QPrintDialog
 from PyQt5.QtGui import QTextDocument
 
-from ui_main import MainUI, ItemScanDialog # Import ItemScanDialog
+from ui_main import MainUI, ItemScanDialog, ReportDialog, PhotoCaptureDialog # Import ItemScanDialog
+from utils import is_valid_barcode, fmt_qty, fmt_money
+from workers import QueryExecutor
 import models
-
-try:
-    import cv2
-except Exception:
-    cv2 = None
-
-try:
-    from pyzbar.pyzbar import decode as zbar_decode
-except Exception:
-    zbar_decode = None
-
-ASSETS_PHOTOS_DIR = os.path.join("assets", "photos")
-os.makedirs(ASSETS_PHOTOS_DIR, exist_ok=True)
-
-ALLOWED_BARCODE_LENGTHS = {8, 12, 13}
-
-def is_valid_barcode(code: str) -> bool:
-    return code.isdigit() and (len(code) in ALLOWED_BARCODE_LENGTHS)
-
-def fmt_qty(val):
-    return f"{val:.0f}" if val == int(val) else f"{val:.1f}"
-
-def fmt_money(val):
-    return f"{val:.0f}" if val == int(val) else f"{val:.2f}"
+import money
+import importer
+import exporter
+import reports
+import camera_scanner
+import photos
+from startup_profile import PROFILE
+
+FORECAST_REFRESH_MS = 60 * 60 * 1000
+IMPORT_RELOAD_MS = 1000 # An import running for a while reloads the stock view at most this often
+# Camera index, or a video file / image folder to stand in for the camera when testing
+CAMERA_SOURCE = os.environ.get("KIOSK_CAMERA_SOURCE", "0")
 
 class Controller(MainUI):
+    # Re-emits models change notifications; queued onto the GUI thread if a write happens elsewhere
+    data_changed = pyqtSignal(str, dict)
+    # (fraction done, running summary) from an import running on a worker thread
+    import_progress = pyqtSignal(float, dict)
+    # Camera scan pipeline threads -> GUI thread
+    camera_scanned = pyqtSignal(str)
+    camera_stopped = pyqtSignal()
+    # Preview frames from the photo capture thread
+    photo_frame = pyqtSignal(QImage)
+
     def __init__(self):
-        super().__init__()
+        with PROFILE.phase("build ui"):
+            super().__init__()
 
         self.currency = "د.ج"
         self.current_bill_items = []  # List to track items in the current bill
 
+        # Reads run on worker threads; the header indicator shows while any are in flight
+        self.executor = QueryExecutor(parent=self)
+        self._busy_text = self.lbl_busy.text() # Restored after an import shows its progress there
+        self.executor.busy_changed.connect(self._set_busy)
+        self.stock_model.executor = self.executor
+        self.sales_model.executor = self.executor
+        self._kpis = None
+        self._kpis_loading = False
+        self._sales_loaded = False # The sales tab and its KPIs are read the first time it is shown
+        # Row key -> sequence number of the newest read or change for it (see _submit_latest)
+        self._read_seq = {}
+        self._read_ids = count(1)
+        # Stock tab previews: photo path -> thumbnail QPixmap
+        self._thumb_cache = photos.LRUCache(256)
+        self._preview_path = None
+
         # Load settings
         self._load_settings_or_first_run()
 
-        # Initialize tabs
-        self._load_categories()
-        self._load_stock_table()
-        self._load_sales_tab()
+        # Only what the bill tab needs is set up here; the rest loads once the window has painted
         self._apply_currency_to_inputs()
+        self.tabs.currentChanged.connect(self._on_tab_changed)
 
         # Bill signals
         self.btn_bill_find.clicked.connect(self._bill_find_and_add_item_dialog) # Now uses the new dialog flow
@@ -57,6 +74,10 @@ class Controller(MainUI):
         self.btn_bill_save.clicked.connect(self._bill_save)
         self.btn_print_bill.clicked.connect(self._bill_print)
         self.btn_scanner_info.clicked.connect(self._show_scanner_info)
+        self._scan_pipeline = None
+        self.btn_camera_scan.toggled.connect(self._toggle_camera_scan)
+        self.camera_scanned.connect(self._on_camera_barcode)
+        self.camera_stopped.connect(self._on_camera_stopped)
 
         # Autocomplete feature for manual entry (if not using scanner)
         self.in_name.textChanged.connect(self._on_name_text_changed)
@@ -73,34 +94,220 @@ class Controller(MainUI):
         self.btn_stk_update.clicked.connect(self._stock_update)
         self.btn_stk_delete.clicked.connect(self._stock_delete)
         self.btn_stk_refresh.clicked.connect(self._load_stock_table)
+        self.btn_stk_import.clicked.connect(self._stock_import)
+        self.import_progress.connect(self._on_import_progress)
         self.tbl_stock.clicked.connect(self._stock_fill_form_from_selection)
 
         # Sales signals
         self.btn_sale_refresh.clicked.connect(self._load_sales_tab)
+        self.btn_sale_export.clicked.connect(self._sales_export)
+        self.btn_sale_report.clicked.connect(self._sales_report)
         self.btn_sale_view.clicked.connect(self._sales_view_selected)
         self.btn_sale_delete.clicked.connect(self._sales_delete_selected)
         self.btn_sale_delete_item.clicked.connect(self._sales_delete_item)
         self.btn_sale_update_item.clicked.connect(self._sales_update_item)
-        self.tbl_sales.itemSelectionChanged.connect(self._sales_view_selected)
+        self.tbl_sales.selectionModel().selectionChanged.connect(self._sales_view_selected)
+        self.chk_sale_filter.toggled.connect(self._load_sales_tab)
+        self.sale_date_from.dateChanged.connect(self._on_sale_filter_dates_changed)
+        self.sale_date_to.dateChanged.connect(self._on_sale_filter_dates_changed)
 
         # Settings
         self.btn_settings_save.clicked.connect(self._save_settings_from_tab)
 
+        # Patch views from models write notifications instead of reloading them
+        self.data_changed.connect(self._on_data_changed)
+        models.add_change_listener(self.data_changed.emit)
+
         # Responsive tables
         self._setup_responsive_tables()
 
+        self._forecast_timer = QTimer(self)
+        self._forecast_timer.timeout.connect(models.refresh_forecasts_async)
+
+        # Import chunks are committed every thousand rows; the views reload once per interval, not per chunk
+        self._import_reload_timer = QTimer(self)
+        self._import_reload_timer.setSingleShot(True)
+        self._import_reload_timer.setInterval(IMPORT_RELOAD_MS)
+        self._import_reload_timer.timeout.connect(self._reload_after_import)
+        self._import_new_categories = False
+
+        # A zero timer fires on the first event loop pass, after the window has painted
+        QTimer.singleShot(0, self._load_deferred)
+
+    def _load_deferred(self):
+        """Second startup stage: everything the first scan doesn't need, mostly on worker threads."""
+        PROFILE.mark("first_paint")
+        self.executor.busy_changed.connect(self._on_deferred_loaded)
+        # Warm the scan cache first; a scan before it is done just reads the database
+        self.executor.submit(models.warm_barcode_cache)
+        self.executor.submit(models.get_item_names, on_result=self._on_completer_names_loaded)
+        self._load_categories()
+        self._load_stock_table()
+        # Imported on a worker so the first camera use doesn't stall the window for it
+        self.executor.submit_long(camera_scanner.load_libraries)
+
+        # Checkouts update the forecasts of what they sell; this pass lets items that stopped selling decay
+        models.refresh_forecasts_async()
+        self._forecast_timer.start(FORECAST_REFRESH_MS)
+
+    def _on_deferred_loaded(self, busy):
+        if busy:
+            return
+        self.executor.busy_changed.disconnect(self._on_deferred_loaded)
+        PROFILE.mark("background_ready")
+        PROFILE.write()
+
+    def _on_tab_changed(self, index):
+        if self.tabs.widget(index) is self.sales_tab and not self._sales_loaded:
+            self._load_sales_tab()
+
+    def _set_busy(self, busy):
+        self.lbl_busy.setVisible(busy)
+        self.busy_bar.setVisible(busy)
+
     def _setup_autocomplete(self):
-        # Setup autocomplete with just product names, not barcodes
-        all_items = models.get_items()
-        suggestions = [item['name'] for item in all_items if item['name']]
-        completer = QCompleter(suggestions)
+        # Setup autocomplete with just product names, not barcodes; names are filled in once loaded
+        self._completer_names = {}
+        self._completer_model = QStringListModel([], self)
+        completer = QCompleter(self._completer_model, self)
         completer.setCaseSensitivity(Qt.CaseInsensitive)
         completer.setFilterMode(Qt.MatchContains)  # Allow partial matching
         self.in_name.setCompleter(completer)
-        
+
         # Connect completer selection to fill other fields
         completer.activated.connect(self._on_autocomplete_selected)
 
+    def _on_completer_names_loaded(self, names):
+        loaded = {item_id: name for item_id, name in names if name}
+        loaded.update(self._completer_names) # Names patched in while loading are newer
+        self._completer_names = loaded
+        self._completer_model.setStringList(list(loaded.values()))
+
+    def _completer_set_name(self, item_id, name):
+        """Add, rename or (name=None) remove one item's entry in the autocomplete list."""
+        model = self._completer_model
+        old_name = self._completer_names.pop(item_id, None)
+        if old_name is not None and model.rowCount() > 0:
+            hits = model.match(model.index(0, 0), Qt.DisplayRole, old_name, 1,
+                               Qt.MatchFixedString | Qt.MatchCaseSensitive)
+            if hits:
+                model.removeRow(hits[0].row())
+        if name:
+            self._completer_names[item_id] = name
+            row = model.rowCount()
+            model.insertRow(row)
+            model.setData(model.index(row, 0), name)
+
+    def _on_data_changed(self, event, payload):
+        """Patch only the rows and aggregates touched by a committed write (re-read on the executor)."""
+        if event == "category_added":
+            self._load_categories()
+        elif event in ("item_added", "item_updated"):
+            self._submit_latest([("item", payload["item_id"])], models.get_item, payload["item_id"],
+                                on_result=lambda item, _: self._on_changed_item_loaded(event, item))
+        elif event == "item_deleted":
+            self._supersede([("item", payload["item_id"])])
+            self.stock_model.remove_item(payload["item_id"])
+            self._completer_set_name(payload["item_id"], None)
+            # Its sale details were cascaded away; refresh them if that sale is on screen
+            if self._selected_sale_id() in payload["sale_ids"]:
+                self._sales_view_selected()
+        elif event == "forecasts_refreshed":
+            self.stock_model.update_stock({}, payload["forecasts"])
+        elif event == "items_imported":
+            # A chunk of an import touched up to a thousand rows: reload rather than patch, coalesced
+            self._import_new_categories = self._import_new_categories or bool(payload["category_ids"])
+            if not self._import_reload_timer.isActive():
+                self._import_reload_timer.start()
+        elif event in ("sale_added", "sale_updated", "sale_deleted"):
+            self._patch_stock_rows(payload["item_ids"], payload.get("stock_levels"), payload.get("forecasts"))
+            if not self._sales_loaded:
+                return # Nothing to patch; the sales tab reads it all when first shown
+            sale_id = payload["sale_id"]
+            if event == "sale_deleted":
+                self._supersede([("sale", sale_id)]) # A read still in flight must not put it back
+                self.sales_model.remove_row(sale_id)
+                self._refresh_sales_kpis()
+            else:
+                self._submit_latest([("sale", sale_id)], models.get_sale, sale_id,
+                                    on_result=lambda sale, _: self._on_changed_sale_loaded(event, sale_id, sale))
+
+    def _supersede(self, keys):
+        """Mark any read in flight for these rows as stale; returns the new sequence numbers."""
+        for key in keys:
+            self._read_seq[key] = next(self._read_ids)
+        return {key: self._read_seq[key] for key in keys}
+
+    def _submit_latest(self, keys, fn, *args, on_result):
+        """
+        Run fn(*args) on the executor for the rows named by keys. Reads can
+        finish out of order on the pool, so on_result(result, fresh_keys) only
+        gets the keys no later read or change has superseded (and is skipped if none).
+        """
+        issued = self._supersede(keys)
+
+        def deliver(result):
+            fresh = {key for key, seq in issued.items() if self._read_seq.get(key) == seq}
+            for key in fresh:
+                del self._read_seq[key]
+            if fresh:
+                on_result(result, fresh)
+        self.executor.submit(fn, *args, on_result=deliver)
+
+    def _on_changed_item_loaded(self, event, item):
+        if item is None:
+            return # Deleted meanwhile; item_deleted removes its row
+        if event == "item_added":
+            self.stock_model.insert_item(item)
+        else:
+            self._update_stock_row(item)
+        self._completer_set_name(item["id"], item["name"])
+
+    def _update_stock_row(self, item):
+        """Patch one loaded stock row in place, or move it to its sorted place if it was renamed."""
+        row = self.stock_model.row_of_item(item["id"])
+        if row is None:
+            return
+        if self.stock_model.row_data(row)["name"] == item["name"]:
+            self.stock_model.update_item(item)
+            return
+        # The table is in (name, id) order: the row is removed and inserted again (or left to fetchMore)
+        was_selected = self._selected_row(self.tbl_stock) == row
+        self.stock_model.update_item(item)
+        new_row = self.stock_model.row_of_item(item["id"])
+        if was_selected and new_row is not None:
+            self.tbl_stock.selectRow(new_row)
+            self.tbl_stock.scrollTo(self.stock_model.index(new_row, 0))
+
+    def _on_changed_sale_loaded(self, event, sale_id, sale):
+        if sale is None:
+            self.sales_model.remove_row(sale_id) # Deleted before this notification arrived
+            return
+        if event == "sale_added":
+            if self.sales_model.matches(sale):
+                self.sales_model.insert_row(sale)
+            self._patch_kpis_for_new_sale(sale)
+        else:
+            if self.sales_model.matches(sale):
+                self.sales_model.update_row(sale)
+            else:
+                self.sales_model.remove_row(sale_id)
+            self._refresh_sales_kpis()
+            if self._selected_sale_id() == sale_id:
+                self._sales_view_selected()
+
+    def _patch_stock_rows(self, item_ids, stock_levels=None, forecasts=None):
+        if stock_levels:
+            self.stock_model.update_stock(stock_levels, forecasts)
+        elif item_ids:
+            self._submit_latest([("item", item_id) for item_id in item_ids], models.get_items_by_ids, item_ids,
+                                on_result=self._on_changed_items_loaded)
+
+    def _on_changed_items_loaded(self, items, fresh):
+        for item_id, item in items.items():
+            if ("item", item_id) in fresh:
+                self._update_stock_row(item)
+
     def _toggle_max_restore(self):
         # This function is no longer needed as window controls are removed from UI
         pass 
@@ -129,10 +336,9 @@ class Controller(MainUI):
 
     def _update_table_responsiveness(self):
         try:
+            # tbl_stock and tbl_sales are left to their headers' ResizeToContents modes, which only measure loaded rows
             tables = [
                 (self.tbl_bill, [2, 3, 4]), # Columns for price, qty, total
-                (self.tbl_stock, [2, 3, 4, 5, 6, 8]), # Columns for category, barcode, price, stock, status, add_date
-                (self.tbl_sales, [0, 1, 2]), # Columns for sale_id, datetime, total_price
                 (self.tbl_sale_details, [2, 3, 4, 5]) # Columns for price_each, quantity, subtotal, purchase_price_each
             ]
             for table, cols in tables:
@@ -191,7 +397,9 @@ class Controller(MainUI):
 
     # Categories
     def _load_categories(self):
-        cats = models.get_categories()
+        self.executor.submit(models.get_categories, on_result=self._fill_categories)
+
+    def _fill_categories(self, cats):
         self.stk_cat.clear()
         for c in cats:
             self.stk_cat.addItem(c["name"], c["id"])
@@ -200,8 +408,7 @@ class Controller(MainUI):
         name, ok = QInputDialog.getText(self, "تصنيف جديد", "اسم التصنيف:")
         if ok and name.strip():
             try:
-                models.add_category(name.strip())
-                self._load_categories()
+                models.add_category(name.strip()) # The category_added notification reloads the lists
                 self.msg("تم", "تم إضافة التصنيف.")
             except Exception as e:
                 QMessageBox.warning(self, "خطأ", f"تعذر إضافة التصنيف:\n{e}")
@@ -210,38 +417,64 @@ class Controller(MainUI):
     def _browse_photo(self):
         path, _ = QFileDialog.getOpenFileName(self, "اختر صورة", "", "Images (*.png *.jpg *.jpeg *.bmp)")
         if path:
-            self.stk_photo.setText(path)
-            self.set_preview_image(path)
+            # Copied into the photo store (deduplicated) and thumbnailed on a worker
+            self.executor.submit_long(photos.ingest_file, path, on_result=self._on_photo_stored,
+                                 on_error=self._on_photo_failed)
 
     def _capture_photo(self):
-        if cv2 is None:
+        if camera_scanner.load_libraries() is None:
             QMessageBox.warning(self, "الكاميرا", "OpenCV غير مثبت.")
             return
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
+        self.btn_camera_scan.setChecked(False) # The scanner and the capture can't share the camera
+        try:
+            source = camera_scanner.open_source(CAMERA_SOURCE)
+        except RuntimeError:
             QMessageBox.warning(self, "الكاميرا", "تعذر فتح الكاميرا.")
             return
-        QMessageBox.information(self, "التقاط", "سيتم فتح نافذة الكاميرا.")
-        path_saved = None
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            cv2.imshow("Camera - Press C to capture, Q to cancel", frame)
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('c'):
-                fname = f"photo_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-                path_saved = os.path.join(ASSETS_PHOTOS_DIR, fname)
-                cv2.imwrite(path_saved, frame)
-                break
-            elif key == ord('q'):
-                break
-        cap.release()
-        cv2.destroyAllWindows()
-        if path_saved:
-            self.stk_photo.setText(path_saved)
-            self.set_preview_image(path_saved)
-            self.msg("تم", f"تم حفظ الصورة: {path_saved}")
+        dialog = PhotoCaptureDialog(self)
+        self.photo_frame.connect(dialog.show_frame)
+        grabber = photos.FrameGrabber(source, lambda frame: self.photo_frame.emit(_preview_image(frame))).start()
+        try:
+            accepted = dialog.exec_() == PhotoCaptureDialog.Accepted
+        finally:
+            grabber.stop()
+            self.photo_frame.disconnect(dialog.show_frame)
+        frame = grabber.latest()
+        if accepted and frame is not None:
+            # JPEG encoding, hashing and the thumbnail all happen off the GUI thread
+            self.executor.submit_long(photos.ingest_frame, frame, on_result=self._on_photo_stored,
+                                 on_error=self._on_photo_failed)
+
+    def _on_photo_stored(self, path):
+        self.stk_photo.setText(path)
+        self.set_preview_image(path)
+
+    def _on_photo_failed(self, error):
+        QMessageBox.warning(self, "الصورة", f"تعذر حفظ الصورة:\n{error}")
+
+    def set_preview_image(self, path):
+        """Show a photo's thumbnail from the cache, making it on a worker if needed; never loads the full image here."""
+        self._preview_path = path or None
+        if not path:
+            super().set_preview_image("")
+            return
+        pixmap = self._thumb_cache.get(path)
+        if pixmap is not None:
+            self.lbl_preview.setPixmap(pixmap)
+            return
+        self.executor.submit(photos.ensure_thumbnail, path,
+                             on_result=lambda thumb: self._on_thumbnail_ready(path, thumb))
+
+    def _on_thumbnail_ready(self, path, thumb):
+        pixmap = QPixmap(thumb) if thumb else QPixmap()
+        if not pixmap.isNull():
+            self._thumb_cache.put(path, pixmap)
+        if self._preview_path != path:
+            return # The selection moved on while the thumbnail was made
+        if pixmap.isNull():
+            super().set_preview_image("")
+        else:
+            self.lbl_preview.setPixmap(pixmap)
 
     def _stock_add(self):
         try:
@@ -265,11 +498,8 @@ class Controller(MainUI):
                 
             photo = self.stk_photo.text().strip() or None
             models.add_item(name, cat_id, barcode or None, price, qty, photo, purchase_price=purchase_price)
-            self._load_stock_table()
             self.msg("تم", "تمت إضافة الصنف.")
             self._clear_stock_form()
-            # Refresh autocomplete suggestions
-            self._setup_autocomplete()
         except Exception as e:
             QMessageBox.warning(self, "خطأ", f"تعذر إضافة الصنف:\n{e}")
 
@@ -278,7 +508,7 @@ class Controller(MainUI):
         if row is None:
             self.msg("تنبيه", "اختر صفًا للتعديل.")
             return
-        item_id = int(self.tbl_stock.item(row, 0).text())
+        item_id = self.stock_model.row_data(row)["id"]
         try:
             name = self.stk_name.text().strip()
             if not name:
@@ -300,10 +530,7 @@ class Controller(MainUI):
                 
             photo = self.stk_photo.text().strip() or None
             models.update_item(item_id, name, cat_id, barcode or None, price, qty, photo, purchase_price=purchase_price)
-            self._load_stock_table()
             self.msg("تم", "تم تعديل الصنف.")
-            # Refresh autocomplete suggestions
-            self._setup_autocomplete()
         except Exception as e:
             QMessageBox.warning(self, "خطأ", f"تعذر تعديل الصنف:\n{e}")
 
@@ -312,16 +539,12 @@ class Controller(MainUI):
         if row is None:
             self.msg("تنبيه", "اختر صفًا للحذف.")
             return
-        item_id = int(self.tbl_stock.item(row, 0).text())
+        item_id = self.stock_model.row_data(row)["id"]
         confirm = QMessageBox.question(self, "تأكيد", "سيتم حذف الصنف وجميع تفاصيل البيع المرتبطة به.\nهل أنت متأكد؟", QMessageBox.Yes | QMessageBox.No)
         if confirm == QMessageBox.Yes:
             try:
                 models.delete_item(item_id)
-                self._load_stock_table()
                 self.msg("تم", "تم حذف الصنف.")
-                # Refresh autocomplete suggestions and sales tab as data might have changed
-                self._setup_autocomplete()
-                self._load_sales_tab()
             except Exception as e:
                 QMessageBox.warning(self, "خطأ", f"تعذر حذف الصنف:\n{e}")
 
@@ -338,54 +561,63 @@ class Controller(MainUI):
         row = self._selected_row(self.tbl_stock)
         if row is None:
             return
-        self.stk_name.setText(self.tbl_stock.item(row, 1).text())
-        cat_name = self.tbl_stock.item(row, 2).text()
+        r = self.stock_model.row_data(row)
+        self.stk_name.setText(r["name"])
+        cat_name = r["category_name"] or "غير مصنّف"
         idx = self.stk_cat.findText(cat_name)
         if idx >= 0:
             self.stk_cat.setCurrentIndex(idx)
-        self.stk_barcode.setText(self.tbl_stock.item(row, 3).text())
-        self.stk_price.setValue(float(self.tbl_stock.item(row, 4).text()))
-        self.stk_qty.setValue(float(self.tbl_stock.item(row, 5).text()))
-        # Get purchase price from column 10 (hidden)
-        if self.tbl_stock.columnCount() > 10: # Ensure the column exists
-            purchase_price = float(self.tbl_stock.item(row, 10).text() or "0")
-            self.stk_purchase_price.setValue(purchase_price)
-        self.stk_photo.setText(self.tbl_stock.item(row, 7).text())
-        self.set_preview_image(self.tbl_stock.item(row, 7).text())
+        self.stk_barcode.setText(r["barcode"] or "")
+        self.stk_price.setValue(float(r["price"]))
+        self.stk_qty.setValue(float(max(0, r["stock_count"] or 0)))
+        self.stk_purchase_price.setValue(float(r["purchase_price"] or 0))
+        self.stk_photo.setText(r["photo_path"] or "")
+        self.set_preview_image(r["photo_path"] or "")
+
+    def _stock_import(self):
+        path, _ = QFileDialog.getOpenFileName(self, "استيراد الأصناف", "", "Catalogues (*.csv *.xlsx)")
+        if not path:
+            return
+        self.btn_stk_import.setEnabled(False)
+        self.executor.submit_long(importer.import_items, path, progress=self.import_progress.emit,
+                             on_result=self._on_import_done, on_error=self._on_import_failed)
+
+    def _on_import_progress(self, fraction, summary):
+        self.lbl_busy.setText(f"جارٍ الاستيراد... {fraction:.0%} ({summary['inserted'] + summary['updated']} صنف)")
+
+    def _reload_after_import(self):
+        self._import_reload_timer.stop()
+        self.stock_model.reload()
+        self._completer_names = {}
+        self.executor.submit(models.get_item_names, on_result=self._on_completer_names_loaded)
+        if self._import_new_categories:
+            self._import_new_categories = False
+            self._load_categories()
+
+    def _on_import_done(self, summary):
+        if self._import_reload_timer.isActive():
+            self._reload_after_import() # Show the last chunks now rather than after the interval
+        self.btn_stk_import.setEnabled(True)
+        self.lbl_busy.setText(self._busy_text)
+        text = (f"تمت قراءة {summary['read']} سطر.\n"
+                f"أصناف جديدة: {summary['inserted']}\n"
+                f"أصناف محدّثة: {summary['updated']}\n"
+                f"أسطر مرفوضة: {summary['rejected']}")
+        if summary["rejects_path"]:
+            text += f"\n\nالأسطر المرفوضة وأسبابها في:\n{summary['rejects_path']}"
+        self.msg("الاستيراد", text)
+
+    def _on_import_failed(self, error):
+        if self._import_reload_timer.isActive():
+            self._reload_after_import()
+        self.btn_stk_import.setEnabled(True)
+        self.lbl_busy.setText(self._busy_text)
+        # Chunks committed before the error stay imported
+        QMessageBox.warning(self, "خطأ", f"تعذر استيراد الملف:\n{error}")
 
     def _load_stock_table(self):
-        items = models.get_items()
-        self.tbl_stock.setRowCount(0)
-        for r in items:
-            row = self.tbl_stock.rowCount()
-            self.tbl_stock.insertRow(row)
-            self.tbl_stock.setItem(row, 0, QTableWidgetItem(str(r["id"])))
-            name_item = QTableWidgetItem(r["name"])
-            name_item.setFont(QFont(self._arabic_font.family(), 13, QFont.Bold))
-            self.tbl_stock.setItem(row, 1, name_item)
-            self.tbl_stock.setItem(row, 2, QTableWidgetItem(r["category_name"] or "غير مصنّف"))
-            self.tbl_stock.setItem(row, 3, QTableWidgetItem(r["barcode"] or ""))
-            self.tbl_stock.setItem(row, 4, QTableWidgetItem(fmt_money(r['price'])))
-            
-            # Ensure stock is never negative
-            stock_count = max(0, r['stock_count'] or 0)
-            stock_item = QTableWidgetItem(fmt_qty(stock_count))
-            if stock_count <= 0:
-                stock_item.setForeground(Qt.red)
-            self.tbl_stock.setItem(row, 5, stock_item)
-            
-            status_text = "نفد المخزون" if stock_count <= 0 else "متاح"
-            status_item = QTableWidgetItem(status_text)
-            if stock_count <= 0:
-                status_item.setForeground(Qt.red)
-            self.tbl_stock.setItem(row, 6, status_item)
-            self.tbl_stock.setItem(row, 7, QTableWidgetItem(r["photo_path"] or ""))
-            self.tbl_stock.setItem(row, 8, QTableWidgetItem(r["add_date"] or ""))
-            self.tbl_stock.setItem(row, 9, QTableWidgetItem(str(r["category_id"] or "")))
-            # Add purchase price column (hidden)
-            self.tbl_stock.setItem(row, 10, QTableWidgetItem(str(r["purchase_price"] or "0")))
-            self.tbl_stock.setRowHeight(row, 40)
-        self._update_table_responsiveness()
+        # The model pages rows in as the view scrolls; this only resets to the first page
+        self.stock_model.reload()
 
     # Bill Methods
     def _process_item_from_dialog_result(self, item_details):
@@ -408,13 +640,11 @@ class Controller(MainUI):
                 default_cat = models.get_category_by_name("غير مصنّف")
                 cat_id = default_cat["id"] if default_cat else None
                 
-                models.add_item(name, cat_id, barcode_to_save or None, price, qty, None, purchase_price=price)
+                item_id = models.add_item(name, cat_id, barcode_to_save or None, price, qty, None, purchase_price=price)
+                item_from_db = models.get_item(item_id)
                 self.msg("تم", f"تم حفظ المنتج '{name}' في قاعدة البيانات.")
-                self._load_stock_table()
-                self._setup_autocomplete() # Refresh autocomplete
                 
                 # Now add it to the bill as a regular item
-                item_from_db = models.get_item_by_barcode(barcode_to_save) or models.search_items_by_name(name)[0]
                 return self._add_item_to_current_bill(
                     item_from_db["id"], 
                     item_from_db["name"], 
@@ -469,6 +699,47 @@ class Controller(MainUI):
         # Always set focus back to barcode for next scan
         self.in_barcode.setFocus()
 
+    def _toggle_camera_scan(self, checked):
+        if not checked:
+            if self._scan_pipeline is not None:
+                self._scan_pipeline.stop()
+                self._scan_pipeline = None
+            return
+        if self._scan_pipeline is not None:
+            return
+        camera_scanner.load_libraries() # Normally already imported in the background after startup
+        if camera_scanner.zbar_decode is None:
+            self.btn_camera_scan.setChecked(False)
+            QMessageBox.warning(self, "الكاميرا", "مكتبة pyzbar غير مثبتة.")
+            return
+        try:
+            source = camera_scanner.open_source(CAMERA_SOURCE)
+        except RuntimeError:
+            self.btn_camera_scan.setChecked(False)
+            QMessageBox.warning(self, "الكاميرا", "تعذر فتح الكاميرا.")
+            return
+        self._scan_pipeline = camera_scanner.ScanPipeline(
+            source, self.camera_scanned.emit, on_finished=self.camera_stopped.emit).start()
+        self.in_barcode.setFocus()
+
+    def _on_camera_barcode(self, code):
+        # Reads that arrive while the item dialog is open would stack a second dialog on top of it
+        if QApplication.activeModalWidget() is not None:
+            return
+        self.in_barcode.setText(code)
+        self._handle_scanned_barcode()
+
+    def _on_camera_stopped(self):
+        # The source ran out or failed (a stop from the button has already cleared the pipeline)
+        if self._scan_pipeline is not None and not self._scan_pipeline.is_running():
+            self._scan_pipeline = None
+            self.btn_camera_scan.setChecked(False)
+
+    def closeEvent(self, event):
+        if self._scan_pipeline is not None:
+            self._scan_pipeline.stop() # Releases the camera
+        super().closeEvent(event)
+
     def _bill_find_and_add_item_dialog(self):
         """Unified method for 'بحث' و 'إضافة إلى الفاتورة' buttons."""
         barcode = self.in_barcode.text().strip()
@@ -558,7 +829,8 @@ class Controller(MainUI):
         row = self.tbl_bill.rowCount()
         self.tbl_bill.insertRow(row)
         
-        total = price * qty
+        # Rounded per line exactly as models.checkout will store it
+        total = money.from_minor(money.line_total(qty, money.to_minor(price)))
         
         self.tbl_bill.setItem(row, 0, QTableWidgetItem(barcode or ""))
         name_item = QTableWidgetItem(name)
@@ -596,11 +868,12 @@ class Controller(MainUI):
         self._bill_recalc_total()
 
     def _bill_recalc_total(self):
-        total_price = 0
-        total_purchase_price = 0
-        for item_data in self.current_bill_items:
-            total_price += item_data["total"]
-            total_purchase_price += item_data["qty"] * item_data["purchase_price"] # Calculate for bill items
+        # Summed in minor units so long bills don't pick up float drift
+        total_price = money.add(*(item_data["total"] for item_data in self.current_bill_items))
+        total_purchase_price = money.add(*(
+            money.from_minor(money.line_total(item_data["qty"], money.to_minor(item_data["purchase_price"])))
+            for item_data in self.current_bill_items
+        ))
         
         self.lbl_total.setText(f"الإجمالي: {fmt_money(total_price)} {self.currency}")
         # Store total purchase price temporarily if needed for printing/display before saving
@@ -611,46 +884,24 @@ class Controller(MainUI):
             self.msg("تنبيه", "لا توجد أصناف في الفاتورة.")
             return
         try:
-            total_sale_price = 0
-            total_sale_purchase_price = 0
-            items_to_save_details = []
-
-            for item_data in self.current_bill_items:
-                if not item_data["is_custom"]: # Only save items that are in the database
-                    total_sale_price += item_data["total"]
-                    total_sale_purchase_price += item_data["qty"] * item_data["purchase_price"]
-                    items_to_save_details.append(item_data)
+            # Only save items that are in the database
+            items_to_save_details = [item_data for item_data in self.current_bill_items if not item_data["is_custom"]]
             
             if not items_to_save_details:
                 self.msg("تنبيه", "لا توجد أصناف قابلة للحفظ في الفاتورة (جميعها منتجات مخصصة وغير محفوظة).")
                 return
 
-            # Create sale record
-            sale_id = models.add_sale(total_sale_price, total_sale_purchase_price)
-            
-            # Add sale details
-            for item_data in items_to_save_details:
-                models.add_sale_detail(
-                    sale_id, 
-                    item_data["id"], 
-                    item_data["qty"], 
-                    item_data["price"], 
-                    item_data["purchase_price"]
-                )
+            # Sale record, details and stock deductions are committed together
+            sale_id, _stock_levels = models.checkout(items_to_save_details)
             
             # Clear bill
             self.tbl_bill.setRowCount(0)
             self.current_bill_items.clear()
             self._bill_recalc_total()
             
-            # Show success message
+            # Show success message (stock rows, sales row and KPIs were already patched by the change listener)
             self.msg("تم", f"تم حفظ الفاتورة رقم {sale_id}.")
             
-            # Refresh sales tab
-            self._load_sales_tab()
-            # Refresh stock table as stock counts would have changed
-            self._load_stock_table()
-            
         except Exception as e:
             QMessageBox.warning(self, "خطأ", f"تعذر حفظ الفاتورة:\n{e}")
 
@@ -723,7 +974,7 @@ class Controller(MainUI):
             price = item_data["price"]
             qty = item_data["qty"]
             total = item_data["total"]
-            current_total_price += item_data["total"]
+            current_total_price = money.add(current_total_price, item_data["total"])
             
             html += f"""
                     <tr>
@@ -758,6 +1009,7 @@ class Controller(MainUI):
         - يمكنك مسح الباركود مباشرة في حقل الباركود
         - يدعم النظام الباركود بطول 8، 12، 13 رقمًا
         - اضغط Enter بعد مسح الباركود للبحث تلقائيًا
+        - بدون ماسح: فعّل زر "مسح بالكاميرا" ثم قرّب الباركود من وسط الكاميرا
         
         خيارات البحث:
         - عند مسح باركود أو البحث عن منتج (باستخدام زر 'بحث' أو 'إضافة إلى الفاتورة' في تبويب الفاتورة)، ستظهر نافذة منبثقة تفاعلية.
@@ -770,12 +1022,104 @@ class Controller(MainUI):
 
     # Sales Methods
     def _load_sales_tab(self):
-        sales = models.get_sales()
-        self.tbl_sales.setRowCount(0)
-        
+        if not self._sales_loaded and self.tabs.currentWidget() is not self.sales_tab:
+            return # Settings and filter changes before the tab was ever shown; it loads on first show
+        self._sales_loaded = True
         # Update Global KPIs (Revenue & Profit for all time and today)
-        all_time_kpis = models.get_revenue_and_profit_all_time()
-        today_kpis = models.get_revenue_and_profit_today()
+        self._refresh_sales_kpis()
+        
+        # Load the newest page of sales; older pages are fetched as the table scrolls
+        self.sales_model.currency = self.currency
+        if self.chk_sale_filter.isChecked():
+            self.sales_model.set_filters(
+                date_from=self.sale_date_from.date().toString("yyyy-MM-dd"),
+                date_to=self.sale_date_to.date().toString("yyyy-MM-dd"),
+            )
+        else:
+            self.sales_model.set_filters()
+        self._sales_view_selected() # A reset drops the selection; clear the details view to match
+        self._update_table_responsiveness()
+
+    def _sales_export(self):
+        """Export the sale lines in the filtered date range (or all of them) on a worker thread."""
+        path, _ = QFileDialog.getSaveFileName(self, "تصدير المبيعات", "sales.csv",
+                                              "CSV (*.csv);;Parquet (*.parquet);;Arrow (*.arrow)")
+        if not path:
+            return
+        date_from = date_to = None
+        if self.chk_sale_filter.isChecked():
+            date_from = self.sale_date_from.date().toString("yyyy-MM-dd")
+            date_to = self.sale_date_to.date().toString("yyyy-MM-dd")
+        self.btn_sale_export.setEnabled(False)
+        self.executor.submit_long(exporter.export_sales, path, date_from, date_to,
+                             on_result=lambda written: self._on_export_done(path, written),
+                             on_error=self._on_export_failed)
+
+    def _on_export_done(self, path, written):
+        self.btn_sale_export.setEnabled(True)
+        self.msg("التصدير", f"تم تصدير {written} سطر بيع إلى:\n{path}")
+
+    def _on_export_failed(self, error):
+        self.btn_sale_export.setEnabled(True)
+        QMessageBox.warning(self, "خطأ", f"تعذر تصدير المبيعات:\n{error}")
+
+    def _sales_report(self):
+        """Product performance for the filtered date range (or all time); cached per range in reports."""
+        date_from = date_to = None
+        if self.chk_sale_filter.isChecked():
+            date_from = self.sale_date_from.date().toString("yyyy-MM-dd")
+            date_to = self.sale_date_to.date().toString("yyyy-MM-dd")
+        self.btn_sale_report.setEnabled(False)
+        self.executor.submit_long(_build_report_html, date_from, date_to, self.currency,
+                             on_result=self._on_report_ready, on_error=self._on_report_failed)
+
+    def _on_report_ready(self, html):
+        self.btn_sale_report.setEnabled(True)
+        ReportDialog(self, "تقرير أداء المنتجات", html).exec_()
+
+    def _on_report_failed(self, error):
+        self.btn_sale_report.setEnabled(True)
+        QMessageBox.warning(self, "خطأ", f"تعذر إنشاء التقرير:\n{error}")
+
+    def _on_sale_filter_dates_changed(self):
+        if self.chk_sale_filter.isChecked():
+            self._load_sales_tab()
+
+    def _selected_sale_id(self):
+        row = self._selected_row(self.tbl_sales)
+        return self.sales_model.row_data(row)["id"] if row is not None else None
+
+    def _refresh_sales_kpis(self):
+        self._kpis_loading = True
+        self.executor.submit(_read_sales_kpis, on_result=self._on_sales_kpis_loaded)
+
+    def _on_sales_kpis_loaded(self, kpis):
+        self._kpis_loading = False
+        self._kpis = kpis
+        self._show_sales_kpis()
+
+    def _patch_kpis_for_new_sale(self, sale):
+        """Fold one new sale into the cached KPIs instead of re-aggregating every sale."""
+        if self._kpis is None or self._kpis_loading:
+            # A read is in flight and may or may not include this sale; read again
+            self._refresh_sales_kpis()
+            return
+        revenue = sale["total_price"]
+        profit = money.add(sale["total_price"], -sale["total_purchase_price"])
+        scopes = [self._kpis["all_time"]]
+        if sale["datetime"].startswith(datetime.now().strftime("%Y-%m-%d")):
+            scopes.append(self._kpis["today"])
+        for kpis in scopes:
+            kpis["total_revenue"] = money.add(kpis["total_revenue"], revenue)
+            kpis["total_profit"] = money.add(kpis["total_profit"], profit)
+        latest = self._kpis["latest"]
+        if latest is None or sale["datetime"] >= latest["datetime"]:
+            self._kpis["latest"] = sale
+        self._show_sales_kpis()
+
+    def _show_sales_kpis(self):
+        all_time_kpis = self._kpis["all_time"]
+        today_kpis = self._kpis["today"]
 
         total_sales_revenue = all_time_kpis["total_revenue"]
         total_sales_profit = all_time_kpis["total_profit"]
@@ -788,33 +1132,30 @@ class Controller(MainUI):
         self.lbl_today_sales.setText(f"مبيعات اليوم (إيرادات): {fmt_money(today_sales_revenue)} {self.currency}")
         self.lbl_today_profit.setText(f"ربح اليوم: {fmt_money(today_sales_profit)} {self.currency}")
 
-        latest_sale = models.get_latest_sale()
+        latest_sale = self._kpis["latest"]
         if latest_sale:
             latest_text = f"آخر عملية: #{latest_sale['id']} - {latest_sale['datetime']} - {fmt_money(latest_sale['total_price'])} {self.currency}"
             self.lbl_latest_sale.setText(latest_text)
         else:
             self.lbl_latest_sale.setText("آخر عملية: لا توجد مبيعات")
-        
-        # Load sales table
-        for r in sales:
-            row = self.tbl_sales.rowCount()
-            self.tbl_sales.insertRow(row)
-            self.tbl_sales.setItem(row, 0, QTableWidgetItem(str(r["id"])))
-            self.tbl_sales.setItem(row, 1, QTableWidgetItem(r["datetime"]))
-            self.tbl_sales.setItem(row, 2, QTableWidgetItem(f"{fmt_money(r['total_price'])} {self.currency}"))
-            self.tbl_sales.setRowHeight(row, 35)
-        self._update_table_responsiveness()
 
     def _sales_view_selected(self):
         row = self._selected_row(self.tbl_sales)
         if row is None:
+            self._supersede([("sale details",)])
             self.tbl_sale_details.setRowCount(0)
             self.lbl_total_revenue.setText(f"إجمالي الإيرادات: 0.00 {self.currency}")
             self.lbl_total_profit.setText(f"إجمالي الربح: 0.00 {self.currency}")
             self.lbl_profit_margin.setText(f"هامش الربح: 0%")
             return
-        sale_id = int(self.tbl_sales.item(row, 0).text())
-        details = models.get_sale_details(sale_id)
+        sale_id = self.sales_model.row_data(row)["id"]
+        # The newest selection's read wins; one for an earlier selection is dropped
+        self._submit_latest([("sale details",)], models.get_sale_details, sale_id,
+                            on_result=lambda details, _: self._show_sale_details(sale_id, details))
+
+    def _show_sale_details(self, sale_id, details):
+        if self._selected_sale_id() != sale_id:
+            return
         self.tbl_sale_details.setRowCount(0)
         
         total_revenue_for_sale = 0
@@ -858,16 +1199,13 @@ class Controller(MainUI):
         if row is None:
             self.msg("تنبيه", "اختر عملية بيع للحذف.")
             return
-        sale_id = int(self.tbl_sales.item(row, 0).text())
+        sale_id = self.sales_model.row_data(row)["id"]
         confirm = QMessageBox.question(self, "تأكيد", "سيتم حذف عملية البيع بالكامل وستتم إعادة الأصناف إلى المخزون.\nهل أنت متأكد؟", QMessageBox.Yes | QMessageBox.No)
         if confirm == QMessageBox.Yes:
             try:
                 models.delete_sale(sale_id)
-                self._load_sales_tab()
                 self.tbl_sale_details.setRowCount(0)
                 self.msg("تم", "تم حذف عملية البيع.")
-                # Refresh stock table as well, since items were returned
-                self._load_stock_table()
             except Exception as e:
                 QMessageBox.warning(self, "خطأ", f"تعذر حذف عملية البيع:\n{e}")
 
@@ -880,13 +1218,8 @@ class Controller(MainUI):
         confirm = QMessageBox.question(self, "تأكيد", "سيتم حذف هذا الصنف من عملية البيع وستتم إعادته إلى المخزون.\nهل أنت متأكد؟", QMessageBox.Yes | QMessageBox.No)
         if confirm == QMessageBox.Yes:
             try:
+                # The change listener refreshes the details view, the sale's row, KPIs and stock
                 models.delete_sale_detail(detail_id)
-                # Refresh the view of the current sale and overall sales/stock
-                selected_sale_row = self._selected_row(self.tbl_sales)
-                if selected_sale_row is not None:
-                    self._sales_view_selected() # Refresh details
-                self._load_sales_tab() # Refresh overall sales KPIs
-                self._load_stock_table() # Refresh stock
                 self.msg("تم", "تم حذف الصنف من عملية البيع.")
             except Exception as e:
                 QMessageBox.warning(self, "خطأ", f"تعذر حذف الصنف:\n{e}")
@@ -906,20 +1239,16 @@ class Controller(MainUI):
         
         if ok1 and ok2:
             try:
+                # The change listener refreshes the details view, the sale's row, KPIs and stock
                 models.update_sale_detail(detail_id, new_qty, new_price)
-                # Refresh the view of the current sale and overall sales/stock
-                selected_sale_row = self._selected_row(self.tbl_sales)
-                if selected_sale_row is not None:
-                    self._sales_view_selected() # Refresh details
-                self._load_sales_tab() # Refresh overall sales KPIs
-                self._load_stock_table() # Refresh stock
                 self.msg("تم", "تم تعديل الصنف.")
             except Exception as e:
                 QMessageBox.warning(self, "خطأ", f"تعذر تعديل الصنف:\n{e}")
 
     # Helper methods
     def _selected_row(self, table):
-        selected = table.selectedItems()
+        # selectedIndexes works for both QTableWidget and model-backed QTableView
+        selected = table.selectionModel().selectedIndexes()
         if not selected:
             return None
         return selected[0].row()
@@ -936,3 +1265,73 @@ class Controller(MainUI):
         font = QFont(self.arabic_font.family(), 12)
         font.setBold(True)
         return font
+
+
+def _read_sales_kpis():
+    # Runs on a worker thread
+    return {
+        "all_time": models.get_revenue_and_profit_all_time(),
+        "today": models.get_revenue_and_profit_today(),
+        "latest": models.get_latest_sale(),
+    }
+
+def _build_report_html(date_from, date_to, currency):
+    """Runs on a worker thread: the report for one range as HTML (the dialog only displays it)."""
+    analysis = reports.analyze(date_from, date_to)
+    totals = analysis.totals()
+    period = escape(f"{date_from} — {date_to}") if date_from else "كل الفترات"
+    currency = escape(currency) # Set by the shop, like the item and category names below
+
+    def table(headers, rows):
+        head = "".join(f"<th>{h}</th>" for h in headers)
+        body = "".join("<tr>" + "".join(f"<td>{escape(str(cell))}</td>" for cell in row) + "</tr>" for row in rows)
+        return f"<table border='1' cellspacing='0' cellpadding='4' width='100%'><tr>{head}</tr>{body}</table>"
+
+    parts = [
+        f"<h2>تقرير أداء المنتجات ({period})</h2>",
+        f"<p>الإيرادات: {fmt_money(totals['revenue'])} {currency} — الربح: {fmt_money(totals['margin'])} {currency}"
+        f" — أسطر البيع: {totals['lines']} — الأصناف: {totals['items']}</p>",
+    ]
+    for by, title in (("revenue", "الأكثر إيرادًا"), ("quantity", "الأكثر مبيعًا (كمية)"), ("margin", "الأكثر ربحًا")):
+        parts.append(f"<h3>{title}</h3>")
+        parts.append(table(
+            ["الصنف", "التصنيف", "الكمية", "الإيرادات", "الربح", "هامش %"],
+            [[r["name"], r["category"] or "", fmt_qty(r["quantity"]), fmt_money(r["revenue"]),
+              fmt_money(r["margin"]), f"{r['margin_pct']:.1f}"] for r in analysis.top_sellers(by, 10)]))
+
+    summary = analysis.abc_classes()["summary"]
+    parts.append("<h3>تصنيف ABC (حسب الإيرادات)</h3>")
+    parts.append(table(["الفئة", "عدد الأصناف", "الإيرادات", "النسبة %"],
+                       [[label, s["items"], fmt_money(s["revenue"]), f"{s['share']:.1f}"] for label, s in summary.items()]))
+
+    parts.append("<h3>مساهمة التصنيفات</h3>")
+    parts.append(table(["التصنيف", "الكمية", "الإيرادات", "% من الإيرادات", "الربح", "% من الربح"],
+                       [[r["name"], fmt_qty(r["quantity"]), fmt_money(r["revenue"]), f"{r['revenue_share']:.1f}",
+                         fmt_money(r["margin"]), f"{r['margin_share']:.1f}"] for r in analysis.category_contribution()]))
+
+    # Heatmap: cell shade scales with revenue; only hours that ever had a sale are shown
+    grid = analysis.heatmap("revenue")
+    hours = [h for h in range(24) if any(day[h] for day in grid)]
+    peak = max((max(day) for day in grid), default=0) or 1
+    parts.append("<h3>الإيرادات حسب اليوم والساعة</h3>")
+    rows = []
+    def shade(value):
+        # Qt's rich text has no rgba(); blend white towards green by hand
+        f = value / peak
+        return "#%02x%02x%02x" % (round(255 - 209 * f), round(255 - 130 * f), round(255 - 205 * f))
+    for weekday, day in enumerate(grid):
+        cells = "".join(f"<td bgcolor='{shade(day[h])}'>{fmt_money(day[h])}</td>" for h in hours)
+        rows.append(f"<tr><th>{reports.WEEKDAYS[weekday]}</th>{cells}</tr>")
+    head = "".join(f"<th>{h:02d}</th>" for h in hours)
+    parts.append(f"<table border='1' cellspacing='0' cellpadding='3'><tr><th></th>{head}</tr>{''.join(rows)}</table>")
+    return "".join(parts)
+
+def _preview_image(frame, width=640):
+    """Runs on the capture thread: a BGR frame as an RGB QImage no wider than the preview."""
+    cv2 = camera_scanner.cv2 # Loaded before the capture started
+    if frame.shape[1] > width:
+        frame = cv2.resize(frame, (width, int(frame.shape[0] * width / frame.shape[1])), interpolation=cv2.INTER_AREA)
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    height, width = rgb.shape[:2]
+    # copy() detaches the image from the numpy buffer before it crosses threads
+    return QImage(rgb.data, width, height, rgb.strides[0], QImage.Format_RGB888).copy()
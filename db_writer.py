@@ -0,0 +1,160 @@
+# db_writer.py - One thread owns the write connection; mutations are queued to it and group-committed
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+import database
+
+
+class _WriteJob:
+    __slots__ = ("fn", "on_commit", "future")
+
+    def __init__(self, fn, on_commit):
+        self.fn = fn
+        self.on_commit = on_commit
+        self.future = Future()
+
+
+_STOP = object()
+
+
+class DatabaseWriter:
+    """
+    Serializes every write to one database file through a single thread.
+
+    submit(fn) queues fn(conn) and returns a concurrent.futures.Future for
+    its return value. Jobs that arrive within `batch_window` seconds of each
+    other (up to `max_batch`) run in one BEGIN IMMEDIATE transaction, each
+    inside its own savepoint, and are committed together: a failing job is
+    rolled back alone and only its future gets the exception.
+
+    on_commit(result), if given, runs on the writer thread after the commit
+    and before the future resolves, so caches and listeners are current by
+    the time a caller sees the result. A hook that raises is logged; the
+    future still gets the committed result. Jobs must not commit themselves.
+    """
+
+    def __init__(self, db_path, batch_window=0.001, max_batch=64):
+        self.db_path = db_path
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._stats = {"jobs": 0, "failed": 0, "commits": 0}
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, on_commit=None):
+        if threading.current_thread() is self._thread:
+            # The writer would wait on itself; writes from on_commit hooks must be queued elsewhere
+            raise RuntimeError("cannot submit a write from the writer thread")
+        job = _WriteJob(fn, on_commit)
+        self._queue.put(job)
+        return job.future
+
+    def run(self, fn, on_commit=None):
+        """Submit fn and wait for its committed result."""
+        return self.submit(fn, on_commit).result()
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def stats(self):
+        """Jobs run, jobs failed and commits made; jobs/commits is the average batch size."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def close(self, timeout=None):
+        """Finish every queued job, then stop the thread and close its connection."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    # ---------- Writer thread ----------
+    def _run(self):
+        conn = database.get_connection(self.db_path)
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._run_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is _STOP:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _run_batch(self, conn, batch):
+        jobs = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        while jobs:
+            jobs = self._run_transaction(conn, jobs)
+
+    def _run_transaction(self, conn, jobs):
+        """Run jobs in one transaction; returns the jobs to retry if it had to be abandoned."""
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except Exception as e:
+            self._fail(jobs, e)
+            return []
+        done = [] # (job, result) for jobs whose work is in the open transaction
+        for i, job in enumerate(jobs):
+            try:
+                conn.execute("SAVEPOINT job")
+                result = job.fn(conn)
+                conn.execute("RELEASE job")
+            except Exception as e:
+                try:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                except Exception:
+                    # The error took the whole transaction with it (e.g. disk full);
+                    # fail this job and run the others again in a fresh one
+                    conn.rollback()
+                    self._fail([job], e)
+                    return [j for j, _ in done] + jobs[i + 1:]
+                self._fail([job], e)
+            else:
+                done.append((job, result))
+        try:
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            self._fail([job for job, _ in done], e)
+            return []
+        with self._stats_lock:
+            self._stats["commits"] += 1
+            self._stats["jobs"] += len(done)
+        for job, result in done:
+            if job.on_commit is not None:
+                try:
+                    job.on_commit(result)
+                except Exception:
+                    # The write is committed regardless: log the hook, and let the future report the write alone
+                    # (a caller told its committed sale failed would save it a second time)
+                    traceback.print_exc()
+            job.future.set_result(result)
+        return []
+
+    def _fail(self, jobs, error):
+        with self._stats_lock:
+            self._stats["failed"] += len(jobs)
+        for job in jobs:
+            if not job.future.done():
+                job.future.set_exception(error)
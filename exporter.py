@@ -0,0 +1,159 @@
+# exporter.py - Stream sale lines for a date range to CSV or Parquet/Arrow for accounting
+"""
+Usage: python exporter.py out.csv|out.parquet|out.arrow [date_from] [date_to] [store.db]
+
+Dates are inclusive YYYY-MM-DD days; leave them out to export everything.
+Rows are pulled from one cursor in fetchmany batches and written as they
+arrive, so memory stays flat however many sale lines are in the range.
+"""
+import os
+import sys
+import csv
+from datetime import datetime, timedelta
+
+import database
+import models
+from money import from_minor
+
+pa = pq = None # pyarrow is imported by the first Parquet/Arrow export, not at startup
+
+# (column, header for CSV, arrow type name) in output order
+COLUMNS = (
+    ("sale_id", "رقم العملية", "int64"),
+    ("datetime", "التاريخ", "string"),
+    ("line_id", "رقم السطر", "int64"),
+    ("item_id", "رقم الصنف", "int64"),
+    ("barcode", "الباركود", "string"),
+    ("item_name", "الصنف", "string"),
+    ("category", "التصنيف", "string"),
+    ("quantity", "الكمية", "float64"),
+    ("price_each", "سعر الوحدة", "float64"),
+    ("purchase_price_each", "سعر الشراء", "float64"),
+    ("subtotal", "المجموع", "float64"),
+)
+_MONEY_COLUMNS = tuple(i for i, (name, _, _) in enumerate(COLUMNS)
+                       if name in ("price_each", "purchase_price_each", "subtotal"))
+
+# Walks idx_sales_datetime_id in order, then each sale's lines through idx_sale_details_sale_item
+_LINES_SQL = """
+    SELECT s.id, s.datetime, sd.id, sd.item_id, i.barcode, i.name, c.name,
+           sd.quantity, sd.price_each, sd.purchase_price_each, sd.subtotal
+    FROM sales s
+    JOIN sale_details sd ON sd.sale_id = s.id
+    JOIN items i ON i.id = sd.item_id
+    LEFT JOIN categories c ON c.id = i.category_id
+    {where}
+    ORDER BY s.datetime, s.id
+"""
+
+
+def iter_sale_line_batches(date_from=None, date_to=None, batch_size=5000, db_path=None):
+    """
+    Yield lists of up to batch_size row tuples (in COLUMNS order, money
+    decoded) for sale lines whose sale falls in [date_from, date_to].
+    Uses its own connection so one SELECT reads one consistent snapshot
+    while the app keeps writing.
+    """
+    conditions, params = [], []
+    if date_from:
+        conditions.append("s.datetime >= ?")
+        params.append(date_from)
+    if date_to:
+        next_day = datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)
+        conditions.append("s.datetime < ?")
+        params.append(next_day.strftime("%Y-%m-%d"))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = database.get_connection(db_path or models.DB_PATH)
+    conn.row_factory = None # Plain tuples; sqlite3.Row objects are not needed here
+    try:
+        cursor = conn.execute(_LINES_SQL.format(where=where), params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            batch = []
+            for row in rows:
+                row = list(row)
+                for i in _MONEY_COLUMNS:
+                    row[i] = from_minor(row[i])
+                batch.append(row)
+            yield batch
+    finally:
+        conn.close()
+
+def export_csv(path, date_from=None, date_to=None, progress=None, batch_size=5000):
+    """Write the range to a CSV Excel opens with Arabic intact. Returns the number of lines written."""
+    written = 0
+    # utf-8-sig: without the BOM Excel reads the file as the ANSI code page
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow([header for _, header, _ in COLUMNS])
+        for batch in iter_sale_line_batches(date_from, date_to, batch_size):
+            writer.writerows(batch)
+            written += len(batch)
+            if progress:
+                progress(written)
+    return written
+
+def _require_pyarrow():
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except Exception:
+            raise RuntimeError("Parquet/Arrow export needs pyarrow (pip install pyarrow)")
+        pa, pq = pyarrow, pyarrow.parquet
+
+def _arrow_schema():
+    return pa.schema([(name, getattr(pa, type_name)()) for name, _, type_name in COLUMNS])
+
+def export_arrow(path, date_from=None, date_to=None, progress=None, batch_size=50000):
+    """
+    Write the range as Parquet (.parquet) or an Arrow IPC file (.arrow/.feather),
+    one row group / record batch per fetched batch. Returns the number of lines written.
+    """
+    _require_pyarrow()
+    schema = _arrow_schema()
+    if path.lower().endswith(".parquet"):
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(path, schema)
+    written = 0
+    try:
+        for batch in iter_sale_line_batches(date_from, date_to, batch_size):
+            columns = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+            written += len(batch)
+            if progress:
+                progress(written)
+    finally:
+        writer.close()
+    return written
+
+def export_sales(path, date_from=None, date_to=None, progress=None):
+    """Export by file extension: .csv, .parquet, or .arrow/.feather."""
+    if os.path.splitext(path)[1].lower() in (".parquet", ".arrow", ".feather"):
+        return export_arrow(path, date_from, date_to, progress)
+    return export_csv(path, date_from, date_to, progress)
+
+def main(argv):
+    if len(argv) < 2:
+        print(__doc__.strip())
+        return 1
+    date_from = argv[2] if len(argv) > 2 else None
+    date_to = argv[3] if len(argv) > 3 else None
+    if len(argv) > 4:
+        models.DB_PATH = argv[4]
+    database.setup_database(models.DB_PATH)
+
+    def report(written):
+        print(f"\r{written} lines", end="", flush=True)
+
+    written = export_sales(argv[1], date_from, date_to, progress=report)
+    print(f"\r{written} lines written to {argv[1]}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,162 @@
+# forecasting.py - Per-item sales velocity, days until stock-out and reorder points (item_forecast)
+"""
+Velocity is an exponentially weighted rate of units sold per day. Each item
+keeps one decayed sum of its sold quantities, weighted_qty, as of
+weighted_at: a sale of q units at time t adds q * exp(-(weighted_at - t) / tau).
+Moving the sum to a later time only multiplies it by a decay factor, so a
+checkout (or an edit to an old sale) updates the touched items in O(1)
+each, without re-reading their history.
+
+Every function takes the caller's connection and does its work for all
+the given items in one SELECT and one executemany. They run inside the
+writer's transaction, so the forecast commits together with the sale that
+changed it.
+"""
+import math
+from datetime import datetime
+
+HALF_LIFE_DAYS = 14.0 # A sale counts half as much two weeks later
+LEAD_TIME_DAYS = 3.0  # Days between ordering and receiving stock
+SAFETY_DAYS = 2.0     # Extra days of sales kept on hand against a busier than usual week
+
+TAU_DAYS = HALF_LIFE_DAYS / math.log(2) # Decay time constant: a sale's weight is exp(-age in days / TAU_DAYS)
+_MIN_HISTORY_DAYS = 1.0
+_IN_CHUNK = 500 # Stay well under SQLite's bound-parameter limit
+
+def _days_between(earlier, later):
+    return (later - earlier).total_seconds() / 86400
+
+def _parse(text):
+    return datetime.fromisoformat(text)
+
+def derive(weighted_qty, weighted_at, first_sale_at, stock_count, now):
+    """
+    (velocity per day, days until stock-out or None, reorder point) as of now.
+    The decayed sum is divided by the weight the item's history could have
+    reached, so an item first sold three days ago is not read as slow.
+    """
+    if not weighted_qty or first_sale_at is None:
+        return 0.0, None, 0.0
+    decayed = weighted_qty * math.exp(-_days_between(weighted_at, now) / TAU_DAYS)
+    history = max(_days_between(first_sale_at, now), _MIN_HISTORY_DAYS)
+    velocity = decayed / (TAU_DAYS * (1 - math.exp(-history / TAU_DAYS)))
+    reorder_point = velocity * (LEAD_TIME_DAYS + SAFETY_DAYS)
+    days_to_stockout = max(stock_count or 0, 0) / velocity if velocity > 1e-9 else None
+    return velocity, days_to_stockout, reorder_point
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), _IN_CHUNK):
+        yield ids[start:start + _IN_CHUNK]
+
+def _load_state(conn, item_ids):
+    """{item_id: row with stock_count and the stored forecast columns (NULL if none yet)} for existing items."""
+    state = {}
+    for chunk in _chunks(item_ids):
+        placeholders = ",".join("?" * len(chunk))
+        for row in conn.execute(f"""
+            SELECT i.id, i.stock_count, f.weighted_qty, f.weighted_at, f.first_sale_at
+            FROM items i LEFT JOIN item_forecast f ON f.item_id = i.id
+            WHERE i.id IN ({placeholders})
+        """, chunk):
+            state[row["id"]] = row
+    return state
+
+def store_forecasts(conn, rows, now):
+    """
+    Upsert rows of (item_id, weighted_qty, weighted_at, first_sale_at, stock_count)
+    in one executemany. Returns {item_id: {"velocity", "days_to_stockout", "reorder_point"}}.
+    """
+    stamp = now.isoformat(timespec="seconds")
+    params, forecasts = [], {}
+    for item_id, weighted_qty, weighted_at, first_sale_at, stock_count in rows:
+        velocity, days_to_stockout, reorder_point = derive(weighted_qty, weighted_at, first_sale_at, stock_count, now)
+        forecasts[item_id] = {"velocity": velocity, "days_to_stockout": days_to_stockout, "reorder_point": reorder_point}
+        params.append((item_id, weighted_qty, weighted_at.isoformat(timespec="seconds"),
+                       first_sale_at.isoformat(timespec="seconds") if first_sale_at else None,
+                       velocity, days_to_stockout, reorder_point, stamp))
+    conn.executemany("""
+        INSERT INTO item_forecast(item_id, weighted_qty, weighted_at, first_sale_at,
+                                  velocity, days_to_stockout, reorder_point, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(item_id) DO UPDATE SET
+            weighted_qty = excluded.weighted_qty,
+            weighted_at = excluded.weighted_at,
+            first_sale_at = excluded.first_sale_at,
+            velocity = excluded.velocity,
+            days_to_stockout = excluded.days_to_stockout,
+            reorder_point = excluded.reorder_point,
+            updated_at = excluded.updated_at
+    """, params)
+    return forecasts
+
+def record_sales(conn, lines, now=None):
+    """
+    Fold sold quantities into the forecasts. lines are (item_id, quantity,
+    sale_datetime); a negative quantity takes back part of a sale (a deleted
+    or reduced line), weighted by the same sale time it was added with.
+    Returns the new forecasts by item id (see store_forecasts).
+    """
+    now = now or datetime.now()
+    deltas = {}
+    for item_id, quantity, sale_datetime in lines:
+        if quantity:
+            deltas.setdefault(item_id, []).append((quantity, _parse(sale_datetime)))
+    if not deltas:
+        return {}
+    rows = []
+    for item_id, row in _load_state(conn, deltas).items():
+        if row["weighted_at"] is not None:
+            weighted_qty = row["weighted_qty"] * math.exp(-_days_between(_parse(row["weighted_at"]), now) / TAU_DAYS)
+            first_sale_at = _parse(row["first_sale_at"]) if row["first_sale_at"] else None
+        else:
+            weighted_qty, first_sale_at = 0.0, None
+        for quantity, sold_at in deltas[item_id]:
+            weighted_qty += quantity * math.exp(-_days_between(sold_at, now) / TAU_DAYS)
+            if quantity > 0 and (first_sale_at is None or sold_at < first_sale_at):
+                first_sale_at = sold_at
+        # Rounding can leave a tiny negative once every sale has been taken back
+        rows.append((item_id, max(weighted_qty, 0.0), now, first_sale_at, row["stock_count"]))
+    return store_forecasts(conn, rows, now)
+
+def refresh(conn, item_ids=None, now=None):
+    """
+    Recompute velocity, days to stock-out and reorder points from the stored
+    sums and current stock, for item_ids or every forecast. Stock edits call
+    it for the items touched; a periodic pass keeps idle items decaying.
+    Returns the new forecasts by item id (see store_forecasts).
+    """
+    now = now or datetime.now()
+    if item_ids is None:
+        states = conn.execute("""
+            SELECT f.item_id AS id, i.stock_count, f.weighted_qty, f.weighted_at, f.first_sale_at
+            FROM item_forecast f JOIN items i ON i.id = f.item_id
+        """).fetchall()
+    else:
+        states = [row for row in _load_state(conn, item_ids).values() if row["weighted_at"] is not None]
+    return store_forecasts(conn, [
+        (row["id"], row["weighted_qty"], _parse(row["weighted_at"]),
+         _parse(row["first_sale_at"]) if row["first_sale_at"] else None, row["stock_count"])
+        for row in states
+    ], now)
+
+def rebuild(conn, now=None):
+    """Recompute every forecast from the full sale history in one pass (used to backfill the table)."""
+    now = now or datetime.now()
+    sums, first_sales = {}, {}
+    for row in conn.execute("""
+        SELECT sd.item_id, s.datetime, sd.quantity
+        FROM sale_details sd JOIN sales s ON s.id = sd.sale_id
+    """):
+        sold_at = _parse(row["datetime"])
+        item_id = row["item_id"]
+        sums[item_id] = sums.get(item_id, 0.0) + row["quantity"] * math.exp(-_days_between(sold_at, now) / TAU_DAYS)
+        if item_id not in first_sales or sold_at < first_sales[item_id]:
+            first_sales[item_id] = sold_at
+    conn.execute("DELETE FROM item_forecast")
+    stock = {row["id"]: row["stock_count"] for row in conn.execute("SELECT id, stock_count FROM items")}
+    store_forecasts(conn, [
+        (item_id, weighted_qty, now, first_sales[item_id], stock[item_id])
+        for item_id, weighted_qty in sums.items() if item_id in stock
+    ], now)
+    return len(sums)
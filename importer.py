@@ -0,0 +1,217 @@
+# importer.py - Stream supplier catalogues (CSV/XLSX) into items in batched upserts
+"""
+Usage: python importer.py catalogue.csv|catalogue.xlsx [store.db]
+
+Rows are read one at a time, validated, and written through
+models.upsert_items in chunks (one transaction each), so a 20k-row
+catalogue never sits in memory. Rejected rows go to <file>.rejects.csv
+with the reason, next to the source file.
+"""
+import os
+import sys
+import csv
+
+try:
+    from openpyxl import load_workbook
+except Exception:
+    load_workbook = None
+
+import database
+import models
+from utils import is_valid_barcode
+
+# Accepted header spellings (compared after strip/lower) for each field
+COLUMN_ALIASES = {
+    "name": ("name", "item", "product", "الاسم", "اسم المنتج", "المنتج"),
+    "barcode": ("barcode", "ean", "upc", "code", "الباركود", "الرمز"),
+    "price": ("price", "sale price", "السعر", "سعر البيع"),
+    "purchase_price": ("purchase_price", "purchase price", "cost", "سعر الشراء"),
+    "stock_count": ("stock_count", "stock", "quantity", "qty", "المخزون", "الكمية"),
+    "category": ("category", "التصنيف", "الفئة"),
+}
+
+
+def _header_map(header):
+    """{field: column index} for the recognised columns of a header row."""
+    lookup = {alias: field for field, aliases in COLUMN_ALIASES.items() for alias in aliases}
+    mapping = {}
+    for index, title in enumerate(header):
+        field = lookup.get(str(title or "").strip().lower())
+        if field and field not in mapping:
+            mapping[field] = index
+    return mapping
+
+def _number(value, field):
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        number = float(str(value).strip().replace(",", "."))
+    except ValueError:
+        raise ValueError(f"{field} is not a number: {value!r}")
+    if number < 0:
+        raise ValueError(f"{field} is negative: {value!r}")
+    return number
+
+def _barcode(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value) # Spreadsheets store long digit strings as numbers
+    code = str(value).strip()
+    return code or None
+
+def parse_row(values, columns):
+    """Turn one raw row into an upsert_items dict; raises ValueError with the reason if invalid."""
+    def cell(field):
+        index = columns.get(field)
+        return values[index] if index is not None and index < len(values) else None
+
+    name = str(cell("name") or "").strip()
+    if not name:
+        raise ValueError("missing name")
+    barcode = _barcode(cell("barcode"))
+    if barcode is not None and not is_valid_barcode(barcode):
+        raise ValueError(f"invalid barcode: {barcode}")
+    price = _number(cell("price"), "price")
+    if price is None:
+        raise ValueError("missing price")
+    return {
+        "name": name,
+        "barcode": barcode,
+        "price": price,
+        "purchase_price": _number(cell("purchase_price"), "purchase_price"),
+        "stock_count": _number(cell("stock_count"), "stock_count"),
+        "category": str(cell("category") or "").strip() or None,
+    }
+
+
+class _ByteCounter:
+    """Iterates a binary file's decoded lines while counting bytes, for progress without tell()."""
+
+    def __init__(self, f, encoding):
+        self._f = f
+        self._encoding = encoding
+        self.bytes_read = 0
+
+    def __iter__(self):
+        first = True
+        for raw in self._f:
+            self.bytes_read += len(raw)
+            line = raw.decode(self._encoding)
+            if first:
+                line = line.lstrip("\ufeff") # Excel writes a BOM on "CSV UTF-8" exports
+                first = False
+            yield line
+
+def _csv_rows(path, encoding="utf-8"):
+    """Yield (header, row number in the file, row, fraction_done) from a CSV file, streaming."""
+    size = os.path.getsize(path) or 1
+    with open(path, "rb") as f:
+        counter = _ByteCounter(f, encoding)
+        reader = csv.reader(counter)
+        header = next(reader, None)
+        if header is None:
+            return
+        # Blank rows are skipped but still counted, so reported numbers match the file
+        for number, row in enumerate(reader, start=2):
+            if any(cell.strip() for cell in row):
+                yield header, number, row, counter.bytes_read / size
+
+def _xlsx_rows(path):
+    """Yield (header, row number in the sheet, row, fraction_done) from the first sheet, in openpyxl's read-only streaming mode."""
+    if load_workbook is None:
+        raise RuntimeError("Reading .xlsx files needs openpyxl (pip install openpyxl)")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        total = sheet.max_row or 0
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        for number, row in enumerate(rows, start=2):
+            if any(cell is not None and str(cell).strip() for cell in row):
+                yield header, number, row, number / total if total else 0.0
+    finally:
+        workbook.close()
+
+def iter_source_rows(path, encoding="utf-8"):
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        return _xlsx_rows(path)
+    return _csv_rows(path, encoding)
+
+
+def import_items(path, chunk_size=1000, progress=None, rejects_path=None, encoding="utf-8"):
+    """
+    Import items from a CSV or XLSX file. Returns a dict with "read",
+    "inserted", "updated", "rejected" counts and "rejects_path" (None if
+    nothing was rejected). progress(fraction_done, summary), if given, is
+    called after each chunk is committed. `encoding` applies to CSV only
+    (e.g. "cp1256" for older Arabic Windows exports).
+    """
+    if rejects_path is None:
+        rejects_path = os.path.splitext(path)[0] + ".rejects.csv"
+    summary = {"read": 0, "inserted": 0, "updated": 0, "rejected": 0, "rejects_path": None}
+    rejects_file = rejects_writer = None
+    columns = None
+    chunk = []
+    fraction = 0.0
+
+    def flush():
+        if not chunk:
+            return
+        result = models.upsert_items(chunk)
+        summary["inserted"] += result["inserted"]
+        summary["updated"] += result["updated"]
+        chunk.clear()
+        if progress:
+            progress(fraction, dict(summary))
+
+    try:
+        for header, row_number, values, fraction in iter_source_rows(path, encoding):
+            if columns is None:
+                columns = _header_map(header)
+                missing = {"name", "price"} - set(columns)
+                if missing:
+                    raise ValueError(f"Missing required column(s): {', '.join(sorted(missing))}")
+            summary["read"] += 1
+            try:
+                chunk.append(parse_row(values, columns))
+            except ValueError as e:
+                if rejects_writer is None:
+                    rejects_file = open(rejects_path, "w", newline="", encoding="utf-8-sig")
+                    rejects_writer = csv.writer(rejects_file)
+                    rejects_writer.writerow(["row", "reason"] + [str(title or "") for title in header])
+                    summary["rejects_path"] = rejects_path
+                rejects_writer.writerow([row_number, str(e)] + ["" if v is None else v for v in values])
+                summary["rejected"] += 1
+                continue
+            if len(chunk) >= chunk_size:
+                flush()
+        fraction = 1.0
+        flush()
+    finally:
+        if rejects_file is not None:
+            rejects_file.close()
+    return summary
+
+def main(argv):
+    if len(argv) < 2:
+        print(__doc__.strip())
+        return 1
+    if len(argv) > 2:
+        models.DB_PATH = argv[2]
+    database.setup_database(models.DB_PATH)
+
+    def report(fraction, summary):
+        print(f"\r{fraction:6.1%}  read {summary['read']}, inserted {summary['inserted']}, "
+              f"updated {summary['updated']}, rejected {summary['rejected']}", end="", flush=True)
+
+    summary = import_items(argv[1], progress=report)
+    print()
+    if summary["rejects_path"]:
+        print(f"Rejected rows written to {summary['rejects_path']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,254 @@
+# index_advisor.py - Check the statements models actually runs against the indexes in store.db
+"""
+Usage: python index_advisor.py [path/to/store.db]
+
+Copies the database to a scratch file, runs a representative workload
+through models while recording every statement, then checks each distinct
+statement with EXPLAIN QUERY PLAN and reports:
+- indexes no recorded query uses (write-only cost on every insert/update),
+- indexes made redundant by a longer index or a UNIQUE constraint,
+- statements that scan a whole table or sort in a temporary b-tree.
+StatementRecorder can also be installed in a running app to audit a real session.
+"""
+import os
+import re
+import sys
+import shutil
+import sqlite3
+import tempfile
+import threading
+from collections import Counter
+
+import database
+import models
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?(?![\w.])", re.IGNORECASE)
+_IN_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACE = re.compile(r"\s+")
+_RECORDED_VERBS = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_PLAN_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+_PLAN_FULL_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+def statement_shape(sql):
+    """SQL with literals replaced by ? and whitespace collapsed, so calls that differ only in values group together."""
+    shape = _STRING.sub("?", sql)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("?, ...", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+class StatementRecorder:
+    """
+    Records the distinct statements run on every connection opened while
+    installed, with a call count and one runnable example (the trace
+    callback receives SQL with the bound values expanded) per shape.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.examples = {}
+        self._lock = threading.Lock()
+
+    def install(self):
+        database.add_connection_hook(self._attach)
+
+    def uninstall(self):
+        database.remove_connection_hook(self._attach)
+
+    def _attach(self, conn):
+        conn.set_trace_callback(self.record)
+
+    def record(self, sql):
+        if sql.startswith("--"):
+            return # Statements run inside triggers
+        if "'main'." in sql:
+            return # FTS5 housekeeping on its shadow tables
+        verb = sql.lstrip()[:7].upper()
+        if not verb.startswith(_RECORDED_VERBS):
+            return
+        shape = statement_shape(sql)
+        with self._lock:
+            self.counts[shape] += 1
+            self.examples.setdefault(shape, sql)
+
+    def statements(self):
+        """{shape: (example_sql, count)}"""
+        with self._lock:
+            return {shape: (self.examples[shape], count) for shape, count in self.counts.items()}
+
+
+def _indexes(conn):
+    """{name: {"table", "columns", "unique", "origin"}} for every index, including constraint autoindexes."""
+    indexes = {}
+    tables = [row["name"] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%'")]
+    for table in tables:
+        for index in conn.execute(f"PRAGMA index_list({table})"):
+            if index["origin"] == "pk":
+                continue # WITHOUT ROWID primary keys are the table itself
+            columns = [col["name"] for col in conn.execute(f"PRAGMA index_info({index['name']})")]
+            indexes[index["name"]] = {
+                "table": table, "columns": columns,
+                "unique": bool(index["unique"]), "origin": index["origin"],
+            }
+    return indexes
+
+def _foreign_key_columns(conn, table):
+    return {fk["from"] for fk in conn.execute(f"PRAGMA foreign_key_list({table})")}
+
+def audit(conn, statements):
+    """
+    Check recorded statements ({shape: (example_sql, count)}) against the
+    indexes in conn's database. Returns a dict with "indexes" (name -> info
+    plus "uses", the number of recorded calls whose plan used it), "unused",
+    "foreign_key" (unused by queries but backing a foreign key), "redundant",
+    "scans", "temp_sorts" and "errors".
+    """
+    indexes = _indexes(conn)
+    for info in indexes.values():
+        info["uses"] = 0
+    report = {"indexes": indexes, "unused": [], "foreign_key": [], "redundant": [],
+              "scans": [], "temp_sorts": [], "errors": []}
+
+    for shape, (example, count) in sorted(statements.items(), key=lambda s: -s[1][1]):
+        try:
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + example)]
+        except sqlite3.Error as e:
+            report["errors"].append({"sql": shape, "error": str(e)})
+            continue
+        for detail in plan:
+            for name in _PLAN_INDEX.findall(detail):
+                if name in indexes:
+                    indexes[name]["uses"] += count
+            scan = _PLAN_FULL_SCAN.match(detail)
+            if scan and "INDEX" not in detail and "VIRTUAL TABLE" not in detail:
+                report["scans"].append({"sql": shape, "calls": count, "detail": detail})
+            if "USE TEMP B-TREE" in detail:
+                report["temp_sorts"].append({"sql": shape, "calls": count, "detail": detail})
+
+    for name, info in sorted(indexes.items()):
+        if info["origin"] != "c":
+            continue # UNIQUE constraint indexes are needed regardless of queries
+        for other_name, other in indexes.items():
+            longer = len(other["columns"]) > len(info["columns"])
+            same_unique = other["unique"] and len(other["columns"]) == len(info["columns"]) and other_name != name
+            if other["table"] == info["table"] and (longer or same_unique) \
+                    and other["columns"][:len(info["columns"])] == info["columns"]:
+                report["redundant"].append({"index": name, "covered_by": other_name})
+                break
+        if info["uses"]:
+            continue
+        if info["columns"] and info["columns"][0] in _foreign_key_columns(conn, info["table"]):
+            report["foreign_key"].append(name) # Looked up when a parent row is deleted
+        else:
+            report["unused"].append(name)
+    return report
+
+def format_report(report):
+    lines = ["Index usage (recorded calls whose plan used each index):"]
+    for name, info in sorted(report["indexes"].items(), key=lambda i: (i[1]["table"], i[0])):
+        lines.append(f"  {info['table']}.{name} ({', '.join(info['columns'])}): {info['uses']}")
+    lines.append("")
+    lines.append("Unused (maintained on every write, never read): " + (", ".join(report["unused"]) or "none"))
+    lines.append("Only backing foreign keys: " + (", ".join(report["foreign_key"]) or "none"))
+    lines.append("Redundant: " + (", ".join(f"{r['index']} (prefix of {r['covered_by']})"
+                                            for r in report["redundant"]) or "none"))
+    for key, title in (("scans", "Full table scans"), ("temp_sorts", "Sorts in a temporary b-tree")):
+        lines.append("")
+        lines.append(f"{title}:" if report[key] else f"{title}: none")
+        for entry in report[key]:
+            lines.append(f"  [{entry['calls']}x] {entry['detail']}")
+            lines.append(f"      {entry['sql']}")
+    if report["errors"]:
+        lines.append("")
+        lines.append("Could not explain:")
+        for entry in report["errors"]:
+            lines.append(f"  {entry['error']}: {entry['sql']}")
+    return "\n".join(lines)
+
+
+def run_sample_workload():
+    """
+    Exercise the screens' reads and a checkout/edit/delete cycle through
+    models. It writes, so only run it against a scratch copy.
+    """
+    models.get_settings()
+    categories = models.get_categories()
+    models.get_item_names()
+    items = models.get_items_page(200)
+    if items:
+        models.get_items_page(200, after=(items[-1]["name"], items[-1]["id"]))
+        for item in items[:5]:
+            # Barcode first: a hit caches the item, so get_item would never reach the database
+            if item["barcode"]:
+                models.get_item_by_barcode(item["barcode"])
+            models.get_item(item["id"])
+        models.search_items_by_name(items[0]["name"][:3])
+        models.get_items_by_ids([item["id"] for item in items[:10]])
+
+    sales = models.get_sales_page(200)
+    if sales:
+        models.get_sales_page(200, before=(sales[-1]["datetime"], sales[-1]["id"]))
+        day = sales[0]["datetime"][:10]
+        models.get_sales_page(200, date_from=day, date_to=day)
+        for sale in sales[:5]:
+            models.get_sale(sale["id"])
+            models.get_sale_details(sale["id"])
+    models.get_revenue_and_profit_all_time()
+    models.get_revenue_and_profit_today()
+    models.get_latest_sale()
+    models.get_daily_sales_summary()
+
+    if len(items) >= 2:
+        sale_id, _ = models.checkout([
+            {"id": item["id"], "qty": 1, "price": item["price"], "purchase_price": item["purchase_price"]}
+            for item in items[:2]
+        ])
+        details = models.get_sale_details(sale_id)
+        models.update_sale_detail(details[0]["id"], 2, details[0]["price_each"])
+        models.delete_sale_detail(details[1]["id"])
+        models.delete_sale(sale_id)
+    category_id = categories[0]["id"] if categories else None
+    item_id = models.add_item("index advisor probe", category_id, None, 1, 1, None)
+    models.update_item(item_id, "index advisor probe", category_id, None, 2, 1, None)
+    models.delete_item(item_id)
+
+def main(argv):
+    source = argv[1] if len(argv) > 1 else database.DB_NAME
+    if not os.path.exists(source):
+        print(f"Database not found: {source}")
+        return 1
+    scratch_dir = tempfile.mkdtemp()
+    scratch = os.path.join(scratch_dir, "advisor.db")
+    try:
+        # The backup API copies a consistent snapshot, including pages still in the WAL
+        src, dst = sqlite3.connect(source), sqlite3.connect(scratch)
+        src.backup(dst)
+        src.close()
+        dst.close()
+        database.setup_database(scratch)
+
+        recorder = StatementRecorder()
+        recorder.install()
+        models.DB_PATH = scratch
+        try:
+            run_sample_workload()
+        finally:
+            recorder.uninstall()
+            database.close_writers()
+            models.close_db()
+
+        conn = database.get_connection(scratch)
+        try:
+            print(format_report(audit(conn, recorder.statements())))
+        finally:
+            conn.close()
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,11 +1,16 @@
 import sys
 import os
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont
-from database import setup_database
-from controllers import Controller
-from qss import APP_QSS
+from startup_profile import PROFILE # First, so its clock starts before the other imports
+
+with PROFILE.phase("imports"):
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import Qt
+    from database import setup_database
+    import query_stats
+    import ui_trace
+    from controllers import Controller
+    from ui_main import arabic_font
+    from qss import APP_QSS
 
 def setup_application():
     """Setup application with enhanced configuration"""
@@ -22,36 +27,13 @@ def setup_application():
     # we'll set the attributes that can still be set
     app.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
     
-    # Enhanced Arabic font support
-    from PyQt5.QtGui import QFontDatabase
-    
-    # Try to load system Arabic fonts
-    arabic_fonts = [
-        "Tahoma",           # Good Arabic support
-        "Arial Unicode MS", # Comprehensive Unicode support
-        "Segoe UI",         # Windows default with Arabic
-        "DejaVu Sans",      # Linux Arabic support
-        "Noto Sans Arabic", # Google Noto Arabic
-        "Arial"             # Fallback
-    ]
-    
-    font_db = QFontDatabase()
-    available_fonts = font_db.families()
-    
-    selected_font = None
-    for font_name in arabic_fonts:
-        if font_name in available_fonts:
-            selected_font = QFont(font_name, 11)
-            selected_font.setStyleHint(QFont.System)
-            break
-    
-    if not selected_font:
-        selected_font = QFont("Arial", 11)
-    
-    app.setFont(selected_font)
+    # Enhanced Arabic font support (the first installed of ui_main.ARABIC_FONTS)
+    with PROFILE.phase("fonts"):
+        app.setFont(arabic_font())
     
     # Apply modern dark theme stylesheet
-    app.setStyleSheet(APP_QSS)
+    with PROFILE.phase("stylesheet"):
+        app.setStyleSheet(APP_QSS)
     
     return app
 
@@ -60,7 +42,8 @@ def create_required_directories():
     directories = [
         "assets",
         "assets/logo", 
-        "assets/photos"
+        "assets/photos",
+        "assets/photos/thumbs"
     ]
     
     for directory in directories:
@@ -74,17 +57,26 @@ def main():
     if hasattr(Qt, 'AA_UseHighDpiPixmaps'):
         QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
     
+    # Statement timings and the slow query log, if KIOSK_QUERY_STATS is set
+    query_stats.enable_from_environment()
+    
     # Setup database
-    setup_database()
+    with PROFILE.phase("database"):
+        setup_database()
     
     # Create required directories
     create_required_directories()
     
     # Setup and configure application
-    app = setup_application()
+    with PROFILE.phase("application"):
+        app = setup_application()
+    
+    # Slot timings and GUI stall stacks, if KIOSK_UI_TRACE is set (before the window connects its slots)
+    ui_trace.enable_from_environment(Controller)
     
-    # Create and show main window
-    window = Controller()
+    # Create and show main window; its deferred loading marks first_paint and background_ready
+    with PROFILE.phase("main window"):
+        window = Controller()
     window.show()
     
     # Center window on screen
@@ -0,0 +1,469 @@
+# migrations.py - Versioned schema migrations keyed on PRAGMA user_version
+import math
+from datetime import datetime
+
+from money import MINOR_PER_UNIT
+
+# ---------- Helpers ----------
+def _table_exists(conn, table_name):
+    cur = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+    return cur.fetchone() is not None
+
+def _table_has_column(conn, table_name, column_name):
+    """Check if a table has a specific column"""
+    return any(column["name"] == column_name for column in conn.execute(f"PRAGMA table_info({table_name})"))
+
+def _add_column(conn, table_name, column_name, definition, backfill_sql=None, params=()):
+    # Older databases grew their columns over time; add the missing ones in place
+    if _table_has_column(conn, table_name, column_name):
+        return
+    print(f"Adding {column_name} column to {table_name} table...")
+    conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}")
+    if backfill_sql:
+        conn.execute(backfill_sql, params)
+
+def _sale_details_item_fk_cascades(conn):
+    """Check if sale_details table has CASCADE foreign key for items"""
+    for fk in conn.execute("PRAGMA foreign_key_list(sale_details)"):
+        if fk["table"] == "items" and fk["from"] == "item_id" and fk["on_delete"].lower() == "cascade":
+            return True
+    return False
+
+def _create_item_search_triggers(conn):
+    # Dropped with the items table, so table rebuilds must call this again
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, name, barcode) VALUES (new.id, ar_normalize(new.name), COALESCE(new.barcode, ''));
+    END;
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+        DELETE FROM items_fts WHERE rowid = old.id;
+    END;
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE OF name, barcode ON items BEGIN
+        DELETE FROM items_fts WHERE rowid = old.id;
+        INSERT INTO items_fts(rowid, name, barcode) VALUES (new.id, ar_normalize(new.name), COALESCE(new.barcode, ''));
+    END;
+    """)
+
+def backfill_daily_sales_summary(conn):
+    """Fill daily_sales_summary from every sale (the table must be empty)."""
+    conn.execute("""
+        INSERT INTO daily_sales_summary(date, revenue, cost, profit, sale_count, item_count)
+        SELECT substr(s.datetime, 1, 10),
+               SUM(s.total_price),
+               SUM(s.total_purchase_price),
+               SUM(s.total_price - s.total_purchase_price),
+               COUNT(*),
+               COALESCE(SUM(d.quantity), 0)
+        FROM sales s
+        LEFT JOIN (SELECT sale_id, SUM(quantity) AS quantity FROM sale_details GROUP BY sale_id) d
+            ON d.sale_id = s.id
+        GROUP BY substr(s.datetime, 1, 10)
+    """)
+
+def _rebuild_table(conn, table, create_sql, convert=None):
+    """
+    Recreate `table` from create_sql (written for a table named _new_<table>),
+    copying every column the two have in common, with optional SQL expressions
+    per column in `convert`. Indexes and triggers on the old table are dropped
+    with it; AUTOINCREMENT counters are carried over.
+    """
+    convert = convert or {}
+    new_table = f"_new_{table}"
+    conn.execute(create_sql)
+    old_columns = [col["name"] for col in conn.execute(f"PRAGMA table_info({table})")]
+    new_columns = {col["name"] for col in conn.execute(f"PRAGMA table_info({new_table})")}
+    columns = [name for name in old_columns if name in new_columns]
+    select = ", ".join(convert.get(name, name) for name in columns)
+    conn.execute(f"INSERT INTO {new_table} ({', '.join(columns)}) SELECT {select} FROM {table}")
+    seq = None
+    if _table_exists(conn, "sqlite_sequence"):
+        seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+    if seq is not None:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq[0], table))
+
+
+# ---------- Migrations ----------
+def _v1_base_schema(conn):
+    """
+    Tables and indexes, for new databases and for any database made before
+    versioning (by the old database.setup_database or models.init_db).
+    """
+    now = datetime.now().isoformat()
+    is_new = not _table_exists(conn, "categories")
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS settings (
+        id INTEGER PRIMARY KEY CHECK (id=1),
+        shop_name TEXT NOT NULL,
+        contact TEXT,
+        location TEXT,
+        currency TEXT NOT NULL
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        created_at TEXT
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        category_id INTEGER,
+        barcode TEXT UNIQUE,
+        price REAL NOT NULL DEFAULT 0,
+        stock_count REAL NOT NULL DEFAULT 0,
+        photo_path TEXT,
+        add_date TEXT,
+        updated_at TEXT,
+        purchase_price REAL NOT NULL DEFAULT 0,
+        FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        datetime TEXT NOT NULL,
+        total_price REAL NOT NULL DEFAULT 0,
+        total_purchase_price REAL NOT NULL DEFAULT 0,
+        created_at TEXT
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sale_details (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sale_id INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        quantity REAL NOT NULL,
+        price_each REAL NOT NULL,
+        subtotal REAL NOT NULL DEFAULT 0,
+        purchase_price_each REAL NOT NULL DEFAULT 0,
+        created_at TEXT,
+        FOREIGN KEY (sale_id) REFERENCES sales(id) ON DELETE CASCADE,
+        FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE
+    );
+    """)
+
+    # Columns that older databases may lack (no-ops on a new one)
+    _add_column(conn, "items", "purchase_price", "REAL NOT NULL DEFAULT 0")
+    _add_column(conn, "items", "updated_at", "TEXT",
+                "UPDATE items SET updated_at = ? WHERE updated_at IS NULL", (now,))
+    _add_column(conn, "sale_details", "subtotal", "REAL NOT NULL DEFAULT 0",
+                "UPDATE sale_details SET subtotal = quantity * price_each WHERE subtotal = 0")
+    _add_column(conn, "sale_details", "purchase_price_each", "REAL NOT NULL DEFAULT 0", """
+        UPDATE sale_details
+        SET purchase_price_each = (SELECT i.purchase_price FROM items i WHERE i.id = sale_details.item_id)
+        WHERE purchase_price_each = 0
+    """)
+    _add_column(conn, "sale_details", "created_at", "TEXT",
+                "UPDATE sale_details SET created_at = ? WHERE created_at IS NULL", (now,))
+    _add_column(conn, "sales", "total_purchase_price", "REAL NOT NULL DEFAULT 0", """
+        UPDATE sales
+        SET total_purchase_price = (
+            SELECT COALESCE(SUM(sd.quantity * sd.purchase_price_each), 0)
+            FROM sale_details sd
+            WHERE sd.sale_id = sales.id
+        )
+        WHERE total_purchase_price = 0
+    """)
+    _add_column(conn, "sales", "created_at", "TEXT",
+                "UPDATE sales SET created_at = ? WHERE created_at IS NULL", (now,))
+    _add_column(conn, "categories", "created_at", "TEXT",
+                "UPDATE categories SET created_at = ? WHERE created_at IS NULL", (now,))
+
+    # models.init_db made item_id ON DELETE SET NULL; deleting an item must take its sale lines with it.
+    # SQLite can't alter a foreign key, so rebuild the table (foreign keys are off during migrations).
+    if not _sale_details_item_fk_cascades(conn):
+        print("Migrating sale_details table to add CASCADE foreign key for items...")
+        conn.execute("""
+        CREATE TABLE _sale_details_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sale_id INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            price_each REAL NOT NULL,
+            subtotal REAL NOT NULL DEFAULT 0,
+            purchase_price_each REAL NOT NULL DEFAULT 0,
+            created_at TEXT,
+            FOREIGN KEY (sale_id) REFERENCES sales(id) ON DELETE CASCADE,
+            FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE
+        );
+        """)
+        # Lines whose item was already deleted (item_id NULL under SET NULL) can't satisfy NOT NULL
+        conn.execute("""
+        INSERT INTO _sale_details_new (id, sale_id, item_id, quantity, price_each, subtotal, purchase_price_each, created_at)
+        SELECT id, sale_id, item_id, quantity, price_each,
+               COALESCE(subtotal, quantity * price_each),
+               COALESCE(purchase_price_each, 0),
+               COALESCE(created_at, datetime('now'))
+        FROM sale_details
+        WHERE item_id IS NOT NULL;
+        """)
+        conn.execute("DROP TABLE sale_details;")
+        conn.execute("ALTER TABLE _sale_details_new RENAME TO sale_details;")
+
+    for sql in (
+        "CREATE INDEX IF NOT EXISTS idx_items_barcode ON items(barcode);",
+        "CREATE INDEX IF NOT EXISTS idx_items_category ON items(category_id);",
+        "CREATE INDEX IF NOT EXISTS idx_items_stock ON items(stock_count);",
+        "CREATE INDEX IF NOT EXISTS idx_sales_datetime ON sales(datetime);",
+        "CREATE INDEX IF NOT EXISTS idx_sale_details_sale_id ON sale_details(sale_id);",
+        "CREATE INDEX IF NOT EXISTS idx_sale_details_item_id ON sale_details(item_id);",
+        "CREATE INDEX IF NOT EXISTS idx_items_name ON items(name);",
+        "CREATE INDEX IF NOT EXISTS idx_sales_created_at ON sales(created_at);",
+        "CREATE INDEX IF NOT EXISTS idx_items_purchase_price ON items(purchase_price);",
+        "CREATE INDEX IF NOT EXISTS idx_sale_details_subtotal ON sale_details(subtotal);",
+        "CREATE INDEX IF NOT EXISTS idx_sale_details_purchase_price_each ON sale_details(purchase_price_each);",
+        "CREATE INDEX IF NOT EXISTS idx_sales_total_purchase_price ON sales(total_purchase_price);",
+    ):
+        conn.execute(sql)
+
+    if is_new:
+        print("Seeding initial data...")
+        conn.executemany("INSERT OR IGNORE INTO categories(name, created_at) VALUES (?, ?)",
+                         [(cat, now) for cat in ["غير مصنّف", "مواد غذائية", "مشروبات", "منظفات", "أدوات منزلية", "قرطاسية"]])
+
+def _v2_item_search(conn):
+    """FTS5 index over normalized item names/barcodes, kept in sync by triggers."""
+    # Databases set up before versioning may already have it
+    is_new = not _table_exists(conn, "items_fts")
+
+    # rowid mirrors items.id; prefix indexes keep "starts with" queries cheap
+    conn.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+        name, barcode, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    );
+    """)
+    _create_item_search_triggers(conn)
+
+    if is_new:
+        print("Building items search index...")
+        conn.execute("""
+            INSERT INTO items_fts(rowid, name, barcode)
+            SELECT id, ar_normalize(name), COALESCE(barcode, '') FROM items
+        """)
+
+def _v3_daily_sales_summary(conn):
+    """Per-day sales rollup that the KPI labels read; models keeps it in step with every sale write."""
+    is_new = not _table_exists(conn, "daily_sales_summary")
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS daily_sales_summary (
+        date TEXT PRIMARY KEY, -- YYYY-MM-DD, the first 10 chars of sales.datetime
+        revenue REAL NOT NULL DEFAULT 0,
+        cost REAL NOT NULL DEFAULT 0,
+        profit REAL NOT NULL DEFAULT 0,
+        sale_count INTEGER NOT NULL DEFAULT 0,
+        item_count REAL NOT NULL DEFAULT 0 -- total quantity sold
+    ) WITHOUT ROWID;
+    """)
+
+    if is_new:
+        print("Building daily sales summary...")
+        backfill_daily_sales_summary(conn)
+
+def _v4_workload_indexes(conn):
+    """
+    Index set driven by index_advisor.py: drop indexes no query reads (each
+    was still maintained on every checkout) and cover the hot lookups.
+    """
+    for name in (
+        "idx_items_barcode",                    # Duplicates the UNIQUE(barcode) index
+        "idx_items_stock",
+        "idx_items_purchase_price",
+        "idx_sales_created_at",
+        "idx_sales_total_purchase_price",
+        "idx_sale_details_subtotal",
+        "idx_sale_details_purchase_price_each",
+        "idx_sale_details_sale_id",             # Prefix of idx_sale_details_sale_item
+        "idx_sale_details_item_id",             # Prefix of idx_sale_details_item_sale
+        "idx_sales_datetime",                   # Replaced by the explicit keyset index
+    ):
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    # Sale lines by sale: details view, totals, delete_sale's stock return (covered) and the sales cascade
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sale_details_sale_item ON sale_details(sale_id, item_id, quantity)")
+    # Sale lines by item: the items cascade and delete_item's affected-sales lookup (covered, no DISTINCT sort)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sale_details_item_sale ON sale_details(item_id, sale_id)")
+    # Sales history keyset order (get_sales_page, get_latest_sale)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_datetime_id ON sales(datetime, id)")
+
+def _v5_integer_money(conn):
+    """
+    Store money as INTEGER minor units (see money.py) so sums are exact.
+    REAL affinity would turn stored integers back into floats, hence the
+    rebuilds rather than an in-place UPDATE.
+    """
+    def minor(column):
+        return f"CAST(ROUND({column} * {MINOR_PER_UNIT}) AS INTEGER)"
+
+    _rebuild_table(conn, "items", """
+    CREATE TABLE _new_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        category_id INTEGER,
+        barcode TEXT UNIQUE,
+        price INTEGER NOT NULL DEFAULT 0, -- minor units
+        stock_count REAL NOT NULL DEFAULT 0,
+        photo_path TEXT,
+        add_date TEXT,
+        updated_at TEXT,
+        purchase_price INTEGER NOT NULL DEFAULT 0, -- minor units
+        FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL
+    );
+    """, {"price": minor("price"), "purchase_price": minor("purchase_price")})
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_items_category ON items(category_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_items_name ON items(name)")
+    _create_item_search_triggers(conn)
+
+    _rebuild_table(conn, "sales", """
+    CREATE TABLE _new_sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        datetime TEXT NOT NULL,
+        total_price INTEGER NOT NULL DEFAULT 0, -- minor units
+        total_purchase_price INTEGER NOT NULL DEFAULT 0, -- minor units
+        created_at TEXT
+    );
+    """, {"total_price": minor("total_price"), "total_purchase_price": minor("total_purchase_price")})
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_datetime_id ON sales(datetime, id)")
+
+    _rebuild_table(conn, "sale_details", """
+    CREATE TABLE _new_sale_details (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sale_id INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        quantity REAL NOT NULL,
+        price_each INTEGER NOT NULL, -- minor units
+        subtotal INTEGER NOT NULL DEFAULT 0, -- minor units
+        purchase_price_each INTEGER NOT NULL DEFAULT 0, -- minor units
+        created_at TEXT,
+        FOREIGN KEY (sale_id) REFERENCES sales(id) ON DELETE CASCADE,
+        FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE
+    );
+    """, {"price_each": minor("price_each"), "subtotal": minor("subtotal"),
+          "purchase_price_each": minor("purchase_price_each")})
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sale_details_sale_item ON sale_details(sale_id, item_id, quantity)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sale_details_item_sale ON sale_details(item_id, sale_id)")
+
+    # Rebuilt from the converted sales rather than converted itself, so it matches them exactly
+    conn.execute("DROP TABLE IF EXISTS daily_sales_summary")
+    conn.execute("""
+    CREATE TABLE daily_sales_summary (
+        date TEXT PRIMARY KEY, -- YYYY-MM-DD, the first 10 chars of sales.datetime
+        revenue INTEGER NOT NULL DEFAULT 0, -- minor units
+        cost INTEGER NOT NULL DEFAULT 0, -- minor units
+        profit INTEGER NOT NULL DEFAULT 0, -- minor units
+        sale_count INTEGER NOT NULL DEFAULT 0,
+        item_count REAL NOT NULL DEFAULT 0 -- total quantity sold
+    ) WITHOUT ROWID;
+    """)
+    backfill_daily_sales_summary(conn)
+
+def _v6_item_forecast(conn):
+    """Per-item sales velocity and reorder state (see forecasting.py), kept current by every sale write."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS item_forecast (
+        item_id INTEGER PRIMARY KEY REFERENCES items(id) ON DELETE CASCADE,
+        weighted_qty REAL NOT NULL DEFAULT 0, -- exponentially decayed units sold, as of weighted_at
+        weighted_at TEXT NOT NULL,
+        first_sale_at TEXT,
+        velocity REAL NOT NULL DEFAULT 0, -- units per day
+        days_to_stockout REAL, -- NULL when the item is not selling
+        reorder_point REAL NOT NULL DEFAULT 0,
+        updated_at TEXT
+    );
+    """)
+    print("Building item forecasts...")
+    # Frozen copy of forecasting.rebuild as of v6 (14-day half-life, 3 + 2 days of cover), so later
+    # changes to forecasting.py don't change what an older database gets when it upgrades
+    tau = 14.0 / math.log(2)
+    now = datetime.now()
+    sums, first_sales = {}, {}
+    for item_id, sold, quantity in conn.execute("""
+        SELECT sd.item_id, s.datetime, sd.quantity
+        FROM sale_details sd JOIN sales s ON s.id = sd.sale_id
+    """):
+        sold_at = datetime.fromisoformat(sold)
+        sums[item_id] = sums.get(item_id, 0.0) + quantity * math.exp(-(now - sold_at).total_seconds() / 86400 / tau)
+        if item_id not in first_sales or sold_at < first_sales[item_id]:
+            first_sales[item_id] = sold_at
+    stamp = now.isoformat(timespec="seconds")
+    rows = []
+    for item_id, stock_count in conn.execute("SELECT id, stock_count FROM items"):
+        if item_id not in sums:
+            continue
+        weighted_qty, first_sale_at = sums[item_id], first_sales[item_id]
+        velocity, days_to_stockout = 0.0, None
+        if weighted_qty:
+            history = max((now - first_sale_at).total_seconds() / 86400, 1.0)
+            velocity = weighted_qty / (tau * (1 - math.exp(-history / tau)))
+            if velocity > 1e-9:
+                days_to_stockout = max(stock_count or 0, 0) / velocity
+        rows.append((item_id, weighted_qty, stamp, first_sale_at.isoformat(timespec="seconds"),
+                     velocity, days_to_stockout, velocity * 5.0, stamp))
+    conn.executemany("""
+        INSERT INTO item_forecast(item_id, weighted_qty, weighted_at, first_sale_at,
+                                  velocity, days_to_stockout, reorder_point, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+
+
+# (version, description, function). Append new migrations here; never edit or
+# renumber one that has shipped, since databases record the last version applied.
+MIGRATIONS = [
+    (1, "base schema", _v1_base_schema),
+    (2, "item search index", _v2_item_search),
+    (3, "daily sales summary", _v3_daily_sales_summary),
+    (4, "workload-driven indexes", _v4_workload_indexes),
+    (5, "integer money", _v5_integer_money),
+    (6, "item forecasts", _v6_item_forecast),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ---------- Engine ----------
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """
+    Apply every migration newer than the database's user_version, each in
+    its own transaction together with the version bump. An up-to-date
+    database costs one PRAGMA read. Returns the versions applied.
+    """
+    version = schema_version(conn)
+    if version >= LATEST_VERSION:
+        return []
+
+    conn.commit()
+    # Table rebuilds need foreign keys off; the switch is ignored inside a transaction
+    conn.execute("PRAGMA foreign_keys = OFF")
+    applied = []
+    try:
+        for number, description, migration in MIGRATIONS:
+            if number <= version:
+                continue
+            print(f"Applying migration {number}: {description}...")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                migration(conn)
+                problems = conn.execute("PRAGMA foreign_key_check").fetchall()
+                if problems:
+                    raise RuntimeError(f"migration {number} left {len(problems)} foreign key violations")
+                conn.execute(f"PRAGMA user_version = {number}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(number)
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+    return applied
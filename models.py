@@ -1,101 +1,186 @@
 # models.py (fixed with subtotal handling and explicit get_item)
 import sqlite3
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from contextlib import contextmanager
 
+import database
+import forecasting
+import money
+from money import to_minor, from_minor
+from utils import normalize_arabic
+
 DB_PATH = "store.db"
 
+# One long-lived connection per thread, so the PRAGMAs are applied once and the
+# page cache survives between calls instead of being thrown away on every close.
+_pool = threading.local()
+
+def _pooled_connection():
+    conn = getattr(_pool, "conn", None)
+    if conn is not None and _pool.path != DB_PATH:
+        # DB_PATH was repointed (e.g. to a scratch database); drop the stale handle
+        conn.close()
+        conn = None
+    if conn is None:
+        conn = database.get_connection(DB_PATH)
+        _pool.conn = conn
+        _pool.path = DB_PATH
+    return conn
+
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = _pooled_connection()
     try:
         yield conn
-    finally:
+    except Exception:
+        # The connection outlives this call, so never leave a half-done write pending on it
+        conn.rollback()
+        raise
+
+def _write(job, on_commit=None):
+    """
+    Queue job(conn) on the database's single writer thread and return a
+    concurrent.futures.Future for its result. Jobs arriving together share one
+    commit; on_commit(result) runs once the data is durable. Jobs must not commit.
+    """
+    return database.get_writer(DB_PATH).submit(job, on_commit)
+
+# Write functions publish what they changed after committing, so views can
+# patch just the affected rows instead of reloading whole tables.
+_change_listeners = []
+
+def add_change_listener(callback):
+    """
+    Register callback(event, payload), called on the writer thread after every
+    committed write (before the writing call returns).
+    Events: category_added, item_added, item_updated, item_deleted,
+    items_imported, sale_added, sale_updated, sale_deleted, forecasts_refreshed.
+    Payloads carry the ids touched ("item_id"/"item_ids", "sale_id"/"sale_ids")
+    plus "stock_levels" and "forecasts" for checkouts, "category_ids" (newly
+    created) for imports and "forecasts" ({item_id: forecast}) for refreshes.
+    """
+    _change_listeners.append(callback)
+
+def remove_change_listener(callback):
+    if callback in _change_listeners:
+        _change_listeners.remove(callback)
+
+def _notify(event, **payload):
+    for callback in list(_change_listeners):
+        callback(event, payload)
+
+# Process-wide item cache for scan lookups, keyed by id with a barcode index.
+# Every write goes through models, so it is kept current from the change
+# notifications (write-through for checkouts, invalidation otherwise).
+_item_cache = {}
+_item_id_by_barcode = {}
+_item_cache_lock = threading.Lock()
+_item_cache_stats = {"hits": 0, "misses": 0}
+# Bumped by every invalidation, so a row read before a write can't be stored after it
+_item_cache_generation = 0
+
+def warm_barcode_cache():
+    """Load every barcoded item into the scan cache; returns the number cached."""
+    generation = _cache_generation()
+    items = [item for item in get_items() if item["barcode"]]
+    with _item_cache_lock:
+        if generation != _item_cache_generation:
+            return 0 # Written to meanwhile; lookups fill the cache as they miss
+        _item_cache.clear()
+        _item_id_by_barcode.clear()
+        for item in items:
+            _item_cache[item["id"]] = item
+            _item_id_by_barcode[item["barcode"]] = item["id"]
+    return len(items)
+
+def clear_item_cache():
+    """Empty the scan cache, so the next lookups read from the database (as after a restart)."""
+    global _item_cache_generation
+    with _item_cache_lock:
+        _item_cache_generation += 1 # Reads already in flight must not refill it
+        _item_cache.clear()
+        _item_id_by_barcode.clear()
+
+def barcode_cache_stats():
+    """Hit/miss counters and current size of the scan cache."""
+    with _item_cache_lock:
+        stats = dict(_item_cache_stats, size=len(_item_cache))
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+def _cache_lookup(item_id=None, barcode=None):
+    with _item_cache_lock:
+        if barcode is not None:
+            item_id = _item_id_by_barcode.get(barcode)
+        item = _item_cache.get(item_id)
+        _item_cache_stats["hits" if item is not None else "misses"] += 1
+        return dict(item) if item is not None else None
+
+def _cache_generation():
+    with _item_cache_lock:
+        return _item_cache_generation
+
+def _cache_store(item, generation):
+    """Cache a row read at `generation`, unless an invalidation has happened since."""
+    if not item["barcode"]:
+        return
+    with _item_cache_lock:
+        if generation != _item_cache_generation:
+            return
+        _item_cache[item["id"]] = dict(item)
+        _item_id_by_barcode[item["barcode"]] = item["id"]
+
+def _cache_drop(item_ids):
+    global _item_cache_generation
+    with _item_cache_lock:
+        _item_cache_generation += 1
+        for item_id in item_ids:
+            item = _item_cache.pop(item_id, None)
+            if item is not None and _item_id_by_barcode.get(item["barcode"]) == item_id:
+                del _item_id_by_barcode[item["barcode"]]
+
+def _cache_on_change(event, payload):
+    global _item_cache_generation
+    if event in ("item_updated", "item_deleted"):
+        _cache_drop([payload["item_id"]])
+    elif event == "items_imported":
+        _cache_drop(payload["item_ids"])
+    elif event.startswith("sale_"):
+        stock_levels = payload.get("stock_levels")
+        if stock_levels:
+            with _item_cache_lock:
+                _item_cache_generation += 1
+                for item_id, stock_count in stock_levels.items():
+                    if item_id in _item_cache:
+                        _item_cache[item_id]["stock_count"] = stock_count
+        else:
+            _cache_drop(payload["item_ids"])
+
+# Registered first so the cache is current before any view listener re-reads items
+add_change_listener(_cache_on_change)
+
+def close_db():
+    """Close the calling thread's pooled connection (e.g. when a worker thread exits)."""
+    conn = getattr(_pool, "conn", None)
+    if conn is not None:
         conn.close()
+        _pool.conn = None
 
 def init_db():
-    with get_db() as conn:
-        c = conn.cursor()
-        # Settings table
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                id INTEGER PRIMARY KEY,
-                shop_name TEXT NOT NULL DEFAULT 'متجري',
-                contact TEXT,
-                location TEXT,
-                currency TEXT DEFAULT 'د.ج'
-            )
-        """)
-        # Categories table
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS categories (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL UNIQUE
-            )
-        """)
-        # Items table (with purchase_price column)
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS items (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                category_id INTEGER,
-                barcode TEXT UNIQUE,
-                price REAL NOT NULL DEFAULT 0,
-                purchase_price REAL DEFAULT 0,
-                stock_count REAL DEFAULT 0,
-                photo_path TEXT,
-                add_date TEXT,
-                FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE SET NULL
-            )
-        """)
-        # Sales table (with total_purchase_price column)
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS sales (
-                id INTEGER PRIMARY KEY,
-                datetime TEXT NOT NULL,
-                total_price REAL NOT NULL,
-                total_purchase_price REAL NOT NULL DEFAULT 0
-            )
-        """)
-        # Sale Details table (with subtotal and purchase_price_each columns)
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS sale_details (
-                id INTEGER PRIMARY KEY,
-                sale_id INTEGER NOT NULL,
-                item_id INTEGER,
-                quantity REAL NOT NULL,
-                price_each REAL NOT NULL,
-                purchase_price_each REAL DEFAULT 0,
-                subtotal REAL NOT NULL,
-                FOREIGN KEY (sale_id) REFERENCES sales (id) ON DELETE CASCADE,
-                FOREIGN KEY (item_id) REFERENCES items (id) ON DELETE SET NULL
-            )
-        """)
+    """Create or upgrade the schema at DB_PATH; the same migrations as database.setup_database()."""
+    database.setup_database(DB_PATH)
 
-        # Create indexes if they don't exist
-        c.execute("CREATE INDEX IF NOT EXISTS idx_items_barcode ON items(barcode)")
-        c.execute("CREATE INDEX IF NOT EXISTS idx_items_category_id ON items(category_id)")
-        c.execute("CREATE INDEX IF NOT EXISTS idx_sales_datetime ON sales(datetime)")
-        c.execute("CREATE INDEX IF NOT EXISTS idx_sale_details_sale_id ON sale_details(sale_id)")
-        c.execute("CREATE INDEX IF NOT EXISTS idx_sale_details_item_id ON sale_details(item_id)")
-        c.execute("CREATE INDEX IF NOT EXISTS idx_items_purchase_price ON items(purchase_price)") # Index for purchase price
-        c.execute("CREATE INDEX IF NOT EXISTS idx_sales_total_purchase_price ON sales(total_purchase_price)") # Index for sales total purchase price
-        c.execute("CREATE INDEX IF NOT EXISTS idx_sale_details_purchase_price_each ON sale_details(purchase_price_each)") # Index for sale details purchase price
-        c.execute("CREATE INDEX IF NOT EXISTS idx_sale_details_subtotal ON sale_details(subtotal)") # Index for subtotal
-
-        conn.commit()
-
-        # Seed data if new DB
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM categories")
-        if cur.fetchone()[0] == 0:
-            print("Seeding initial data...")
-            cur.execute("INSERT OR IGNORE INTO categories(name) VALUES (?)", ("غير مصنّف",))
-            for cat in ["مواد غذائية", "مشروبات", "منظفات", "أدوات منزلية", "قرطاسية"]:
-                cur.execute("INSERT OR IGNORE INTO categories(name) VALUES (?)", (cat,))
-            conn.commit()
-            print("Initial data seeded.")
+# Money is stored in integer minor units (money.py); callers only ever see decoded amounts
+def _decode_item(row):
+    return money.decode(row, money.ITEM_FIELDS)
+
+def _decode_sale(row):
+    return money.decode(row, money.SALE_FIELDS)
+
+def _decode_sale_detail(row):
+    return money.decode(row, money.SALE_DETAIL_FIELDS)
 
 def get_settings():
     with get_db() as conn:
@@ -107,19 +192,17 @@ def get_settings():
         return None
 
 def save_settings(shop_name, contact, location, currency):
-    with get_db() as conn:
-        c = conn.cursor()
-        c.execute("""
+    def job(conn):
+        conn.execute("""
             INSERT OR REPLACE INTO settings (id, shop_name, contact, location, currency)
             VALUES (1, ?, ?, ?, ?)
         """, (shop_name, contact, location, currency))
-        conn.commit()
+    _write(job).result()
 
 def add_category(name):
-    with get_db() as conn:
-        c = conn.cursor()
-        c.execute("INSERT INTO categories(name) VALUES (?)", (name,))
-        conn.commit()
+    def job(conn):
+        return conn.execute("INSERT INTO categories(name) VALUES (?)", (name,)).lastrowid
+    return _write(job, lambda category_id: _notify("category_added", category_id=category_id)).result()
 
 def get_categories():
     with get_db() as conn:
@@ -134,29 +217,125 @@ def get_category_by_name(name):
         cat = c.fetchone()
         return dict(cat) if cat else None
 
-def add_item(name, category_id, barcode, price, stock_count, photo_path, purchase_price=0):
-    with get_db() as conn:
-        c = conn.cursor()
-        c.execute(
+# Stock and sale mutations come in pairs: *_async returns the writer's Future,
+# the plain name waits for it.
+def add_item_async(name, category_id, barcode, price, stock_count, photo_path, purchase_price=0):
+    add_date = datetime.now().isoformat()
+    def job(conn):
+        return conn.execute(
             "INSERT INTO items(name, category_id, barcode, price, stock_count, photo_path, add_date, purchase_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            (name, category_id, barcode, price, stock_count, photo_path, datetime.now().isoformat(), purchase_price)
+            (name, category_id, barcode, to_minor(price), stock_count, photo_path, add_date, to_minor(purchase_price))
+        ).lastrowid
+    return _write(job, lambda item_id: _notify("item_added", item_id=item_id))
+
+def add_item(name, category_id, barcode, price, stock_count, photo_path, purchase_price=0):
+    return add_item_async(name, category_id, barcode, price, stock_count, photo_path, purchase_price).result()
+
+def update_item_async(item_id, name, category_id, barcode, price, stock_count, photo_path, purchase_price=0):
+    def job(conn):
+        conn.execute(
+            "UPDATE items SET name=?, category_id=?, barcode=?, price=?, stock_count=?, photo_path=?, purchase_price=? WHERE id=?",
+            (name, category_id, barcode, to_minor(price), stock_count, photo_path, to_minor(purchase_price), item_id)
         )
-        conn.commit()
+        forecasting.refresh(conn, [item_id]) # Stock may have been corrected by hand
+    return _write(job, lambda _: _notify("item_updated", item_id=item_id))
 
 def update_item(item_id, name, category_id, barcode, price, stock_count, photo_path, purchase_price=0):
-    with get_db() as conn:
+    update_item_async(item_id, name, category_id, barcode, price, stock_count, photo_path, purchase_price).result()
+
+def delete_item_async(item_id):
+    def job(conn):
         c = conn.cursor()
-        c.execute(
-            "UPDATE items SET name=?, category_id=?, barcode=?, price=?, stock_count=?, photo_path=?, purchase_price=? WHERE id=?",
-            (name, category_id, barcode, price, stock_count, photo_path, purchase_price, item_id)
-        )
-        conn.commit()
+        # Sale details of this item go with it (ON DELETE CASCADE), so report the sales touched
+        c.execute("SELECT DISTINCT sale_id FROM sale_details WHERE item_id=?", (item_id,))
+        sale_ids = [row["sale_id"] for row in c.fetchall()]
+        c.execute("DELETE FROM items WHERE id=?", (item_id,))
+        return sale_ids
+    return _write(job, lambda sale_ids: _notify("item_deleted", item_id=item_id, sale_ids=sale_ids))
 
 def delete_item(item_id):
-    with get_db() as conn:
+    delete_item_async(item_id).result()
+
+_IN_CHUNK = 500 # Values per IN (...) list, well under SQLite's bound-parameter limit (999 on older builds)
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), _IN_CHUNK):
+        yield values[start:start + _IN_CHUNK]
+
+def upsert_items(rows):
+    """
+    Insert or update a batch of items in one transaction, matching on barcode
+    (rows without one are always inserted). Rows are dicts with "name",
+    "barcode", "price", and optionally "purchase_price", "stock_count" (None
+    keeps an existing item's value) and "category" (a name, created if new).
+    Returns {"inserted", "updated", "item_ids", "category_ids"} (categories created).
+    """
+    now = datetime.now().isoformat()
+    category_names = sorted({row["category"] for row in rows if row.get("category")})
+    barcodes = [row["barcode"] for row in rows if row.get("barcode")]
+
+    def job(conn):
         c = conn.cursor()
-        c.execute("DELETE FROM items WHERE id=?", (item_id,))
-        conn.commit()
+        category_ids, created = {}, []
+        for chunk in _chunks(category_names):
+            placeholders = ",".join("?" * len(chunk))
+            c.execute(f"SELECT id, name FROM categories WHERE name IN ({placeholders})", chunk)
+            category_ids.update((row["name"], row["id"]) for row in c.fetchall())
+        for name in category_names:
+            if name not in category_ids:
+                c.execute("INSERT INTO categories(name, created_at) VALUES (?, ?)", (name, now))
+                category_ids[name] = c.lastrowid
+                created.append(c.lastrowid)
+
+        existing = set()
+        for chunk in _chunks(barcodes):
+            placeholders = ",".join("?" * len(chunk))
+            c.execute(f"SELECT barcode FROM items WHERE barcode IN ({placeholders})", chunk)
+            existing.update(row["barcode"] for row in c.fetchall())
+
+        params, unbarcoded = [], []
+        for row in rows:
+            stock_count = row.get("stock_count")
+            purchase_price = to_minor(row.get("purchase_price"))
+            values = (row["name"], category_ids.get(row.get("category")), row.get("barcode") or None,
+                      to_minor(row["price"]), stock_count or 0, now, purchase_price or 0)
+            if row.get("barcode"):
+                params.append(values + (stock_count, purchase_price))
+            else:
+                unbarcoded.append(values)
+        c.executemany("""
+            INSERT INTO items(name, category_id, barcode, price, stock_count, add_date, purchase_price)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(barcode) DO UPDATE SET
+                name = excluded.name,
+                category_id = COALESCE(excluded.category_id, category_id),
+                price = excluded.price,
+                stock_count = CASE WHEN ? IS NULL THEN stock_count ELSE excluded.stock_count END,
+                purchase_price = CASE WHEN ? IS NULL THEN purchase_price ELSE excluded.purchase_price END,
+                updated_at = excluded.add_date
+        """, params)
+
+        item_ids = []
+        for chunk in _chunks(barcodes):
+            placeholders = ",".join("?" * len(chunk))
+            c.execute(f"SELECT id FROM items WHERE barcode IN ({placeholders})", chunk)
+            item_ids.extend(row["id"] for row in c.fetchall())
+        # Rows without a barcode never conflict; each insert's own rowid identifies it
+        for values in unbarcoded:
+            c.execute("""
+                INSERT INTO items(name, category_id, barcode, price, stock_count, add_date, purchase_price)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, values)
+            item_ids.append(c.lastrowid)
+        item_ids = list(dict.fromkeys(item_ids))
+        forecasting.refresh(conn, item_ids)
+        inserted = len(set(barcodes) - existing) + len(unbarcoded)
+        return {"inserted": inserted, "updated": len(existing), "item_ids": item_ids, "category_ids": created}
+
+    def published(result):
+        _notify("items_imported", item_ids=result["item_ids"], category_ids=result["category_ids"])
+    return _write(job, published).result()
 
 def get_items():
     with get_db() as conn:
@@ -167,9 +346,49 @@ def get_items():
             LEFT JOIN categories c ON i.category_id = c.id
             ORDER BY i.name
         """)
-        return [dict(row) for row in c.fetchall()]
+        return [_decode_item(row) for row in c.fetchall()]
+
+def get_item_names():
+    """(id, name) pairs for autocomplete, without the category join of get_items()."""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, name FROM items WHERE name IS NOT NULL AND name != ''")
+        return [(row["id"], row["name"]) for row in c.fetchall()]
+
+def get_items_page(limit, after=None):
+    """
+    Return up to `limit` items in (name, id) order, starting after the
+    (name, id) key of the last row already loaded. Keyset paging walks
+    idx_items_name instead of re-reading every earlier row like OFFSET would.
+    """
+    with get_db() as conn:
+        c = conn.cursor()
+        if after is None:
+            c.execute("""
+                SELECT i.*, c.name as category_name, f.velocity, f.days_to_stockout, f.reorder_point
+                FROM items i 
+                LEFT JOIN categories c ON i.category_id = c.id
+                LEFT JOIN item_forecast f ON f.item_id = i.id
+                ORDER BY i.name, i.id
+                LIMIT ?
+            """, (limit,))
+        else:
+            c.execute("""
+                SELECT i.*, c.name as category_name, f.velocity, f.days_to_stockout, f.reorder_point
+                FROM items i 
+                LEFT JOIN categories c ON i.category_id = c.id
+                LEFT JOIN item_forecast f ON f.item_id = i.id
+                WHERE (i.name, i.id) > (?, ?)
+                ORDER BY i.name, i.id
+                LIMIT ?
+            """, (after[0], after[1], limit))
+        return [_decode_item(row) for row in c.fetchall()]
 
 def get_item_by_barcode(barcode):
+    item = _cache_lookup(barcode=barcode)
+    if item is not None:
+        return item
+    generation = _cache_generation()
     with get_db() as conn:
         c = conn.cursor()
         c.execute("""
@@ -179,10 +398,18 @@ def get_item_by_barcode(barcode):
             WHERE i.barcode = ?
         """, (barcode,))
         item = c.fetchone()
-        return dict(item) if item else None
+    if item is None:
+        return None
+    item = _decode_item(item)
+    _cache_store(item, generation)
+    return item
 
 # NEW: Explicit get_item function returning a dictionary
 def get_item(item_id):
+    item = _cache_lookup(item_id=item_id)
+    if item is not None:
+        return item
+    generation = _cache_generation()
     with get_db() as conn:
         c = conn.cursor()
         c.execute("""
@@ -192,50 +419,232 @@ def get_item(item_id):
             WHERE i.id = ?
         """, (item_id,))
         item = c.fetchone()
-        return dict(item) if item else None
-
-def search_items_by_name(name_query):
+    if item is None:
+        return None
+    item = _decode_item(item)
+    _cache_store(item, generation)
+    return item
+
+def get_items_by_ids(item_ids):
+    """Fetch several items in one query, keyed by id (missing ids are simply absent)."""
+    if not item_ids:
+        return {}
+    item_ids = list(item_ids)
+    placeholders = ",".join("?" * len(item_ids))
     with get_db() as conn:
         c = conn.cursor()
-        c.execute("""
-            SELECT i.*, c.name as category_name 
+        c.execute(f"""
+            SELECT i.*, c.name as category_name, f.velocity, f.days_to_stockout, f.reorder_point
             FROM items i 
             LEFT JOIN categories c ON i.category_id = c.id 
-            WHERE i.name LIKE ?
-            ORDER BY i.name
-        """, (f"%{name_query}%",))
-        return [dict(row) for row in c.fetchall()]
+            LEFT JOIN item_forecast f ON f.item_id = i.id
+            WHERE i.id IN ({placeholders})
+        """, item_ids)
+        return {row["id"]: _decode_item(row) for row in c.fetchall()}
+
+def _fts_match_expression(name_query):
+    # Quote each normalized token so FTS5 operators are taken literally, then prefix-match it
+    tokens = normalize_arabic(name_query).split()
+    return " ".join('"' + token.replace('"', '""') + '"*' for token in tokens)
+
+def search_items_by_name(name_query, limit=50):
+    """
+    Prefix search over item names and barcodes via the items_fts index, with
+    Arabic spelling variants folded together. Returns at most `limit` matches
+    sorted by name; ranking every match would cost a full scan on short prefixes.
+    """
+    match = _fts_match_expression(name_query)
+    if not match:
+        return []
+    with get_db() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("""
+                SELECT i.*, c.name as category_name 
+                FROM items_fts f
+                JOIN items i ON i.id = f.rowid
+                LEFT JOIN categories c ON i.category_id = c.id 
+                WHERE items_fts MATCH ?
+                LIMIT ?
+            """, (match, limit))
+        except sqlite3.OperationalError:
+            # Search index not built on this database (migrations not run yet)
+            c.execute("""
+                SELECT i.*, c.name as category_name 
+                FROM items i 
+                LEFT JOIN categories c ON i.category_id = c.id 
+                WHERE i.name LIKE ?
+                LIMIT ?
+            """, (f"%{name_query}%", limit))
+        return sorted((_decode_item(row) for row in c.fetchall()), key=lambda item: item["name"])
+
+def _apply_daily_delta(c, sale_datetime, revenue=0, cost=0, sale_count=0, item_count=0):
+    """Fold a sales change (amounts in minor units) into daily_sales_summary, inside the caller's transaction."""
+    c.execute("""
+        INSERT INTO daily_sales_summary(date, revenue, cost, profit, sale_count, item_count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(date) DO UPDATE SET
+            revenue = revenue + excluded.revenue,
+            cost = cost + excluded.cost,
+            profit = profit + excluded.profit,
+            sale_count = sale_count + excluded.sale_count,
+            item_count = item_count + excluded.item_count
+    """, (sale_datetime[:10], revenue, cost, revenue - cost, sale_count, item_count))
+
+def _recalc_sale_totals(c, sale_id, item_count_delta=0):
+    """Recompute a sale's totals from its details and roll the difference into its day."""
+    c.execute("SELECT datetime, total_price, total_purchase_price FROM sales WHERE id=?", (sale_id,))
+    sale = c.fetchone()
+
+    # Summed per line in Python, the same rounding checkout uses, so edits never drift from it
+    c.execute("SELECT quantity, subtotal, purchase_price_each FROM sale_details WHERE sale_id=?", (sale_id,))
+    lines = c.fetchall()
+    new_total_price = sum(line["subtotal"] for line in lines)
+    new_total_purchase_price = sum(money.line_total(line["quantity"], line["purchase_price_each"]) for line in lines)
+
+    c.execute("UPDATE sales SET total_price=?, total_purchase_price=? WHERE id=?", 
+              (new_total_price, new_total_purchase_price, sale_id))
+    _apply_daily_delta(c, sale["datetime"],
+                       revenue=new_total_price - sale["total_price"],
+                       cost=new_total_purchase_price - sale["total_purchase_price"],
+                       item_count=item_count_delta)
 
 def add_sale(total_price, total_purchase_price, sale_datetime=None):
-    with get_db() as conn:
+    if sale_datetime is None:
+        sale_datetime = datetime.now().isoformat()
+    total_price, total_purchase_price = to_minor(total_price), to_minor(total_purchase_price)
+    def job(conn):
         c = conn.cursor()
-        if sale_datetime is None:
-            sale_datetime = datetime.now().isoformat()
         c.execute(
             "INSERT INTO sales(datetime, total_price, total_purchase_price) VALUES (?, ?, ?)",
             (sale_datetime, total_price, total_purchase_price)
         )
-        conn.commit()
+        _apply_daily_delta(c, sale_datetime, revenue=total_price, cost=total_purchase_price, sale_count=1)
         return c.lastrowid
+    return _write(job, lambda sale_id: _notify("sale_added", sale_id=sale_id, item_ids=[], stock_levels={})).result()
 
 def add_sale_detail(sale_id, item_id, quantity, price_each, purchase_price_each):
-    with get_db() as conn:
+    price_minor = to_minor(price_each)
+    def job(conn):
         c = conn.cursor()
-        subtotal = quantity * price_each
+        subtotal = money.line_total(quantity, price_minor)
         c.execute(
             "INSERT INTO sale_details(sale_id, item_id, quantity, price_each, purchase_price_each, subtotal) VALUES (?, ?, ?, ?, ?, ?)",
-            (sale_id, item_id, quantity, price_each, purchase_price_each, subtotal)
+            (sale_id, item_id, quantity, price_minor, to_minor(purchase_price_each), subtotal)
         )
         
         # Deduct from stock_count
         c.execute("UPDATE items SET stock_count = stock_count - ? WHERE id = ?", (quantity, item_id))
-        conn.commit()
+
+        # The sale's totals were recorded by add_sale; only the item count changes
+        c.execute("SELECT datetime FROM sales WHERE id = ?", (sale_id,))
+        sale_datetime = c.fetchone()["datetime"]
+        _apply_daily_delta(c, sale_datetime, item_count=quantity)
+        forecasting.record_sales(conn, [(item_id, quantity, sale_datetime)])
+    _write(job, lambda _: _notify("sale_updated", sale_id=sale_id, item_ids=[item_id])).result()
+
+def checkout_async(bill_lines, sale_datetime=None):
+    """
+    Record a whole bill atomically: the sale, all its details and the stock
+    deductions are written in one transaction.
+    bill_lines are dicts with "id", "qty", "price" and "purchase_price" keys
+    (the shape of Controller.current_bill_items).
+    Returns a Future for (sale_id, {item_id: new stock_count}, {item_id: forecast}).
+    """
+    if not bill_lines:
+        raise ValueError("cannot check out an empty bill")
+    if sale_datetime is None:
+        sale_datetime = datetime.now().isoformat()
+
+    # Each line is rounded to minor units once; the sale's totals are exact sums of those
+    rows = []
+    total_price = total_purchase_price = 0
+    for line in bill_lines:
+        price, purchase_price = to_minor(line["price"]), to_minor(line["purchase_price"])
+        subtotal = money.line_total(line["qty"], price)
+        rows.append((line["id"], line["qty"], price, purchase_price, subtotal))
+        total_price += subtotal
+        total_purchase_price += money.line_total(line["qty"], purchase_price)
+
+    def job(conn):
+        c = conn.cursor()
+        c.execute(
+            "INSERT INTO sales(datetime, total_price, total_purchase_price) VALUES (?, ?, ?)",
+            (sale_datetime, total_price, total_purchase_price)
+        )
+        sale_id = c.lastrowid
+        c.executemany(
+            "INSERT INTO sale_details(sale_id, item_id, quantity, price_each, purchase_price_each, subtotal) VALUES (?, ?, ?, ?, ?, ?)",
+            [(sale_id,) + row for row in rows]
+        )
+        c.executemany(
+            "UPDATE items SET stock_count = stock_count - ? WHERE id = ?",
+            [(line["qty"], line["id"]) for line in bill_lines]
+        )
+        _apply_daily_delta(c, sale_datetime, revenue=total_price, cost=total_purchase_price,
+                           sale_count=1, item_count=sum(line["qty"] for line in bill_lines))
+        forecasts = forecasting.record_sales(conn, [(line["id"], line["qty"], sale_datetime) for line in bill_lines])
+
+        item_ids = list({line["id"] for line in bill_lines})
+        placeholders = ",".join("?" * len(item_ids))
+        c.execute(f"SELECT id, stock_count FROM items WHERE id IN ({placeholders})", item_ids)
+        stock_levels = {row["id"]: row["stock_count"] for row in c.fetchall()}
+        return sale_id, stock_levels, forecasts
+
+    def published(result):
+        sale_id, stock_levels, forecasts = result
+        _notify("sale_added", sale_id=sale_id, item_ids=list(stock_levels), stock_levels=stock_levels,
+                forecasts=forecasts)
+    return _write(job, published)
+
+def checkout(bill_lines, sale_datetime=None):
+    """Blocking checkout_async; returns (sale_id, {item_id: new stock_count})."""
+    sale_id, stock_levels, _ = checkout_async(bill_lines, sale_datetime).result()
+    return sale_id, stock_levels
 
 def get_sales():
     with get_db() as conn:
         c = conn.cursor()
         c.execute("SELECT * FROM sales ORDER BY datetime DESC")
-        return [dict(row) for row in c.fetchall()]
+        return [_decode_sale(row) for row in c.fetchall()]
+
+def get_sales_page(limit, before=None, date_from=None, date_to=None, min_total=None, max_total=None):
+    """
+    Newest-first page of sales. `before` is the (datetime, id) key of the last
+    row already loaded, so each page is an index range scan on
+    idx_sales_datetime_id rather than an OFFSET over every newer sale.
+    date_from/date_to are inclusive YYYY-MM-DD days; min_total/max_total
+    bound total_price. Every filter is optional.
+    """
+    conditions, params = [], []
+    if before is not None:
+        conditions.append("(datetime, id) < (?, ?)")
+        params.extend(before)
+    if date_from:
+        conditions.append("datetime >= ?")
+        params.append(date_from)
+    if date_to:
+        next_day = datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)
+        conditions.append("datetime < ?")
+        params.append(next_day.strftime("%Y-%m-%d"))
+    if min_total is not None:
+        conditions.append("total_price >= ?")
+        params.append(to_minor(min_total))
+    if max_total is not None:
+        conditions.append("total_price <= ?")
+        params.append(to_minor(max_total))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute(f"SELECT * FROM sales {where} ORDER BY datetime DESC, id DESC LIMIT ?", params + [limit])
+        return [_decode_sale(row) for row in c.fetchall()]
+
+def get_sale(sale_id):
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute("SELECT * FROM sales WHERE id = ?", (sale_id,))
+        sale = c.fetchone()
+        return _decode_sale(sale) if sale else None
 
 def get_sale_details(sale_id):
     with get_db() as conn:
@@ -247,10 +656,10 @@ def get_sale_details(sale_id):
             WHERE sd.sale_id = ?
             ORDER BY i.name
         """, (sale_id,))
-        return [dict(row) for row in c.fetchall()]
+        return [_decode_sale_detail(row) for row in c.fetchall()]
 
-def delete_sale(sale_id):
-    with get_db() as conn:
+def delete_sale_async(sale_id):
+    def job(conn):
         c = conn.cursor()
         # First, get details to return items to stock
         c.execute("SELECT item_id, quantity FROM sale_details WHERE sale_id = ?", (sale_id,))
@@ -258,26 +667,52 @@ def delete_sale(sale_id):
         for detail in details:
             c.execute("UPDATE items SET stock_count = stock_count + ? WHERE id = ?", (detail["quantity"], detail["item_id"]))
         
+        # Take the whole sale back out of its day's summary
+        c.execute("SELECT datetime, total_price, total_purchase_price FROM sales WHERE id = ?", (sale_id,))
+        sale = c.fetchone()
+        if sale:
+            _apply_daily_delta(c, sale["datetime"], revenue=-sale["total_price"], cost=-sale["total_purchase_price"],
+                               sale_count=-1, item_count=-sum(detail["quantity"] for detail in details))
+            forecasting.record_sales(conn, [(d["item_id"], -d["quantity"], sale["datetime"]) for d in details])
+        
         # Then delete the sale and its details (ON DELETE CASCADE handles sale_details)
         c.execute("DELETE FROM sales WHERE id = ?", (sale_id,))
-        conn.commit()
+        return list({detail["item_id"] for detail in details})
+    return _write(job, lambda item_ids: _notify("sale_deleted", sale_id=sale_id, item_ids=item_ids))
 
-def delete_sale_detail(detail_id):
-    with get_db() as conn:
+def delete_sale(sale_id):
+    delete_sale_async(sale_id).result()
+
+def delete_sale_detail_async(detail_id):
+    def job(conn):
         c = conn.cursor()
         # Get detail to return item to stock
-        c.execute("SELECT item_id, quantity FROM sale_details WHERE id=?", (detail_id,))
+        c.execute("""
+            SELECT sd.sale_id, sd.item_id, sd.quantity, s.datetime
+            FROM sale_details sd JOIN sales s ON s.id = sd.sale_id
+            WHERE sd.id=?
+        """, (detail_id,))
         detail = c.fetchone()
         
         if detail:
+            forecasting.record_sales(conn, [(detail["item_id"], -detail["quantity"], detail["datetime"])])
             # Return quantity to stock
             c.execute("UPDATE items SET stock_count = stock_count + ? WHERE id = ?", (detail["quantity"], detail["item_id"]))
-            # Delete the detail
+            # Delete the detail and bring the parent sale's totals (and its day) in line
             c.execute("DELETE FROM sale_details WHERE id=?", (detail_id,))
-            conn.commit()
+            _recalc_sale_totals(c, detail["sale_id"], item_count_delta=-detail["quantity"])
+        return detail
 
-def update_sale_detail(detail_id, quantity, price_each):
-    with get_db() as conn:
+    def published(detail):
+        if detail:
+            _notify("sale_updated", sale_id=detail["sale_id"], item_ids=[detail["item_id"]])
+    return _write(job, published)
+
+def delete_sale_detail(detail_id):
+    delete_sale_detail_async(detail_id).result()
+
+def update_sale_detail_async(detail_id, quantity, price_each):
+    def job(conn):
         c = conn.cursor()
         
         # Get current detail to calculate stock difference
@@ -293,61 +728,87 @@ def update_sale_detail(detail_id, quantity, price_each):
                      (quantity_diff, old_detail["item_id"]))
         
         # Update sale detail
-        subtotal = quantity * price_each
+        price_minor = to_minor(price_each)
+        subtotal = money.line_total(quantity, price_minor)
         c.execute(
             "UPDATE sale_details SET quantity=?, price_each=?, subtotal=? WHERE id=?",
-            (quantity, price_each, subtotal, detail_id)
+            (quantity, price_minor, subtotal, detail_id)
         )
         
         # Update parent sale's total_price and total_purchase_price
-        c.execute("SELECT sale_id FROM sale_details WHERE id=?", (detail_id,))
-        sale_id = c.fetchone()["sale_id"]
-        
-        c.execute("SELECT SUM(subtotal) FROM sale_details WHERE sale_id=?", (sale_id,))
-        new_total_price = c.fetchone()[0] or 0.0
+        c.execute("SELECT sd.sale_id, s.datetime FROM sale_details sd JOIN sales s ON s.id = sd.sale_id WHERE sd.id=?",
+                  (detail_id,))
+        sale = c.fetchone()
+        sale_id = sale["sale_id"]
+        _recalc_sale_totals(c, sale_id, item_count_delta=quantity - old_detail["quantity"] if old_detail else 0)
+        if old_detail:
+            forecasting.record_sales(conn, [(old_detail["item_id"], quantity - old_detail["quantity"], sale["datetime"])])
+        return sale_id, [old_detail["item_id"]] if old_detail else []
 
-        c.execute("SELECT SUM(quantity * purchase_price_each) FROM sale_details WHERE sale_id=?", (sale_id,))
-        new_total_purchase_price = c.fetchone()[0] or 0.0
+    def published(result):
+        sale_id, item_ids = result
+        _notify("sale_updated", sale_id=sale_id, item_ids=item_ids)
+    return _write(job, published)
+
+def update_sale_detail(detail_id, quantity, price_each):
+    update_sale_detail_async(detail_id, quantity, price_each).result()
 
-        c.execute("UPDATE sales SET total_price=?, total_purchase_price=? WHERE id=?", 
-                  (new_total_price, new_total_purchase_price, sale_id))
-        
-        conn.commit()
 
+def refresh_forecasts_async():
+    """Re-derive every item forecast from its stored sums, so items that stopped selling decay."""
+    return _write(forecasting.refresh, lambda forecasts: _notify("forecasts_refreshed", forecasts=forecasts))
 
+
+# KPI reads come from daily_sales_summary: O(days) for all-time, one row for today.
 def get_sales_total():
     with get_db() as conn:
         c = conn.cursor()
-        c.execute("SELECT COALESCE(SUM(total_price), 0) as total FROM sales")
+        c.execute("SELECT COALESCE(SUM(revenue), 0) as total FROM daily_sales_summary")
         result = c.fetchone()
-        return result["total"] if result else 0
+        return from_minor(result["total"]) if result else 0
 
 def get_sales_summary_today():
     with get_db() as conn:
         c = conn.cursor()
         today = datetime.now().strftime("%Y-%m-%d")
-        c.execute("SELECT COALESCE(SUM(total_price), 0) as total FROM sales WHERE datetime LIKE ?", (f"{today}%",))
+        c.execute("SELECT COALESCE(SUM(revenue), 0) as total FROM daily_sales_summary WHERE date = ?", (today,))
         result = c.fetchone()
-        return result["total"] if result else 0
+        return from_minor(result["total"]) if result else 0
 
 def get_latest_sale():
     with get_db() as conn:
         c = conn.cursor()
         c.execute("SELECT * FROM sales ORDER BY datetime DESC LIMIT 1")
         sale = c.fetchone()
-        return dict(sale) if sale else None
+        return _decode_sale(sale) if sale else None
 
 def get_revenue_and_profit_all_time():
     with get_db() as conn:
         c = conn.cursor()
-        c.execute("SELECT COALESCE(SUM(total_price), 0) as total_revenue, COALESCE(SUM(total_price - total_purchase_price), 0) as total_profit FROM sales")
+        c.execute("SELECT COALESCE(SUM(revenue), 0) as total_revenue, COALESCE(SUM(profit), 0) as total_profit FROM daily_sales_summary")
         result = c.fetchone()
-        return dict(result) if result else {"total_revenue": 0, "total_profit": 0}
+        return money.decode(result, ("total_revenue", "total_profit")) if result else {"total_revenue": 0, "total_profit": 0}
 
 def get_revenue_and_profit_today():
     with get_db() as conn:
         c = conn.cursor()
         today = datetime.now().strftime("%Y-%m-%d")
-        c.execute("SELECT COALESCE(SUM(total_price), 0) as total_revenue, COALESCE(SUM(total_price - total_purchase_price), 0) as total_profit FROM sales WHERE datetime LIKE ?", (f"{today}%",))
+        c.execute("SELECT COALESCE(SUM(revenue), 0) as total_revenue, COALESCE(SUM(profit), 0) as total_profit FROM daily_sales_summary WHERE date = ?", (today,))
         result = c.fetchone()
-        return dict(result) if result else {"total_revenue": 0, "total_profit": 0}
+        return money.decode(result, ("total_revenue", "total_profit")) if result else {"total_revenue": 0, "total_profit": 0}
+
+def get_daily_sales_summary(date_from=None, date_to=None):
+    """Per-day rollup rows (date, revenue, cost, profit, sale_count, item_count), oldest first."""
+    # Only bound the columns actually given; COALESCE(?, date) would hide the range from the primary key
+    conditions, params = [], []
+    if date_from:
+        conditions.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("date <= ?")
+        params.append(date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with get_db() as conn:
+        c = conn.cursor()
+        c.execute(f"SELECT * FROM daily_sales_summary {where} ORDER BY date", params)
+        return [money.decode(row, money.SUMMARY_FIELDS) for row in c.fetchall()]
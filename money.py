@@ -0,0 +1,42 @@
+# money.py - Amounts are stored as integer minor units (santeem); models converts at its boundary
+from decimal import Decimal, ROUND_HALF_UP
+
+MINOR_PER_UNIT = 100
+
+# Money columns per table; models decodes these on every row it returns
+ITEM_FIELDS = ("price", "purchase_price")
+SALE_FIELDS = ("total_price", "total_purchase_price")
+SALE_DETAIL_FIELDS = ("price_each", "purchase_price_each", "subtotal")
+SUMMARY_FIELDS = ("revenue", "cost", "profit")
+
+def _round(value):
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def to_minor(amount):
+    """Encode a decoded amount (float, int, str or Decimal) as integer minor units, rounding half up."""
+    if amount is None:
+        return None
+    # str() first so 0.1 is taken as written rather than as its binary approximation
+    return _round(Decimal(str(amount)) * MINOR_PER_UNIT)
+
+def from_minor(units):
+    """Decode integer minor units for display and for the UI's spin boxes."""
+    if units is None:
+        return None
+    return units / MINOR_PER_UNIT
+
+def line_total(quantity, unit_minor):
+    """Minor units for quantity x a unit price already in minor units (quantities may be fractional)."""
+    return _round(Decimal(str(quantity)) * unit_minor)
+
+def add(*amounts):
+    """Exact sum of decoded amounts, via minor units instead of float addition."""
+    return from_minor(sum(to_minor(amount or 0) for amount in amounts))
+
+def decode(row, fields):
+    """dict(row) with the given money fields decoded from minor units."""
+    decoded = dict(row)
+    for field in fields:
+        if decoded.get(field) is not None:
+            decoded[field] = from_minor(decoded[field])
+    return decoded
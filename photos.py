@@ -0,0 +1,191 @@
+# photos.py - Content-addressed item photos with thumbnails made off the GUI thread
+"""
+Photos are stored once under assets/photos as <sha256>.<ext>, so the same
+picture attached to several items (or captured twice) takes one file.
+Each photo gets a fixed-size thumbnail in assets/photos/thumbs, which is
+all the stock tab ever loads; the full-size image is only read once, when
+the thumbnail is made. Everything here may run on a worker thread (QImage,
+unlike QPixmap, is safe off the GUI thread).
+"""
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage
+
+import camera_scanner
+
+PHOTOS_DIR = os.path.join("assets", "photos")
+THUMBS_DIR = os.path.join(PHOTOS_DIR, "thumbs")
+THUMB_SIZE = 116 # The stock tab preview label is 120px with a 2px border
+
+_CHUNK = 1 << 16
+
+# Legacy (not content-addressed) photo path -> (mtime, size, digest), so each is hashed once
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def _is_digest(name):
+    return len(name) == 64 and all(ch in "0123456789abcdef" for ch in name)
+
+def file_digest(path):
+    """sha256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def photo_digest(path):
+    """The content hash for a photo path: free for stored photos, memoized for older ones."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if _is_digest(stem):
+        return stem
+    stat = os.stat(path)
+    with _digests_lock:
+        known = _digests.get(path)
+    if known and known[:2] == (stat.st_mtime, stat.st_size):
+        return known[2]
+    digest = file_digest(path)
+    with _digests_lock:
+        _digests[path] = (stat.st_mtime, stat.st_size, digest)
+    return digest
+
+def _write_atomically(path, write):
+    """Write through a temporary file in the same folder, so readers never see half a file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def thumbnail_path(digest):
+    return os.path.join(THUMBS_DIR, f"{digest}_{THUMB_SIZE}.png")
+
+def make_thumbnail(image_path, digest):
+    """Create (if missing) and return the thumbnail for a photo; None if it is not a readable image."""
+    thumb = thumbnail_path(digest)
+    if os.path.exists(thumb):
+        return thumb
+    image = QImage(image_path)
+    if image.isNull():
+        return None
+    scaled = image.scaled(THUMB_SIZE, THUMB_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    def save(tmp):
+        if not scaled.save(tmp, "PNG"):
+            raise OSError(f"could not write thumbnail {thumb}")
+    _write_atomically(thumb, save)
+    return thumb
+
+def ensure_thumbnail(photo_path):
+    """Thumbnail path for any photo path (stored or older free-form ones), or None if there is no image."""
+    if not photo_path or not os.path.isfile(photo_path):
+        return None
+    return make_thumbnail(photo_path, photo_digest(photo_path))
+
+def ingest_bytes(data, extension=".jpg"):
+    """Store encoded image bytes under their hash (once) and make the thumbnail; returns the stored path."""
+    digest = hashlib.sha256(data).hexdigest()
+    stored = os.path.join(PHOTOS_DIR, digest + extension.lower())
+    if not os.path.exists(stored):
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                f.write(data)
+        _write_atomically(stored, write)
+    make_thumbnail(stored, digest)
+    return stored
+
+def ingest_file(path):
+    """Copy a chosen image into the store (deduplicated) and make its thumbnail; returns the stored path."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return ingest_bytes(data, os.path.splitext(path)[1] or ".jpg")
+
+def ingest_frame(frame, quality=90):
+    """JPEG-encode a camera frame (BGR array) into the store; returns the stored path."""
+    cv2 = camera_scanner.load_libraries()
+    if cv2 is None:
+        raise RuntimeError("Camera capture needs OpenCV (pip install opencv-python)")
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("could not encode the camera frame")
+    return ingest_bytes(encoded.tobytes(), ".jpg")
+
+
+class LRUCache:
+    """Small least-recently-used map (e.g. photo path -> QPixmap); get() refreshes an entry."""
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FrameGrabber:
+    """
+    Reads frames from a source (see camera_scanner.open_source) on its own
+    thread, keeping only the newest. on_frame(frame) is called on that
+    thread at most max_fps times a second, for a live preview.
+    """
+
+    def __init__(self, source, on_frame=None, max_fps=15):
+        self.source = source
+        self.on_frame = on_frame
+        self._interval = 1.0 / max_fps
+        self._latest = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="photo-grab", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def latest(self):
+        with self._lock:
+            return self._latest
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        last_shown = 0.0
+        try:
+            while not self._stopping.is_set():
+                ok, frame = self.source.read()
+                if not ok:
+                    break
+                with self._lock:
+                    self._latest = frame
+                now = time.monotonic()
+                if self.on_frame is not None and now - last_shown >= self._interval:
+                    last_shown = now
+                    self.on_frame(frame)
+        finally:
+            self.source.release()
@@ -1,15 +1,33 @@
+import os
+import sys
+import math
+import argparse
 import models
 import database
+import forecasting
+import migrations
+import money
 from datetime import datetime, timedelta
 import random
-from faker import Faker
 
-fake = Faker('ar_SA') # Use Arabic locale for names
+try:
+    from faker import Faker
+    fake = Faker('ar_SA') # Use Arabic locale for names
+except ImportError:
+    fake = None # Names are built from WORDS instead
+
+DEFAULT_CATEGORIES = ["غير مصنّف", "مواد غذائية", "مشروبات", "منظفات", "أدوات منزلية", "قرطاسية", "إلكترونيات", "ملابس", "حلويات", "خضروات وفواكه", "لحوم وأسماك"]
+WORDS = ["حليب", "خبز", "زيت", "سكر", "أرز", "شاي", "قهوة", "ماء", "عصير", "جبن", "زبدة", "بيض",
+         "دقيق", "ملح", "صابون", "شامبو", "منظف", "مناديل", "بسكويت", "شوكولاتة", "حلوى", "تمر",
+         "عسل", "مربى", "طماطم", "بطاطس", "بصل", "تفاح", "موز", "برتقال", "دجاج", "لحم", "سمك",
+         "تونة", "معكرونة", "عدس", "حمص", "فول", "قلم", "دفتر", "بطارية", "مصباح", "كوب", "صحن"]
+
+def _word():
+    return fake.word() if fake is not None else random.choice(WORDS)
 
 def add_default_categories():
     """Ensures default categories exist in the database."""
-    default_cats = ["غير مصنّف", "مواد غذائية", "مشروبات", "منظفات", "أدوات منزلية", "قرطاسية", "إلكترونيات", "ملابس", "حلويات", "خضروات وفواكه", "لحوم وأسماك"]
-    for cat_name in default_cats:
+    for cat_name in DEFAULT_CATEGORIES:
         try:
             models.add_category(cat_name)
             # print(f"Added category: {cat_name}") # Suppress for cleaner output
@@ -31,7 +49,7 @@ def generate_items_data(num_items=100):
 
     # Try to add items until num_items is reached or we can't generate unique barcodes
     while len(items) < num_items:
-        item_name = fake.word() + " " + fake.word() + " " + str(random.randint(1, 100)) # More varied names
+        item_name = _word() + " " + _word() + " " + str(random.randint(1, 100)) # More varied names
         barcode = str(random.randint(100000000000, 9999999999999)) # 13-digit barcode
         
         # Ensure barcode is unique
@@ -159,33 +177,250 @@ def populate_sales(sales_data):
     
     for sale in sales_data:
         try:
-            sale_id = models.add_sale(
-                sale['total_price'], sale['total_purchase_price'], sale['datetime']
-            )
-            for detail in sale['details']:
-                models.add_sale_detail(
-                    sale_id, detail['item_id'], detail['quantity'], 
-                    detail['price_each'], detail['purchase_price_each']
-                )
-                added_details_count += 1
+            bill_lines = [
+                {'id': detail['item_id'], 'qty': detail['quantity'],
+                 'price': detail['price_each'], 'purchase_price': detail['purchase_price_each']}
+                for detail in sale['details']
+            ]
+            models.checkout(bill_lines, sale['datetime'])
+            added_details_count += len(bill_lines)
             added_sales_count += 1
         except Exception as e:
             print(f"Error adding sale on {sale['datetime']}: {e}")
 
     print(f"Added {added_sales_count} new sales and {added_details_count} sale details to the database.")
 
-if __name__ == "__main__":
+# ---------- Bulk mode ----------
+# The functions above go through models one checkout at a time, which is
+# right for a few hundred rows. generate_bulk() instead samples whole
+# columns with NumPy and writes a new database file with executemany in
+# large transactions, for load tests with millions of rows.
+
+np = None # Imported by generate_bulk; the per-row mode does not need NumPy
+
+def _require_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except Exception:
+            raise RuntimeError("Bulk generation needs NumPy (pip install numpy)")
+        np = numpy
+
+BULK_CHUNK = 200_000 # Sale lines generated and written per transaction
+ZIPF_EXPONENT = 1.1  # Item popularity: the item at rank r sells in proportion to 1 / r**s
+BASKET_MEAN = 3.0    # Average lines per sale (1 + Poisson)
+# Monday..Sunday: Thursday and Saturday are the busy days, Friday is quieter
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.05, 1.25, 0.8, 1.3, 1.05)
+# Sales by hour of day: closed overnight, a late-morning peak and a bigger evening one
+HOUR_WEIGHTS = (0, 0, 0, 0, 0, 0, 0, 0.3, 0.6, 0.9, 1.1, 1.2, 1.0, 0.7, 0.6, 0.7, 0.9, 1.2, 1.4, 1.4, 1.1, 0.7, 0.3, 0)
+YEARLY_SWING = 0.15  # +-15% over the year, peaking in summer
+GROWTH = 0.25        # The shop sells 25% more at the end of the history than at its start
+
+def _day_weights(start, days):
+    """Relative number of sales on each day from start: weekday, time of year and the shop's growth."""
+    day = np.arange(days)
+    weekday = (start.weekday() + day) % 7
+    day_of_year = (start.timetuple().tm_yday + day) % 365
+    yearly = 1 + YEARLY_SWING * np.cos(2 * np.pi * (day_of_year - 196) / 365) # Peak mid-July
+    trend = 1 + GROWTH * day / max(days - 1, 1)
+    weights = np.asarray(WEEKDAY_WEIGHTS)[weekday] * yearly * trend
+    return weights / weights.sum()
+
+def _basket_sizes(rng, lines):
+    """Lines per sale, 1 + Poisson(BASKET_MEAN - 1), adding up to exactly `lines`."""
+    sizes = np.empty(0, dtype=np.int64)
+    while sizes.sum() < lines:
+        sizes = np.concatenate([sizes, 1 + rng.poisson(BASKET_MEAN - 1, int(lines / BASKET_MEAN) + 16)])
+    ends = np.cumsum(sizes)
+    count = int(np.searchsorted(ends, lines)) + 1
+    sizes = sizes[:count]
+    sizes[-1] -= ends[count - 1] - lines
+    return sizes
+
+def _insert_chunk(conn, sale_rows, detail_rows):
+    with conn:
+        conn.executemany("INSERT INTO sales(id, datetime, total_price, total_purchase_price) VALUES (?, ?, ?, ?)", sale_rows)
+        conn.executemany("""
+            INSERT INTO sale_details(sale_id, item_id, quantity, price_each, purchase_price_each, subtotal)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, detail_rows)
+
+def generate_bulk(path, num_items=10_000, num_lines=1_000_000, seed=1, days=365, end=None, progress=None):
+    """
+    Write a new database file at `path` with num_items items and num_lines
+    sale lines spread over the `days` whole days before `end`'s date, all drawn from
+    NumPy's default_rng(seed), so a seed always gives the same database.
+
+    - Item popularity follows a Zipf law over a random ranking of the items.
+    - Sales per day follow WEEKDAY_WEIGHTS, a yearly swing and slow growth,
+      and their hours follow HOUR_WEIGHTS. Sale ids rise with time.
+    - Baskets hold 1 + Poisson lines; quantities are mostly 1 or 2.
+    - Prices are log-normal, rounded to 5 units; purchase prices are 60-90% of them.
+    - Stock is consistent with the sales: the current stock is what an
+      item had left after every sale (a few weeks of its recent sales plus
+      some slack, or none), so no sale drew more than the item ever held.
+
+    The daily summary and the forecasts are filled in as the migrations
+    would, so the file opens in the app like a shop's own database.
+    progress(lines written), if given, is called after each transaction.
+    Returns the number of sales written.
+    """
+    _require_numpy()
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists; bulk mode only writes a new database")
+    end = end or datetime.now().replace(microsecond=0)
+    # Whole days, ending at midnight before `end`
+    origin = datetime.combine(end.date() - timedelta(days=days), datetime.min.time())
+    rng = np.random.default_rng(seed)
+
+    database.setup_database(path)
+    conn = database.get_connection(path)
+    try:
+        conn.execute("PRAGMA synchronous = OFF") # A file that is only used once it is complete
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO categories(name, created_at) VALUES (?, ?)",
+                             [(name, origin.isoformat()) for name in DEFAULT_CATEGORIES])
+        category_ids = np.array([row[0] for row in conn.execute("SELECT id FROM categories ORDER BY id")])
+
+        # Items (money in minor units, as models stores it)
+        words = np.array(WORDS)
+        names = words[rng.integers(0, len(words), num_items)]
+        for part in (" ", words[rng.integers(0, len(words), num_items)], " ", rng.integers(1, 1000, num_items).astype(str)):
+            names = np.char.add(names, part)
+        prices = np.clip(np.round(rng.lognormal(math.log(150), 1.0, num_items) / 5) * 5, 5, 20_000)
+        prices = (prices * money.MINOR_PER_UNIT).astype(np.int64)
+        purchase_prices = np.round(prices * rng.uniform(0.6, 0.9, num_items)).astype(np.int64)
+        barcodes = 6130000000000 + rng.permutation(num_items) # Unique 13-digit codes
+        categories = category_ids[rng.integers(0, len(category_ids), num_items)]
+        add_date = origin.isoformat(timespec="seconds") # Before any of their sales
+        # Stock is set once the sales are known (the sale lines need the items to exist first)
+        with conn:
+            conn.executemany("""
+                INSERT INTO items(id, name, category_id, barcode, price, stock_count, add_date, purchase_price)
+                VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+            """, zip(range(1, num_items + 1), names.tolist(), categories.tolist(), barcodes.astype(str).tolist(),
+                     prices.tolist(), [add_date] * num_items, purchase_prices.tolist()))
+
+        popularity = 1.0 / (rng.permutation(num_items) + 1.0) ** ZIPF_EXPONENT
+        popularity /= popularity.sum()
+
+        # Sales: basket sizes, then one timestamp per sale, sorted
+        sizes = _basket_sizes(rng, num_lines)
+        num_sales = len(sizes)
+        day = rng.choice(days, size=num_sales, p=_day_weights(origin, days))
+        hour_weights = np.asarray(HOUR_WEIGHTS, dtype=float)
+        hour = rng.choice(24, size=num_sales, p=hour_weights / hour_weights.sum())
+        seconds = np.sort(day * 86400 + hour * 3600 + rng.integers(0, 3600, num_sales))
+        stamps = np.datetime64(origin, "s") + seconds
+        line_ends = np.cumsum(sizes)
+
+        recent = np.zeros(num_items)           # Units sold in the last 30 days
+        weighted = np.zeros(num_items)         # forecasting's decayed sum, as of `end`
+        first_sale = np.full(num_items, -1, dtype=np.int64) # Seconds from origin to each item's first sale
+        end_seconds = (end - origin).total_seconds()
+
+        written = 0
+        sale = 0
+        while sale < num_sales:
+            last = int(np.searchsorted(line_ends, written + BULK_CHUNK, side="right"))
+            last = max(last, sale + 1)
+            chunk_sizes = sizes[sale:last]
+            line_count = int(chunk_sizes.sum())
+            sale_of_line = np.repeat(np.arange(sale, last), chunk_sizes)
+
+            item = rng.choice(num_items, size=line_count, p=popularity)
+            quantity = np.minimum(rng.geometric(0.65, line_count), 10)
+            price_each = prices[item]
+            cost_each = purchase_prices[item]
+            subtotal = quantity * price_each
+            local = sale_of_line - sale
+            totals = np.bincount(local, weights=subtotal, minlength=len(chunk_sizes)).astype(np.int64)
+            costs = np.bincount(local, weights=quantity * cost_each, minlength=len(chunk_sizes)).astype(np.int64)
+
+            line_seconds = seconds[sale_of_line]
+            age_days = (end_seconds - line_seconds) / 86400
+            recent += np.bincount(item, weights=quantity * (age_days <= 30), minlength=num_items)
+            weighted += np.bincount(item, weights=quantity * np.exp(-age_days / forecasting.TAU_DAYS), minlength=num_items)
+            seen, first_index = np.unique(item, return_index=True) # Lines are in time order
+            new = first_sale[seen] < 0
+            first_sale[seen[new]] = line_seconds[first_index[new]]
+
+            sale_ids = 1 + np.arange(sale, last)
+            _insert_chunk(
+                conn,
+                list(zip(sale_ids.tolist(), np.datetime_as_string(stamps[sale:last], unit="s").tolist(),
+                         totals.tolist(), costs.tolist())),
+                list(zip((1 + sale_of_line).tolist(), (item + 1).tolist(), quantity.astype(float).tolist(),
+                         price_each.tolist(), cost_each.tolist(), subtotal.tolist())),
+            )
+            written += line_count
+            sale = last
+            if progress:
+                progress(written)
+
+        # Stock left now: a few weeks of recent sales (restocked popular items) plus slack, some run out
+        stock = np.round(recent * rng.uniform(0.2, 2.0, num_items)) + rng.integers(0, 150, num_items)
+        stock[rng.random(num_items) < 0.05] = 0
+        with conn:
+            conn.executemany("UPDATE items SET stock_count = ? WHERE id = ?", zip(stock.tolist(), range(1, num_items + 1)))
+            migrations.backfill_daily_sales_summary(conn)
+            forecasting.store_forecasts(conn, (
+                (item_id + 1, weighted[item_id], end, origin + timedelta(seconds=int(first_sale[item_id])),
+                 stock[item_id])
+                for item_id in np.flatnonzero(first_sale >= 0).tolist()
+            ), end)
+        return num_sales
+    finally:
+        conn.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fill store.db with sample categories, items and sales, or write a large "
+                    "seeded dataset to a new file with --bulk (needs numpy).")
+    parser.add_argument("--bulk", action="store_true",
+                        help="write a new database file with NumPy instead of filling store.db")
+    parser.add_argument("--items", type=int, help="items to add (default 100, or 10000 with --bulk)")
+    parser.add_argument("--sales", type=int, default=100, help="sales to add to store.db (default 100)")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="sale lines to write with --bulk")
+    parser.add_argument("--days", type=int, default=365, help="days of sales history with --bulk")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for --bulk")
+    parser.add_argument("--out", default="store_bulk.db", help="file written by --bulk (must not exist)")
+    return parser.parse_args(argv)
+
+def main_bulk(args):
+    num_items = args.items if args.items is not None else 10_000
+    print(f"Generating {num_items} items and {args.lines} sale lines over {args.days} days into {args.out}...")
+    started = datetime.now()
+
+    def report(written):
+        print(f"\r{written}/{args.lines} sale lines", end="", flush=True)
+
+    num_sales = generate_bulk(args.out, num_items, args.lines, seed=args.seed, days=args.days, progress=report)
+    print(f"\nWrote {num_sales} sales in {(datetime.now() - started).total_seconds():.1f}s.")
+    print(f"Copy {args.out} over store.db (with the app closed) to use it.")
+
+def main(argv=None):
+    args = parse_args(argv) # Before any work, so --help or a bad option leaves store.db alone
+    if args.bulk:
+        main_bulk(args)
+        return 0
+
     print("Starting database population...")
     database.setup_database() # Ensure DB structure is set up
     add_default_categories()
 
     # Populate items
-    items_data = generate_items_data(num_items=100)
+    items_data = generate_items_data(num_items=args.items if args.items is not None else 100)
     populate_items(items_data)
 
     # Populate sales (item_ids are fetched dynamically within the function)
-    sales_data = generate_sales_data(num_sales=100)
+    sales_data = generate_sales_data(num_sales=args.sales)
     populate_sales(sales_data)
 
     print("\nDatabase population completed.")
     print("You can now run your main application (`python main.py`) to see the populated data.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
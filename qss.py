@@ -51,7 +51,6 @@ QTabBar::tab:selected {
     background: qlineargradient(x1:0, y1:0, x2:0, y2:1, stop:0 #3b82f6, stop:1 #1e40af);
     color: white;
     border: 2px solid #2563eb;
-    transform: scale(1.02);
 }
 
 QTabBar::tab:hover:!selected {
@@ -98,7 +97,6 @@ QLineEdit, QComboBox, QDoubleSpinBox, QSpinBox {
 QLineEdit:focus, QComboBox:focus, QDoubleSpinBox:focus, QSpinBox:focus {
     border: 2px solid #3b82f6;
     background-color: #1e293b;
-    box-shadow: 0 0 0 3px rgba(59, 130, 246, 0.1);
 }
 
 QLineEdit:hover, QComboBox:hover, QDoubleSpinBox:hover, QSpinBox:hover {
@@ -120,7 +118,6 @@ QLineEdit#barcode_field {
 QLineEdit#barcode_field:focus {
     background: qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 #2563eb, stop:1 #1d4ed8);
     border: 2px solid #60a5fa;
-    box-shadow: 0 0 0 4px rgba(59, 130, 246, 0.2);
 }
 
 QLineEdit#name_field {
@@ -136,7 +133,6 @@ QLineEdit#name_field {
 QLineEdit#name_field:focus {
     background: qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 #10b981, stop:1 #059669);
     border: 2px solid #34d399;
-    box-shadow: 0 0 0 4px rgba(16, 185, 129, 0.2);
 }
 
 /* ComboBox Dropdown */
@@ -188,13 +184,10 @@ QPushButton {
 
 QPushButton:hover { 
     background: qlineargradient(x1:0, y1:0, x2:0, y2:1, stop:0 #16a34a, stop:1 #15803d);
-    transform: translateY(-1px);
-    box-shadow: 0 4px 12px rgba(34, 197, 94, 0.3);
 }
 
 QPushButton:pressed {
     background: qlineargradient(x1:0, y1:0, x2:0, y2:1, stop:0 #15803d, stop:1 #166534);
-    transform: translateY(0px);
 }
 
 QPushButton#danger { 
@@ -203,7 +196,6 @@ QPushButton#danger {
 
 QPushButton#danger:hover { 
     background: qlineargradient(x1:0, y1:0, x2:0, y2:1, stop:0 #dc2626, stop:1 #b91c1c);
-    box-shadow: 0 4px 12px rgba(239, 68, 68, 0.3);
 }
 
 QPushButton#secondary { 
@@ -212,7 +204,6 @@ QPushButton#secondary {
 
 QPushButton#secondary:hover { 
     background: qlineargradient(x1:0, y1:0, x2:0, y2:1, stop:0 #2563eb, stop:1 #1d4ed8);
-    box-shadow: 0 4px 12px rgba(59, 130, 246, 0.3);
 }
 
 QPushButton#warning {
@@ -221,7 +212,6 @@ QPushButton#warning {
 
 QPushButton#warning:hover {
     background: qlineargradient(x1:0, y1:0, x2:0, y2:1, stop:0 #d97706, stop:1 #b45309);
-    box-shadow: 0 4px 12px rgba(245, 158, 11, 0.3);
 }
 
 /* Tables */
@@ -325,7 +315,6 @@ QLabel#HeaderTitle {
     font-weight: 800; 
     color: #60a5fa;
     background: transparent;
-    text-shadow: 0 2px 4px rgba(96, 165, 250, 0.3);
 }
 
 QLabel#OutOfStock { 
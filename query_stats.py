@@ -0,0 +1,363 @@
+# query_stats.py - Time every statement run on the app's connections, per function and per SQL shape
+"""
+Usage: python query_stats.py [out.json] [path/to/store.db]
+
+Runs index_advisor's sample workload on a scratch copy of the database
+with timing enabled, prints the slowest functions and statements and
+writes the full numbers as JSON.
+
+In the app, set KIOSK_QUERY_STATS=1 to time a real session: statements
+slower than KIOSK_SLOW_QUERY_MS (default 100) are appended with their
+EXPLAIN QUERY PLAN to logs/slow_queries.log, and the totals are dumped to
+logs/query_stats.json at exit. Timing works through a sqlite3.Connection
+subclass that database.get_connection only uses while enabled, so a
+normal run executes statements on plain connections with no overhead.
+
+Each statement is attributed to the innermost models function on the
+stack (or its direct caller outside models), and timed from execute()
+until its rows are exhausted or its cursor is closed or dropped; the
+Python work done between fetches is not counted. Rows are the rows
+fetched for queries and the rows changed for writes.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+import database
+import models
+from index_advisor import statement_shape, run_sample_workload
+
+SLOW_QUERY_MS = 100.0
+SLOW_LOG_PATH = os.path.join("logs", "slow_queries.log")
+JSON_PATH = os.path.join("logs", "query_stats.json")
+
+_SAMPLES = 2048 # Latencies kept per function/shape; a reservoir sample beyond that
+_EXPLAINED_VERBS = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def _percentile(ordered, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * fraction // 1)) # ceil
+    return ordered[int(rank) - 1]
+
+class _Series:
+    """Count, total and a bounded sample of latencies (seconds) plus rows for one function or shape."""
+    __slots__ = ("count", "total", "max", "rows", "samples", "callers")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.samples = []
+        self.callers = set()
+
+    def add(self, seconds, rows):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.rows += rows
+        if len(self.samples) < _SAMPLES:
+            self.samples.append(seconds)
+        else:
+            slot = random.randrange(self.count)
+            if slot < _SAMPLES:
+                self.samples[slot] = seconds
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        ms = lambda seconds: round(seconds * 1000, 3)
+        return {
+            "count": self.count, "total_ms": ms(self.total), "mean_ms": ms(self.total / self.count),
+            "p50_ms": ms(_percentile(ordered, 0.50)), "p95_ms": ms(_percentile(ordered, 0.95)),
+            "p99_ms": ms(_percentile(ordered, 0.99)), "max_ms": ms(self.max),
+            "rows": self.rows, "rows_per_call": round(self.rows / self.count, 2),
+        }
+
+
+class QueryStats:
+    """Thread-safe aggregates by function and by statement shape, with the slow-query log."""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log=SLOW_LOG_PATH):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.slow_count = 0
+        self._functions = {}
+        self._statements = {}
+        self._plans = {} # shape -> plan lines, explained once
+        self._lock = threading.Lock()
+
+    def record(self, function, sql, seconds, rows, conn=None, params=None):
+        shape = statement_shape(sql)
+        with self._lock:
+            self._functions.setdefault(function, _Series()).add(seconds, rows)
+            statement = self._statements.setdefault(shape, _Series())
+            statement.add(seconds, rows)
+            statement.callers.add(function)
+        if seconds * 1000 >= self.slow_ms:
+            self._log_slow(function, sql, shape, seconds, rows, conn, params)
+
+    def _plan(self, shape, sql, conn, params):
+        with self._lock:
+            plan = self._plans.get(shape)
+        if plan is not None:
+            return plan
+        if conn is None or params is None or not sql.lstrip()[:7].upper().startswith(_EXPLAINED_VERBS):
+            return []
+        try:
+            # The base class execute, so the EXPLAIN is not timed and recorded itself
+            rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        except sqlite3.Error:
+            return [] # Closed, or used from another thread than the one that opened it
+        plan = [row[3] for row in rows]
+        with self._lock:
+            self._plans[shape] = plan
+        return plan
+
+    def _log_slow(self, function, sql, shape, seconds, rows, conn, params):
+        plan = self._plan(shape, sql, conn, params)
+        lines = [f"{datetime.now():%Y-%m-%d %H:%M:%S}  {seconds * 1000:.1f}ms  {rows} rows  {function}",
+                 f"    {shape}"]
+        lines.extend(f"    plan: {detail}" for detail in plan)
+        with self._lock:
+            self.slow_count += 1
+            try:
+                os.makedirs(os.path.dirname(self.slow_log) or ".", exist_ok=True)
+                with open(self.slow_log, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError as e:
+                print(f"Could not write the slow query log: {e}")
+
+    def snapshot(self):
+        """Plain dict of every aggregate, slowest total first (what dump() writes)."""
+        with self._lock:
+            functions = {name: series.summary() for name, series in self._functions.items()}
+            statements = {}
+            for shape, series in self._statements.items():
+                statements[shape] = dict(series.summary(), functions=sorted(series.callers))
+                if shape in self._plans:
+                    statements[shape]["plan"] = self._plans[shape]
+        by_total = lambda entries: dict(sorted(entries.items(), key=lambda e: -e[1]["total_ms"]))
+        return {"generated": datetime.now().isoformat(timespec="seconds"), "slow_query_ms": self.slow_ms,
+                "slow_queries": self.slow_count, "functions": by_total(functions), "statements": by_total(statements)}
+
+    def reset(self):
+        with self._lock:
+            self._functions.clear()
+            self._statements.clear()
+            self.slow_count = 0
+
+
+_stats = None # The QueryStats collecting while enabled
+
+
+def _caller():
+    """The innermost models function on the stack, else the first caller outside this module."""
+    frame = sys._getframe(2)
+    outside = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__")
+        if module != __name__:
+            name = getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+            if module == "models":
+                return f"models.{name}"
+            if outside is None:
+                outside = f"{module}.{name}"
+        frame = frame.f_back
+    return outside or "?"
+
+class TimedCursor(sqlite3.Cursor):
+    """A cursor that reports each statement to the enabled QueryStats once its rows are read."""
+
+    _pending = None # [function, sql, params, seconds, rows] of the statement being read
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        if _stats is None:
+            return super().execute(sql, parameters)
+        function = _caller()
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._pending = [function, sql, parameters, time.perf_counter() - started, 0]
+        if self.description is None: # Not a query: nothing to fetch, report it now
+            self._pending[4] = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        if _stats is None:
+            return super().executemany(sql, seq_of_parameters)
+        function = _caller()
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        # The first row's values are enough for EXPLAIN; a generator is spent by now
+        params = seq_of_parameters[0] if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters else None
+        self._pending = [function, sql, params, time.perf_counter() - started, max(self.rowcount, 0)]
+        self._finish()
+        return self
+
+    def _add(self, seconds, rows):
+        if self._pending is not None:
+            self._pending[3] += seconds
+            self._pending[4] += rows
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None and _stats is not None:
+            function, sql, params, seconds, rows = pending
+            _stats.record(function, sql, seconds, rows, self.connection, params)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._add(time.perf_counter() - started, row is not None)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(time.perf_counter() - started, len(rows))
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._add(time.perf_counter() - started, len(rows))
+        self._finish()
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add(time.perf_counter() - started, 0)
+            self._finish()
+            raise
+        self._add(time.perf_counter() - started, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish() # e.g. conn.execute(...).fetchone(), never read to the end
+        except Exception:
+            pass
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (including the execute() shortcuts) are TimedCursors."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute would run the statement without the cursor's execute()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def enable(slow_ms=SLOW_QUERY_MS, slow_log=SLOW_LOG_PATH):
+    """
+    Start timing statements on connections opened from now on; returns the
+    QueryStats. Call it before the app opens its connections (the writer
+    and this thread's pooled connection are reopened, other threads' are not).
+    """
+    global _stats
+    _stats = QueryStats(slow_ms, slow_log)
+    database.set_connection_factory(TimedConnection)
+    database.close_writers()
+    models.close_db()
+    return _stats
+
+def disable():
+    global _stats
+    _stats = None
+    database.set_connection_factory(None)
+
+def stats():
+    """The collecting QueryStats, or None while disabled."""
+    return _stats
+
+def dump(path=JSON_PATH):
+    """Write the current aggregates as JSON; returns the snapshot, or None while disabled."""
+    if _stats is None:
+        return None
+    snapshot = _stats.snapshot()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+    return snapshot
+
+def enable_from_environment():
+    """KIOSK_QUERY_STATS=1 turns timing on for this run and dumps the JSON at exit."""
+    if os.environ.get("KIOSK_QUERY_STATS", "") in ("", "0"):
+        return None
+    collected = enable(float(os.environ.get("KIOSK_SLOW_QUERY_MS", SLOW_QUERY_MS)))
+    atexit.register(dump)
+    return collected
+
+def format_report(snapshot, limit=15):
+    lines = []
+    for key, title in (("functions", "Functions"), ("statements", "Statements")):
+        lines.append(f"{title} by total time (count, p50 / p95 / p99 / max ms, rows per call):")
+        for name, s in list(snapshot[key].items())[:limit]:
+            lines.append(f"  {s['total_ms']:9.1f}ms  {s['count']:6d}x  {s['p50_ms']:.2f} / {s['p95_ms']:.2f} / "
+                         f"{s['p99_ms']:.2f} / {s['max_ms']:.2f}  {s['rows_per_call']:g} rows  {name}")
+        lines.append("")
+    lines.append(f"Slow (>= {snapshot['slow_query_ms']:g}ms): {snapshot['slow_queries']}")
+    return "\n".join(lines)
+
+
+def main(argv):
+    out = argv[1] if len(argv) > 1 else "query_stats.json"
+    source = argv[2] if len(argv) > 2 else database.DB_NAME
+    if not os.path.exists(source):
+        print(f"Database not found: {source}")
+        return 1
+    scratch_dir = tempfile.mkdtemp()
+    scratch = os.path.join(scratch_dir, "stats.db")
+    try:
+        src, dst = sqlite3.connect(source), sqlite3.connect(scratch)
+        src.backup(dst)
+        src.close()
+        dst.close()
+        database.setup_database(scratch)
+
+        enable(slow_log=os.path.join(os.path.dirname(os.path.abspath(out)), "slow_queries.log"))
+        models.DB_PATH = scratch
+        try:
+            for _ in range(5): # Enough calls per function for the percentiles to mean something
+                run_sample_workload()
+        finally:
+            database.close_writers()
+            models.close_db()
+        snapshot = dump(out)
+        disable()
+        print(format_report(snapshot))
+        print(f"\nWritten to {out}")
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,229 @@
+# reports.py - Vectorized product performance reports over sale lines (NumPy)
+"""
+analyze(date_from, date_to) pulls every sale line in the range into NumPy
+column arrays once, aggregates them per item, and returns a SalesAnalysis
+whose reports (top sellers, ABC classes, hour x weekday heatmap, category
+contribution) are computed from those arrays without Python loops over rows.
+Analyses are cached per date range and dropped whenever a write could
+change sale lines, so reopening a report for the same range is free.
+"""
+import threading
+from datetime import datetime, timedelta
+
+import models
+from money import MINOR_PER_UNIT, from_minor
+
+WEEKDAYS = ("الأحد", "الإثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت") # strftime('%w') order
+
+# hour and weekday are computed by SQLite so only numbers cross into Python
+_LINES_SQL = """
+    SELECT sd.item_id, COALESCE(i.category_id, -1), sd.quantity, sd.subtotal, sd.purchase_price_each,
+           CAST(strftime('%H', s.datetime) AS INTEGER), CAST(strftime('%w', s.datetime) AS INTEGER)
+    FROM sales s
+    JOIN sale_details sd ON sd.sale_id = s.id
+    JOIN items i ON i.id = sd.item_id
+    {where}
+"""
+_FETCH_SIZE = 20000
+
+np = None # Imported by the first report; NumPy is not needed to start the app
+
+
+def _require_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except Exception:
+            raise RuntimeError("Reports need NumPy (pip install numpy)")
+        np = numpy
+
+def load_sale_lines(date_from=None, date_to=None):
+    """
+    Column arrays for the sale lines whose sale falls in [date_from, date_to]
+    (inclusive YYYY-MM-DD days): item_id, category_id (-1 if none), quantity,
+    revenue and cost in minor units, hour (0-23) and weekday (0 = Sunday).
+    """
+    _require_numpy()
+    conditions, params = [], []
+    if date_from:
+        conditions.append("s.datetime >= ?")
+        params.append(date_from)
+    if date_to:
+        next_day = datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)
+        conditions.append("s.datetime < ?")
+        params.append(next_day.strftime("%Y-%m-%d"))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    chunks = []
+    with models.get_db() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None # Plain tuples convert to an array without a per-row copy
+        cursor.execute(_LINES_SQL.format(where=where), params)
+        while True:
+            rows = cursor.fetchmany(_FETCH_SIZE)
+            if not rows:
+                break
+            # Every value is an integer below 2**53 or a quantity, so float64 holds them exactly
+            chunks.append(np.array(rows, dtype=np.float64))
+    table = np.concatenate(chunks) if chunks else np.empty((0, 7), dtype=np.float64)
+
+    quantity = table[:, 2]
+    return {
+        "item_id": table[:, 0].astype(np.int64),
+        "category_id": table[:, 1].astype(np.int64),
+        "quantity": quantity,
+        "revenue": table[:, 3].astype(np.int64),
+        # Half up, like money.line_total; quantities and prices are never negative
+        "cost": np.floor(quantity * table[:, 4] + 0.5).astype(np.int64),
+        "hour": table[:, 5].astype(np.int8),
+        "weekday": table[:, 6].astype(np.int8),
+    }
+
+
+class SalesAnalysis:
+    """Per-item aggregates for one date range; the report methods return plain dicts with money decoded."""
+
+    def __init__(self, lines, date_from=None, date_to=None):
+        _require_numpy()
+        self.date_from = date_from
+        self.date_to = date_to
+        self.lines = lines
+        self.line_count = len(lines["item_id"])
+
+        # One slot per distinct item; `inverse` maps each line to its item's slot
+        self.item_ids, inverse = np.unique(lines["item_id"], return_inverse=True)
+        slots = len(self.item_ids)
+        self.quantity = np.bincount(inverse, weights=lines["quantity"], minlength=slots)
+        self.revenue = np.bincount(inverse, weights=lines["revenue"], minlength=slots).astype(np.int64)
+        self.cost = np.bincount(inverse, weights=lines["cost"], minlength=slots).astype(np.int64)
+        self.margin = self.revenue - self.cost
+        # An item has one category, so any of its lines gives it
+        self.category_id = np.zeros(slots, dtype=np.int64)
+        self.category_id[inverse] = lines["category_id"]
+
+    def totals(self):
+        revenue, cost = int(self.revenue.sum()), int(self.cost.sum())
+        return {"lines": self.line_count, "items": len(self.item_ids), "quantity": float(self.quantity.sum()),
+                "revenue": from_minor(revenue), "cost": from_minor(cost), "margin": from_minor(revenue - cost)}
+
+    def _item_rows(self, slots):
+        items = models.get_items_by_ids(int(self.item_ids[slot]) for slot in slots)
+        rows = []
+        for slot in slots:
+            item_id, revenue = int(self.item_ids[slot]), int(self.revenue[slot])
+            item = items.get(item_id, {})
+            rows.append({
+                "item_id": item_id,
+                "name": item.get("name", f"#{item_id}"),
+                "category": item.get("category_name"),
+                "quantity": float(self.quantity[slot]),
+                "revenue": from_minor(revenue),
+                "cost": from_minor(int(self.cost[slot])),
+                "margin": from_minor(int(self.margin[slot])),
+                "margin_pct": float(self.margin[slot]) / revenue * 100 if revenue else 0.0,
+            })
+        return rows
+
+    def top_sellers(self, by="revenue", limit=10):
+        """The `limit` best items by "revenue", "quantity" or "margin"."""
+        values = {"revenue": self.revenue, "quantity": self.quantity, "margin": self.margin}[by]
+        if len(values) > limit:
+            # argpartition finds the top `limit` in O(n); only those are sorted
+            slots = np.argpartition(-values, limit)[:limit]
+        else:
+            slots = np.arange(len(values))
+        slots = slots[np.lexsort((self.item_ids[slots], -values[slots]))]
+        return self._item_rows(slots.tolist())
+
+    def abc_classes(self, a_share=0.8, b_share=0.95):
+        """
+        Pareto classes by revenue: A items make up the first `a_share` of
+        revenue, B the next slice up to `b_share`, C the long tail. Returns
+        {"classes": {item_id: "A"|"B"|"C"}, "summary": {class: {"items", "revenue", "share"}}}.
+        """
+        order = np.lexsort((self.item_ids, -self.revenue))
+        revenue = self.revenue[order]
+        total = revenue.sum()
+        # Share of revenue before each item, so the item that crosses a threshold still gets the higher class
+        before = (np.cumsum(revenue) - revenue) / total if total else np.zeros(len(revenue))
+        labels = np.array(["A", "B", "C"])[np.searchsorted([a_share, b_share], before, side="right")]
+        summary = {}
+        for label in "ABC":
+            mask = labels == label
+            class_revenue = int(revenue[mask].sum())
+            summary[label] = {"items": int(mask.sum()), "revenue": from_minor(class_revenue),
+                              "share": class_revenue / int(total) * 100 if total else 0.0}
+        return {"classes": dict(zip(self.item_ids[order].tolist(), labels.tolist())), "summary": summary}
+
+    def heatmap(self, value="revenue"):
+        """7 x 24 nested list (weekday, 0 = Sunday, by hour) of "revenue", "margin" (both decoded), "quantity" or "lines"."""
+        lines = self.lines
+        cell = lines["weekday"].astype(np.int64) * 24 + lines["hour"]
+        if value == "lines":
+            weights = None
+        elif value == "margin":
+            weights = lines["revenue"] - lines["cost"]
+        else:
+            weights = lines[value]
+        grid = np.bincount(cell, weights=weights, minlength=7 * 24).reshape(7, 24)
+        if value in ("revenue", "margin"):
+            grid = grid / MINOR_PER_UNIT
+        return grid.tolist()
+
+    def category_contribution(self):
+        """Revenue, margin and their shares per category, largest revenue first."""
+        categories, inverse = np.unique(self.category_id, return_inverse=True)
+        revenue = np.bincount(inverse, weights=self.revenue, minlength=len(categories)).astype(np.int64)
+        margin = np.bincount(inverse, weights=self.margin, minlength=len(categories)).astype(np.int64)
+        quantity = np.bincount(inverse, weights=self.quantity, minlength=len(categories))
+        total_revenue, total_margin = int(revenue.sum()), int(margin.sum())
+        names = {c["id"]: c["name"] for c in models.get_categories()}
+        rows = []
+        for slot in np.argsort(-revenue, kind="stable").tolist():
+            category_id = int(categories[slot])
+            rows.append({
+                "category_id": category_id if category_id >= 0 else None,
+                "name": names.get(category_id, "بدون تصنيف"),
+                "quantity": float(quantity[slot]),
+                "revenue": from_minor(int(revenue[slot])),
+                "margin": from_minor(int(margin[slot])),
+                "revenue_share": int(revenue[slot]) / total_revenue * 100 if total_revenue else 0.0,
+                "margin_share": int(margin[slot]) / total_margin * 100 if total_margin else 0.0,
+            })
+        return rows
+
+
+# Analyses by (date_from, date_to). A write bumps the generation so an analysis
+# loaded while it was committing is not cached over the newer data.
+_cache = {}
+_cache_lock = threading.Lock()
+_generation = 0
+
+def analyze(date_from=None, date_to=None):
+    """The cached SalesAnalysis for [date_from, date_to], loading it if needed."""
+    key = (date_from or None, date_to or None)
+    with _cache_lock:
+        analysis = _cache.get(key)
+        generation = _generation
+    if analysis is not None:
+        return analysis
+    analysis = SalesAnalysis(load_sale_lines(*key), *key)
+    with _cache_lock:
+        if generation == _generation:
+            _cache[key] = analysis
+    return analysis
+
+def clear_cache():
+    global _generation
+    with _cache_lock:
+        _cache.clear()
+        _generation += 1
+
+def _on_change(event, payload):
+    # Sale edits change lines; item edits can move an item to another category;
+    # deleting an item cascades its sale lines away
+    if event.startswith("sale_") or event.startswith("item"):
+        clear_cache()
+
+models.add_change_listener(_on_change)
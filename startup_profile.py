@@ -0,0 +1,66 @@
+# startup_profile.py - Wall-clock timings of the startup phases, appended to logs/startup.log
+"""
+main.py wraps each startup step in PROFILE.phase(name) and marks the
+milestones that matter to the cashier: the window painted, and the
+deferred loading (stock, names, scan cache, OpenCV) finished. Every run
+appends one line to logs/startup.log, e.g.
+
+    2026-10-17 09:00:01  first_paint=412ms background_ready=951ms | imports=140ms database=9ms ...
+
+so a slow start on the shop's machine can be traced to the step that got slower.
+"""
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+LOG_PATH = os.path.join("logs", "startup.log")
+
+
+class StartupProfile:
+    """Phase durations and milestone times (seconds since the profile was created)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = [] # (name, seconds)
+        self.marks = []  # (name, seconds since started)
+        self._written = False
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter() - self.started))
+
+    def elapsed(self, mark):
+        """Seconds from start to a milestone, or None if it was not reached."""
+        for name, seconds in self.marks:
+            if name == mark:
+                return seconds
+        return None
+
+    def summary(self):
+        marks = " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.marks)
+        phases = " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases)
+        return f"{marks} | {phases}"
+
+    def write(self, path=LOG_PATH):
+        """Append this run's line to the log, once; a log that can't be written never stops the app."""
+        if self._written:
+            return
+        self._written = True
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(f"{datetime.now():%Y-%m-%d %H:%M:%S}  {self.summary()}\n")
+        except OSError as e:
+            print(f"Could not write the startup log: {e}")
+
+
+# Created when main.py starts importing, so "imports" covers the app's own modules
+PROFILE = StartupProfile()
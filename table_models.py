@@ -0,0 +1,321 @@
+# table_models.py - Model/view adapters that page rows in from models on demand
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QColor
+
+import models
+from utils import fmt_qty, fmt_money
+
+
+class _PagedTableModel(QAbstractTableModel):
+    """
+    Base for keyset-paged tables. Rows are fetched from models a page at a
+    time as the view scrolls (canFetchMore/fetchMore), and the view only asks
+    for the cells it actually paints, so table size no longer drives redraw cost.
+    Subclasses define HEADERS, _fetch_page(last_row), _key(row) and _display(row, col).
+    With an executor set, pages are queried on a worker thread and appended
+    when they arrive, so scrolling never waits on the database.
+    """
+    HEADERS = []
+    DESCENDING = False # Row order by _key
+
+    def __init__(self, page_size=200, parent=None):
+        super().__init__(parent)
+        self._page_size = page_size
+        self._rows = []
+        self._row_by_id = {}
+        self._loaded = False # Nothing is fetched until reload() is called
+        self._exhausted = False
+        self.executor = None # Optional workers.QueryExecutor
+        self._fetching = False
+        self._generation = 0 # Bumped by reload() so late pages from before it are dropped
+
+    # ---------- Qt model interface ----------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self._display(self._rows[index.row()], index.column())
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded and not self._exhausted and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._fetching:
+            return
+        last_row = self._rows[-1] if self._rows else None
+        if self.executor is None:
+            self._append_page(self._fetch_page(last_row))
+            return
+        self._fetching = True
+        generation = self._generation
+        self.executor.submit(
+            self._fetch_page, last_row,
+            on_result=lambda page: self._on_page_fetched(generation, page),
+            on_error=lambda error: self._on_page_failed(generation, error),
+        )
+
+    def _on_page_fetched(self, generation, page):
+        if generation != self._generation:
+            return
+        self._fetching = False
+        self._append_page(page)
+
+    def _on_page_failed(self, generation, error):
+        if generation != self._generation:
+            return
+        self._fetching = False
+        self._exhausted = True # Stop retrying on every scroll; reload() starts over
+        print(f"Failed to load rows: {error}")
+
+    def _append_page(self, page):
+        if len(page) < self._page_size:
+            self._exhausted = True
+        if not page:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        for offset, r in enumerate(page):
+            self._rows.append(r)
+            self._row_by_id[r["id"]] = first + offset
+        self.endInsertRows()
+
+    # ---------- Loading and targeted updates ----------
+    def reload(self):
+        """Drop every loaded row and fetch the first page again."""
+        self.beginResetModel()
+        self._rows = []
+        self._row_by_id = {}
+        self._loaded = True
+        self._exhausted = False
+        self._fetching = False
+        self._generation += 1
+        self.endResetModel()
+        self.fetchMore()
+
+    def row_data(self, row):
+        return self._rows[row]
+
+    def row_of(self, row_id):
+        return self._row_by_id.get(row_id)
+
+    def update_row(self, r):
+        """Replace one loaded row in place and repaint just that row; a row whose sort key changed is moved."""
+        row = self._row_by_id.get(r["id"])
+        if row is None:
+            return
+        if self._key(self._rows[row]) != self._key(r):
+            # Left in place it would break the order fetchMore pages on (it pages after the last key)
+            self.remove_row(r["id"])
+            self.insert_row(r)
+            return
+        self._rows[row] = r
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+
+    def insert_row(self, r):
+        """Insert a new row at its sorted position if it falls inside the loaded range."""
+        key = self._key(r)
+        row = self._row_by_id.get(r["id"])
+        if row is not None: # Already loaded, e.g. by a page read that raced the notification
+            if self._key(self._rows[row]) == key:
+                self.update_row(r)
+                return
+            self.remove_row(r["id"]) # Its sort key moved; insert it again at the new position
+        pos = 0
+        while pos < len(self._rows) and (self._key(self._rows[pos]) > key if self.DESCENDING
+                                         else self._key(self._rows[pos]) < key):
+            pos += 1
+        if pos == len(self._rows) and not self._exhausted:
+            return # Beyond the last loaded page; fetchMore will bring it in
+        self.beginInsertRows(QModelIndex(), pos, pos)
+        self._rows.insert(pos, r)
+        self._reindex()
+        self.endInsertRows()
+
+    def remove_row(self, row_id):
+        row = self._row_by_id.get(row_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        self._reindex()
+        self.endRemoveRows()
+
+    def _reindex(self):
+        self._row_by_id = {r["id"]: i for i, r in enumerate(self._rows)}
+
+
+class StockTableModel(_PagedTableModel):
+    """
+    Stock tab model, in (name, id) order. Column layout matches the old
+    QTableWidget so hidden sections stay put.
+    """
+    HEADERS = [
+        "ID", "الاسم", "التصنيف", "الباركود", "السعر",
+        "المخزون", "الحالة", "الصورة", "تاريخ الإضافة", "cat_id", "سعر الشراء"
+    ]
+    COL_NAME = 1
+    COL_STOCK = 5
+    COL_STATUS = 6
+    FORECAST_FIELDS = ("velocity", "days_to_stockout", "reorder_point")
+
+    def __init__(self, name_font, page_size=200, parent=None):
+        super().__init__(page_size, parent)
+        self._name_font = name_font # One shared font instead of one per row
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        col = index.column()
+        if role == Qt.ForegroundRole and col in (self.COL_STOCK, self.COL_STATUS):
+            r = self._rows[index.row()]
+            if self._stock(r) <= 0:
+                return QColor(Qt.red)
+            if self._needs_reorder(r):
+                return QColor(230, 126, 34) # Orange: will run out within the reorder lead time
+        if role == Qt.FontRole and col == self.COL_NAME:
+            return self._name_font
+        return super().data(index, role)
+
+    # Item-flavoured names for the controller
+    def row_of_item(self, item_id):
+        return self.row_of(item_id)
+
+    def update_item(self, item):
+        # get_item rows carry no forecast; keep the loaded one until the next refresh
+        row = self._row_by_id.get(item["id"])
+        if row is not None and "velocity" not in item:
+            item = dict(item, **{k: self._rows[row].get(k) for k in self.FORECAST_FIELDS})
+        self.update_row(item)
+
+    def insert_item(self, item):
+        self.insert_row(item)
+
+    def remove_item(self, item_id):
+        self.remove_row(item_id)
+
+    def update_stock(self, stock_levels, forecasts=None):
+        """Patch stock counts ({item_id: stock_count}) and forecasts ({item_id: forecast}) for loaded rows."""
+        forecasts = forecasts or {}
+        for item_id in set(stock_levels) | set(forecasts):
+            row = self._row_by_id.get(item_id)
+            if row is None:
+                continue
+            if item_id in stock_levels:
+                self._rows[row]["stock_count"] = stock_levels[item_id]
+            self._rows[row].update(forecasts.get(item_id, {}))
+            self.dataChanged.emit(self.index(row, self.COL_STOCK), self.index(row, self.COL_STATUS))
+
+    def _fetch_page(self, last_row):
+        after = self._key(last_row) if last_row else None
+        return models.get_items_page(self._page_size, after=after)
+
+    @staticmethod
+    def _key(r):
+        return (r["name"], r["id"])
+
+    @staticmethod
+    def _stock(r):
+        # Ensure stock is never shown as negative
+        return max(0, r["stock_count"] or 0)
+
+    @classmethod
+    def _needs_reorder(cls, r):
+        # Selling items at or under their reorder point (models' item_forecast)
+        return bool(r.get("velocity")) and cls._stock(r) <= (r.get("reorder_point") or 0)
+
+    @classmethod
+    def _status(cls, r):
+        stock = cls._stock(r)
+        if stock <= 0:
+            return "نفد المخزون"
+        if cls._needs_reorder(r):
+            # Days left at the current sales rate, from the live stock count
+            return f"أعد الطلب (~{stock / r['velocity']:.0f} يوم)"
+        return "متاح"
+
+    def _display(self, r, col):
+        if col == 0:
+            return str(r["id"])
+        if col == 1:
+            return r["name"]
+        if col == 2:
+            return r["category_name"] or "غير مصنّف"
+        if col == 3:
+            return r["barcode"] or ""
+        if col == 4:
+            return fmt_money(r["price"])
+        if col == self.COL_STOCK:
+            return fmt_qty(self._stock(r))
+        if col == self.COL_STATUS:
+            return self._status(r)
+        if col == 7:
+            return r["photo_path"] or ""
+        if col == 8:
+            return r["add_date"] or ""
+        if col == 9:
+            return str(r["category_id"] or "")
+        if col == 10:
+            return str(r["purchase_price"] or "0")
+        return None
+
+
+class SalesTableModel(_PagedTableModel):
+    """
+    Sales history, newest first, paged with models.get_sales_page. Optional
+    filters (date_from, date_to, min_total, max_total) are passed straight through.
+    """
+    HEADERS = ["رقم العملية", "التاريخ والوقت", "الإجمالي"]
+    DESCENDING = True
+
+    def __init__(self, page_size=200, parent=None):
+        super().__init__(page_size, parent)
+        self.currency = ""
+        self._filters = {}
+
+    def set_filters(self, **filters):
+        """Replace the active filters (None values are ignored) and reload from the newest sale."""
+        self._filters = {k: v for k, v in filters.items() if v is not None}
+        self.reload()
+
+    def matches(self, sale):
+        """Whether a sale passes the active filters (used before patching it in)."""
+        f = self._filters
+        day = sale["datetime"][:10]
+        if "date_from" in f and day < f["date_from"]:
+            return False
+        if "date_to" in f and day > f["date_to"]:
+            return False
+        if "min_total" in f and sale["total_price"] < f["min_total"]:
+            return False
+        if "max_total" in f and sale["total_price"] > f["max_total"]:
+            return False
+        return True
+
+    def _fetch_page(self, last_row):
+        before = self._key(last_row) if last_row else None
+        return models.get_sales_page(self._page_size, before=before, **self._filters)
+
+    @staticmethod
+    def _key(r):
+        return (r["datetime"], r["id"])
+
+    def _display(self, r, col):
+        if col == 0:
+            return str(r["id"])
+        if col == 1:
+            return r["datetime"]
+        if col == 2:
+            return f"{fmt_money(r['total_price'])} {self.currency}"
+        return None
@@ -0,0 +1,75 @@
+# test_table_models.py - Keyset paging stays ordered when loaded rows change
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtGui import QFont
+from PyQt5.QtWidgets import QApplication
+
+from table_models import StockTableModel
+
+_app = QApplication.instance() or QApplication([])
+
+
+class _ListStockModel(StockTableModel):
+    """StockTableModel paging over an in-memory list instead of the database."""
+
+    def __init__(self, items, page_size):
+        super().__init__(QFont(), page_size)
+        self.items = items
+
+    def _fetch_page(self, last_row):
+        ordered = sorted(self.items.values(), key=self._key)
+        if last_row is not None:
+            ordered = [r for r in ordered if self._key(r) > self._key(last_row)]
+        return [dict(r) for r in ordered[:self._page_size]]
+
+
+def _items(count):
+    return {i: {"id": i, "name": f"item {i:03d}", "stock_count": 5, "category_name": None, "barcode": None,
+                "price": 1.0, "photo_path": None, "add_date": "", "category_id": None, "purchase_price": 0.0}
+            for i in range(1, count + 1)}
+
+def _load_all(model):
+    while model.canFetchMore():
+        model.fetchMore()
+
+def test_renaming_last_loaded_row_keeps_paging():
+    items = _items(100)
+    model = _ListStockModel(items, page_size=10)
+    model.reload()
+    assert model.rowCount() == 10
+
+    last = dict(model.row_data(9), name="zzzz renamed")
+    items[last["id"]] = last
+    model.update_item(last)
+
+    assert model.row_of_item(last["id"]) is None # Now sorts past the loaded page
+    _load_all(model)
+    assert model.rowCount() == 100
+    assert [model.row_data(i)["id"] for i in range(100)] == [r["id"] for r in sorted(items.values(), key=model._key)]
+
+def test_rename_within_loaded_range_moves_row():
+    items = _items(30)
+    model = _ListStockModel(items, page_size=10)
+    model.reload()
+
+    moved = dict(model.row_data(7), name="item 000")
+    items[moved["id"]] = moved
+    model.update_item(moved)
+
+    assert model.rowCount() == 10
+    assert model.row_of_item(moved["id"]) == 0
+    keys = [model._key(model.row_data(i)) for i in range(model.rowCount())]
+    assert keys == sorted(keys)
+
+def test_update_with_same_key_patches_in_place():
+    items = _items(20)
+    model = _ListStockModel(items, page_size=10)
+    model.reload()
+
+    patched = dict(model.row_data(3), stock_count=0)
+    model.update_item(patched)
+
+    assert model.row_of_item(patched["id"]) == 3
+    assert model.row_data(3)["stock_count"] == 0
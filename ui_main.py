@@ -4,10 +4,31 @@ from PyQt5.QtWidgets import (
     QComboBox, QDoubleSpinBox, QFileDialog, QTableWidget, QTableWidgetItem,
     QGroupBox, QMessageBox, QHeaderView, QAbstractItemView, QFrame, QTextEdit,
     QSizePolicy, QSpacerItem, QCheckBox, QGridLayout, QDialog, QDialogButtonBox,
-    QScrollArea # Import QScrollArea
+    QScrollArea, QTableView, QDateEdit, QProgressBar # Import QScrollArea
 )
-from PyQt5.QtCore import Qt, QSize
-from PyQt5.QtGui import QPixmap, QFont, QIcon, QFontDatabase
+from PyQt5.QtCore import Qt, QSize, QDate
+from PyQt5.QtGui import QPixmap, QFont, QIcon
+
+from table_models import StockTableModel, SalesTableModel
+
+# In order of preference for Arabic text; Arial is the fallback
+ARABIC_FONTS = ["Tahoma", "Arial Unicode MS", "Segoe UI", "DejaVu Sans", "Noto Sans Arabic", "Arial"]
+_substitutions_set = False
+
+def arabic_font(size=11):
+    """
+    The first of ARABIC_FONTS that is installed, at `size` points. The other
+    names are registered as substitutes for the first, so Qt's font matching
+    makes the choice; listing every installed family to find one is slow on
+    machines with many fonts, and the dialogs used to do it on every scan.
+    """
+    global _substitutions_set
+    if not _substitutions_set:
+        QFont.insertSubstitutions(ARABIC_FONTS[0], ARABIC_FONTS[1:])
+        _substitutions_set = True
+    font = QFont(ARABIC_FONTS[0], size)
+    font.setStyleHint(QFont.System)
+    return font
 
 # --- New ItemScanDialog Class ---
 class ItemScanDialog(QDialog):
@@ -30,25 +51,7 @@ class ItemScanDialog(QDialog):
 
     def _setup_arabic_fonts(self):
         """Setup proper Arabic font support for the dialog."""
-        arabic_fonts = [
-            "Tahoma",           # Good Arabic support
-            "Arial Unicode MS", # Comprehensive Unicode support
-            "Segoe UI",         # Windows default with Arabic
-            "DejaVu Sans",      # Linux Arabic support
-            "Noto Sans Arabic", # Google Noto Arabic
-            "Arial"             # Fallback
-        ]
-        
-        self._arabic_font = None
-        font_db = QFontDatabase()
-        available_fonts = font_db.families()
-        for font_name in arabic_fonts:
-            if font_name in available_fonts:
-                self._arabic_font = QFont(font_name, 11)
-                self._arabic_font.setStyleHint(QFont.System)
-                break
-        if not self._arabic_font:
-            self._arabic_font = QFont("Arial", 11)
+        self._arabic_font = arabic_font()
 
     def _init_ui(self):
         main_layout = QVBoxLayout(self)
@@ -183,6 +186,47 @@ class ItemScanDialog(QDialog):
             super().done(r)
 
 
+class ReportDialog(QDialog):
+    """Read-only HTML report (product performance) with a close button."""
+
+    def __init__(self, parent=None, title="تقرير", html=""):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setLayoutDirection(Qt.RightToLeft)
+        self.resize(900, 700)
+        layout = QVBoxLayout(self)
+        self.view = QTextEdit()
+        self.view.setReadOnly(True)
+        self.view.setHtml(html)
+        layout.addWidget(self.view)
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+
+class PhotoCaptureDialog(QDialog):
+    """Live camera preview; frames arrive through show_frame() from the capture thread."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("التقاط صورة")
+        self.setLayoutDirection(Qt.RightToLeft)
+        layout = QVBoxLayout(self)
+        self.lbl_view = QLabel("جارِ تشغيل الكاميرا...")
+        self.lbl_view.setAlignment(Qt.AlignCenter)
+        self.lbl_view.setFixedSize(640, 480)
+        layout.addWidget(self.lbl_view)
+        buttons = QDialogButtonBox()
+        self.btn_capture = buttons.addButton("التقاط", QDialogButtonBox.AcceptRole)
+        buttons.addButton("إلغاء", QDialogButtonBox.RejectRole)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def show_frame(self, image):
+        self.lbl_view.setPixmap(QPixmap.fromImage(image))
+
+
 class MainUI(QWidget):
     def __init__(self):
         super().__init__()
@@ -207,6 +251,17 @@ class MainUI(QWidget):
         self.lbl_title.setObjectName("HeaderTitle")
         header.addWidget(self.lbl_title)
         header.addStretch(1)
+
+        # Non-blocking busy indicator, shown while background loads are running
+        self.lbl_busy = QLabel("جارِ التحميل...")
+        self.lbl_busy.setVisible(False)
+        self.busy_bar = QProgressBar()
+        self.busy_bar.setRange(0, 0) # Indeterminate
+        self.busy_bar.setMaximumWidth(160)
+        self.busy_bar.setTextVisible(False)
+        self.busy_bar.setVisible(False)
+        header.addWidget(self.lbl_busy)
+        header.addWidget(self.busy_bar)
         
         main.addLayout(header)
 
@@ -252,30 +307,8 @@ class MainUI(QWidget):
 
     def _setup_arabic_fonts(self):
         """Setup proper Arabic font support"""
-        arabic_fonts = [
-            "Tahoma",           # Good Arabic support
-            "Arial Unicode MS", # Comprehensive Unicode support
-            "Segoe UI",         # Windows default with Arabic
-            "DejaVu Sans",      # Linux Arabic support
-            "Noto Sans Arabic", # Google Noto Arabic
-            "Arial"             # Fallback
-        ]
-        
-        self._arabic_font = None
-
-        font_db = QFontDatabase()
-        available_fonts = font_db.families()
-        
-        for font_name in arabic_fonts:
-            if font_name in available_fonts:
-                self._arabic_font = QFont(font_name, 11)
-                self._arabic_font.setStyleHint(QFont.System)
+        self._arabic_font = arabic_font()
 
-                break
-        
-        if not self._arabic_font:
-            self._arabic_font = QFont("Arial", 11)
-        
         # Set application-wide font
         self.setFont(self._arabic_font)
 
@@ -332,9 +365,17 @@ class MainUI(QWidget):
         self.btn_scanner_info.setMinimumHeight(50)
         self.btn_scanner_info.setMinimumWidth(120)
 
+        # Continuous scanning through the camera, for kiosks without a USB scanner
+        self.btn_camera_scan = QPushButton("مسح بالكاميرا")
+        self.btn_camera_scan.setObjectName("secondary")
+        self.btn_camera_scan.setCheckable(True)
+        self.btn_camera_scan.setMinimumHeight(50)
+        self.btn_camera_scan.setMinimumWidth(120)
+
         row1.addWidget(QLabel("الباركود:"), 0)
         row1.addWidget(self.in_barcode, 3)
         row1.addWidget(self.btn_bill_find, 0)
+        row1.addWidget(self.btn_camera_scan, 0)
         row1.addWidget(self.btn_scanner_info, 0)
         input_layout.addLayout(row1)
 
@@ -614,10 +655,16 @@ class MainUI(QWidget):
         self.btn_stk_refresh.setMinimumHeight(45)
         self.btn_stk_refresh.setMinimumWidth(80)
 
+        self.btn_stk_import = QPushButton("استيراد من ملف")
+        self.btn_stk_import.setObjectName("secondary")
+        self.btn_stk_import.setMinimumHeight(45)
+        self.btn_stk_import.setMinimumWidth(120)
+
         btn_row.addWidget(self.btn_stk_add)
         btn_row.addWidget(self.btn_stk_update)
         btn_row.addWidget(self.btn_stk_delete)
         btn_row.addStretch()
+        btn_row.addWidget(self.btn_stk_import)
         btn_row.addWidget(self.btn_stk_refresh)
         form_layout.addLayout(btn_row)
 
@@ -627,11 +674,11 @@ class MainUI(QWidget):
         table_group = QGroupBox("قائمة المخزون")
         table_layout = QVBoxLayout(table_group)
 
-        self.tbl_stock = QTableWidget(0, 11)
-        self.tbl_stock.setHorizontalHeaderLabels([
-            "ID", "الاسم", "التصنيف", "الباركود", "السعر", 
-            "المخزون", "الحالة", "الصورة", "تاريخ الإضافة", "cat_id", "سعر الشراء"
-        ])
+        # Stock rows are paged in lazily by the model; only visible rows are rendered
+        self.stock_model = StockTableModel(QFont(self._arabic_font.family(), 13, QFont.Bold), parent=self)
+        self.tbl_stock = QTableView()
+        self.tbl_stock.setModel(self.stock_model)
+        self.tbl_stock.verticalHeader().setDefaultSectionSize(40)
         
         # Hide unnecessary columns
         self.tbl_stock.horizontalHeader().setSectionHidden(0, True)
@@ -659,6 +706,7 @@ class MainUI(QWidget):
         table_layout.addWidget(self.tbl_stock)
         outer.addWidget(table_group, 1)
 
+        self.stock_tab = tab_content # Its rows are loaded the first time it is shown
         self.tabs.addTab(tab_content, "المخزون")
 
     # ---------- Sales Tab ----------
@@ -711,10 +759,29 @@ class MainUI(QWidget):
         sales_group = QGroupBox("قائمة المبيعات")
         sales_layout = QVBoxLayout(sales_group)
 
-        self.tbl_sales = QTableWidget(0, 3)
-        self.tbl_sales.setHorizontalHeaderLabels([
-            "رقم العملية", "التاريخ والوقت", "الإجمالي"
-        ])
+        # Date-range filter (off by default: the newest sales are shown first)
+        filter_row = QHBoxLayout()
+        filter_row.setSpacing(10)
+        self.chk_sale_filter = QCheckBox("تصفية حسب التاريخ")
+        self.sale_date_from = QDateEdit(QDate.currentDate().addDays(-30))
+        self.sale_date_from.setCalendarPopup(True)
+        self.sale_date_from.setDisplayFormat("yyyy-MM-dd")
+        self.sale_date_to = QDateEdit(QDate.currentDate())
+        self.sale_date_to.setCalendarPopup(True)
+        self.sale_date_to.setDisplayFormat("yyyy-MM-dd")
+        filter_row.addWidget(self.chk_sale_filter)
+        filter_row.addWidget(QLabel("من:"))
+        filter_row.addWidget(self.sale_date_from)
+        filter_row.addWidget(QLabel("إلى:"))
+        filter_row.addWidget(self.sale_date_to)
+        filter_row.addStretch()
+        sales_layout.addLayout(filter_row)
+
+        # Older sales are paged in by the model as the table is scrolled
+        self.sales_model = SalesTableModel(parent=self)
+        self.tbl_sales = QTableView()
+        self.tbl_sales.setModel(self.sales_model)
+        self.tbl_sales.verticalHeader().setDefaultSectionSize(35)
         
         # Set responsive behavior
         header = self.tbl_sales.horizontalHeader()
@@ -725,6 +792,7 @@ class MainUI(QWidget):
         self.tbl_sales.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.tbl_sales.setAlternatingRowColors(True)
         self.tbl_sales.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.tbl_sales.setEditTriggers(QAbstractItemView.NoEditTriggers)
         
         sales_layout.addWidget(self.tbl_sales)
 
@@ -745,9 +813,19 @@ class MainUI(QWidget):
         self.btn_sale_refresh.setMinimumHeight(40)
         self.btn_sale_refresh.setMinimumWidth(80)
 
+        self.btn_sale_export = QPushButton("تصدير للمحاسبة")
+        self.btn_sale_export.setObjectName("secondary")
+        self.btn_sale_export.setMinimumHeight(40)
+
+        self.btn_sale_report = QPushButton("تقرير أداء المنتجات")
+        self.btn_sale_report.setObjectName("secondary")
+        self.btn_sale_report.setMinimumHeight(40)
+
         sales_btn_row.addWidget(self.btn_sale_view)
         sales_btn_row.addWidget(self.btn_sale_delete)
         sales_btn_row.addStretch()
+        sales_btn_row.addWidget(self.btn_sale_report)
+        sales_btn_row.addWidget(self.btn_sale_export)
         sales_btn_row.addWidget(self.btn_sale_refresh)
         sales_layout.addLayout(sales_btn_row)
 
@@ -827,6 +905,7 @@ class MainUI(QWidget):
         details_layout.addLayout(details_btn_row)
         outer.addWidget(details_group, 1)
 
+        self.sales_tab = tab_content # Its rows are loaded the first time it is shown
         self.tabs.addTab(tab_content, "المبيعات")
 
     # ---------- Settings Tab ----------
@@ -0,0 +1,330 @@
+# ui_trace.py - Trace Controller slot timings and GUI-thread stalls to a rotating trace file
+"""
+Usage: python ui_trace.py [trace files...] > stacks.folded
+
+Set KIOSK_UI_TRACE=1 to trace a session. Every method defined on the
+Controller is timed, so each slot shows up with the helpers it called
+nested inside it. Spans shorter than 1 ms are skipped. A watchdog
+thread notices when the GUI thread has not run its heartbeat timer for
+KIOSK_STALL_MS (default 200) and samples the GUI thread's Python stack
+until it comes back.
+
+Events go to logs/ui_trace.json in Chrome trace format, rotated at 5 MB
+with 3 older files kept. Chrome's about:tracing, Perfetto and speedscope
+open a file directly and show it as a flame chart. Run this module on
+the files to fold them into "frame;frame;frame microseconds" lines for
+flamegraph.pl or speedscope. That aggregate covers slot self-time and
+the stall stack samples.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import inspect
+import functools
+import threading
+import traceback
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+
+TRACE_PATH = os.path.join("logs", "ui_trace.json")
+STALL_MS = 200.0
+MIN_SPAN_MS = 1.0
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 3
+_STACK_DEPTH = 40
+
+_EPOCH_NS = time.perf_counter_ns()
+
+def _us(ns):
+    return (ns - _EPOCH_NS) / 1000
+
+
+class TraceWriter:
+    """
+    Appends trace events to `path` as a Chrome trace JSON array (the closing
+    bracket is optional in that format, so every line is complete as written).
+    Moves the file to path.1 ... path.<backups> once it passes max_bytes.
+    """
+
+    def __init__(self, path=TRACE_PATH, max_bytes=MAX_BYTES, backups=BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.thread_names = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+
+    def name_thread(self, tid, name):
+        with self._lock:
+            self.thread_names[tid] = name
+            if self._file is not None:
+                self._write_line(self._thread_name_event(tid, name))
+
+    def _thread_name_event(self, tid, name):
+        return {"ph": "M", "name": "thread_name", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self._size = 2
+        # Each file names its threads, so a rotated-out older file still reads on its own
+        for tid, name in self.thread_names.items():
+            self._write_line(self._thread_name_event(tid, name))
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        self._open()
+
+    def _write_line(self, event):
+        line = json.dumps(event, ensure_ascii=False) + ",\n"
+        self._file.write(line)
+        self._size += len(line)
+
+    def write(self, event, flush=False):
+        with self._lock:
+            if self._file is None:
+                self._open()
+            elif self._size >= self.max_bytes:
+                self._rotate()
+            self._write_line(event)
+            if flush:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Tracer:
+    """Times wrapped methods into TraceWriter spans ("X" events on the calling thread)."""
+
+    def __init__(self, writer, min_ms=MIN_SPAN_MS):
+        self.writer = writer
+        self.min_ns = int(min_ms * 1e6)
+        self.enabled = True
+
+    def span(self, name, start_ns, end_ns, category="slot"):
+        if end_ns - start_ns < self.min_ns:
+            return
+        self.writer.write({"name": name, "cat": category, "ph": "X", "ts": _us(start_ns),
+                           "dur": (end_ns - start_ns) / 1000, "pid": os.getpid(), "tid": threading.get_ident()})
+
+    def wrap(self, name, fn):
+        # PyQt drops signal arguments a slot does not take, but it can't see
+        # through the wrapper, so the wrapper trims them the same way
+        params = inspect.signature(fn).parameters.values()
+        if any(p.kind == p.VAR_POSITIONAL for p in params):
+            max_args = None
+        else:
+            max_args = sum(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in params)
+
+        @functools.wraps(fn)
+        def traced(*args, **kwargs):
+            if max_args is not None and len(args) > max_args:
+                args = args[:max_args]
+            if not self.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.span(name, start, time.perf_counter_ns())
+        traced.__wrapped_by_tracer__ = True
+        return traced
+
+    def trace_class(self, cls):
+        """Wrap every plain method defined on cls itself (not inherited), including Qt event overrides."""
+        for attr, value in list(vars(cls).items()):
+            if attr == "__init__" or not inspect.isfunction(value) or getattr(value, "__wrapped_by_tracer__", False):
+                continue
+            setattr(cls, attr, self.wrap(f"{cls.__name__}.{attr}", value))
+
+
+class StallWatchdog:
+    """
+    A heartbeat QTimer on the GUI thread and a thread that checks it. When
+    the heartbeat is more than stall_ms late, the GUI thread's stack is
+    sampled every check until it beats again; the stall is then written as
+    one "X" event on the watchdog's track with the distinct stacks and how
+    often each was seen.
+    """
+
+    def __init__(self, writer, stall_ms=STALL_MS):
+        self.writer = writer
+        self.stall_ns = int(stall_ms * 1e6)
+        self.interval = max(stall_ms / 4, 10) / 1000 # seconds, for both the heartbeat and the checks
+        self.stalls = 0
+        self._beat_ns = time.perf_counter_ns()
+        self._gui_ident = threading.get_ident()
+        self._stopping = threading.Event()
+        self._timer = None
+        self._thread = threading.Thread(target=self._watch, name="ui-watchdog", daemon=True)
+
+    def start(self):
+        """Call on the GUI thread once the QApplication exists."""
+        self._gui_ident = threading.get_ident()
+        self._timer = QTimer(QApplication.instance())
+        self._timer.timeout.connect(self._beat)
+        self._timer.start(int(self.interval * 1000))
+        self.writer.name_thread(self._gui_ident, "GUI")
+        self.writer.name_thread(0, "GUI stalls")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        if self._timer is not None:
+            try:
+                self._timer.stop()
+            except RuntimeError:
+                pass # Already deleted along with the QApplication
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _beat(self):
+        self._beat_ns = time.perf_counter_ns()
+
+    def _sample(self):
+        frame = sys._current_frames().get(self._gui_ident)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame, limit=_STACK_DEPTH)
+        return tuple(f"{os.path.basename(f.filename)}:{f.name}:{f.lineno}" for f in stack)
+
+    def _watch(self):
+        stall_start = None
+        samples = {}
+        while not self._stopping.wait(self.interval):
+            beat = self._beat_ns
+            late = time.perf_counter_ns() - beat
+            if late > self.stall_ns:
+                if stall_start is None:
+                    stall_start, samples = beat, {}
+                stack = self._sample()
+                if stack:
+                    samples[stack] = samples.get(stack, 0) + 1
+            elif stall_start is not None:
+                self._report(stall_start, beat, samples)
+                stall_start = None
+
+    def _report(self, start_ns, end_ns, samples):
+        self.stalls += 1
+        stacks = [{"count": count, "stack": list(stack)}
+                  for stack, count in sorted(samples.items(), key=lambda s: -s[1])]
+        self.writer.write({"name": "GUI stall", "cat": "stall", "ph": "X", "ts": _us(start_ns),
+                           "dur": (end_ns - start_ns) / 1000, "pid": os.getpid(), "tid": 0,
+                           "args": {"sample_ms": self.interval * 1000, "stacks": stacks}}, flush=True)
+
+
+_tracer = None
+_watchdog = None
+
+def enable(controller_class, path=TRACE_PATH, stall_ms=STALL_MS, min_ms=MIN_SPAN_MS):
+    """
+    Trace controller_class's methods and watch the GUI thread for stalls.
+    Call on the GUI thread after the QApplication exists and before the
+    window is created, so signal connections pick up the wrapped methods.
+    """
+    global _tracer, _watchdog
+    writer = TraceWriter(path)
+    _tracer = Tracer(writer, min_ms)
+    _tracer.trace_class(controller_class)
+    _watchdog = StallWatchdog(writer, stall_ms).start()
+    QApplication.instance().aboutToQuit.connect(disable)
+    atexit.register(disable)
+    return _tracer
+
+def disable():
+    """Stop tracing (the wrapped methods then just call through) and close the file."""
+    global _tracer, _watchdog
+    if _watchdog is not None:
+        _watchdog.stop()
+        _watchdog = None
+    if _tracer is not None:
+        _tracer.enabled = False
+        _tracer.writer.close()
+        _tracer = None
+
+def enable_from_environment(controller_class):
+    """KIOSK_UI_TRACE=1 turns tracing on for this run; KIOSK_STALL_MS sets the stall threshold."""
+    if os.environ.get("KIOSK_UI_TRACE", "") in ("", "0"):
+        return None
+    return enable(controller_class, stall_ms=float(os.environ.get("KIOSK_STALL_MS", STALL_MS)))
+
+
+def read_events(path):
+    """The events in one trace file, written completely or cut off mid-line."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    events = []
+    for line in text.splitlines()[1:]:
+        try:
+            events.append(json.loads(line.rstrip().rstrip(",")))
+        except ValueError:
+            pass # A line cut short by a crash
+    return events
+
+def fold(events):
+    """
+    {"frame;frame;...": microseconds} for flame graphs: slot spans nested
+    by time on each thread (self time only), and stall stacks weighted by
+    the number of samples.
+    """
+    folded = {}
+    names = {e["tid"]: e["args"]["name"] for e in events if e.get("ph") == "M"}
+    spans = {}
+    for e in events:
+        if e.get("ph") != "X":
+            continue
+        if e.get("cat") == "stall":
+            for entry in e["args"]["stacks"]:
+                key = ";".join(["GUI stall"] + entry["stack"])
+                folded[key] = folded.get(key, 0) + entry["count"] * e["args"]["sample_ms"] * 1000
+        else:
+            spans.setdefault(e["tid"], []).append(e)
+    for tid, thread_spans in spans.items():
+        open_spans = [] # [end, path, self time]
+        def close(until):
+            while open_spans and open_spans[-1][0] <= until:
+                _, path, self_time = open_spans.pop()
+                folded[path] = folded.get(path, 0) + max(self_time, 0)
+        # Parents start no later and run longer than their children
+        for e in sorted(thread_spans, key=lambda e: (e["ts"], -e["dur"])):
+            close(e["ts"])
+            if open_spans:
+                open_spans[-1][2] -= e["dur"]
+                path = open_spans[-1][1] + ";" + e["name"]
+            else:
+                path = names.get(tid, str(tid)) + ";" + e["name"]
+            open_spans.append([e["ts"] + e["dur"], path, e["dur"]])
+        close(float("inf"))
+    return folded
+
+def main(argv):
+    paths = argv[1:] or [p for p in [TRACE_PATH] + [f"{TRACE_PATH}.{i}" for i in range(1, BACKUPS + 1)]
+                         if os.path.exists(p)]
+    if not paths:
+        print(__doc__.strip())
+        return 1
+    events = []
+    for path in paths:
+        events.extend(read_events(path))
+    for stack, micros in sorted(fold(events).items()):
+        print(f"{stack} {int(micros)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
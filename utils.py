@@ -0,0 +1,26 @@
+# utils.py - Qt-free helpers shared by the controller, table models and tools
+import re
+
+ALLOWED_BARCODE_LENGTHS = {8, 12, 13}
+
+def is_valid_barcode(code: str) -> bool:
+    return code.isdigit() and (len(code) in ALLOWED_BARCODE_LENGTHS)
+
+def fmt_qty(val):
+    return f"{val:.0f}" if val == int(val) else f"{val:.1f}"
+
+def fmt_money(val):
+    return f"{val:.0f}" if val == int(val) else f"{val:.2f}"
+
+# Arabic search normalization: strip tashkeel/tatweel and fold letter variants
+# (hamza/madda alef forms, alef maqsura, taa marbuta) so spelling variants match.
+_ARABIC_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_ARABIC_FOLDS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+})
+
+def normalize_arabic(text):
+    if not text:
+        return ""
+    return _ARABIC_MARKS.sub("", text).translate(_ARABIC_FOLDS).lower()
@@ -0,0 +1,103 @@
+# workers.py - Run models calls on thread pools and deliver results back on the GUI thread
+import sys
+import traceback
+from itertools import count
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class _JobSignals(QObject):
+    # Emitted from pool threads; queued to the executor, which lives on the GUI thread
+    done = pyqtSignal(int, object)
+    failed = pyqtSignal(int, object)
+
+
+class _Job(QRunnable):
+    def __init__(self, job_id, fn, args, kwargs, signals):
+        super().__init__()
+        self.job_id = job_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = signals
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            e.traceback_text = traceback.format_exc()
+            self.signals.failed.emit(self.job_id, e)
+        else:
+            self.signals.done.emit(self.job_id, result)
+
+
+class QueryExecutor(QObject):
+    """
+    Runs models calls off the GUI thread and invokes their callbacks on it.
+    Short reads (table pages, KPIs, lookups) go through submit() to a small
+    QThreadPool. Long jobs (imports, exports, reports, photo ingest) go
+    through submit_long() to a single thread of their own, so a big import
+    never holds up page fetches. Each pool thread keeps its own pooled
+    models connection, so threads are never expired. busy_changed(True/False)
+    tracks whether any job of either kind is in flight, for a non-blocking
+    progress indicator.
+    """
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, max_threads=2, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._pool.setExpiryTimeout(-1)
+        self._long_pool = QThreadPool(self)
+        self._long_pool.setMaxThreadCount(1)
+        self._long_pool.setExpiryTimeout(-1)
+        self._signals = _JobSignals(self)
+        self._signals.done.connect(self._on_done)
+        self._signals.failed.connect(self._on_failed)
+        self._callbacks = {}
+        self._ids = count(1)
+
+    def submit(self, fn, *args, on_result=None, on_error=None, **kwargs):
+        """Run a short call fn(*args, **kwargs) on the read pool; returns a job id."""
+        return self._start(self._pool, fn, args, kwargs, on_result, on_error)
+
+    def submit_long(self, fn, *args, on_result=None, on_error=None, **kwargs):
+        """Like submit(), for jobs that may run for seconds; they queue on their own thread."""
+        return self._start(self._long_pool, fn, args, kwargs, on_result, on_error)
+
+    def _start(self, pool, fn, args, kwargs, on_result, on_error):
+        job_id = next(self._ids)
+        was_idle = not self._callbacks
+        self._callbacks[job_id] = (on_result, on_error)
+        if was_idle:
+            self.busy_changed.emit(True)
+        pool.start(_Job(job_id, fn, args, kwargs, self._signals))
+        return job_id
+
+    def is_busy(self):
+        return bool(self._callbacks)
+
+    def wait_for_done(self, msecs=-1):
+        """Block until every queued job has run (for shutdown and scripted runs)."""
+        if not self._long_pool.waitForDone(msecs):
+            return False
+        return self._pool.waitForDone(msecs)
+
+    def _finish(self, job_id):
+        callbacks = self._callbacks.pop(job_id, (None, None))
+        if not self._callbacks:
+            self.busy_changed.emit(False)
+        return callbacks
+
+    def _on_done(self, job_id, result):
+        on_result, _ = self._finish(job_id)
+        if on_result:
+            on_result(result)
+
+    def _on_failed(self, job_id, error):
+        _, on_error = self._finish(job_id)
+        if on_error:
+            on_error(error)
+        else:
+            print(getattr(error, "traceback_text", repr(error)), file=sys.stderr)